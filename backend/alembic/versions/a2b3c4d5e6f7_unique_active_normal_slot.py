@@ -0,0 +1,68 @@
+"""Partial unique index on active normal bookings per (date, slot)
+
+Revision ID: a2b3c4d5e6f7
+Revises: f1a2b3c4d5e6
+Create Date: 2026-10-17 00:00:05.000000
+
+Why: a single booking did SELECT-then-INSERT. That cost an extra round trip
+and still let two admins clicking the same slot both pass the SELECT and
+double-book it. With the database enforcing one active NORMAL booking per
+(booking_date, time_slot), /api/add_booking inserts with
+ON CONFLICT DO NOTHING RETURNING id and learns about a collision from the
+same statement.
+
+Structure:
+  - uq_bookings_active_normal_slot: UNIQUE (booking_date, time_slot)
+      WHERE booking_type = 'NORMAL' AND is_cancelled IS NOT TRUE
+    Cancelled bookings stay out of the index, so a cancelled slot (shown as
+    open on the matrix) can be booked again. Academies are excluded because
+    their booking_date is only the series start; academy overlaps are still
+    checked against booking_slot_days before insert.
+
+The index can't be built while duplicates exist. The pre-check below fails
+the migration with the offending (date, slot) pairs instead of a bare
+unique-violation; cancel or move the extras and re-run.
+
+Idempotent: CREATE UNIQUE INDEX IF NOT EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'a2b3c4d5e6f7'
+down_revision: Union[str, None] = 'f1a2b3c4d5e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        DO $$
+        DECLARE
+            v_dupes text;
+        BEGIN
+            SELECT string_agg(booking_date || ' ' || time_slot, ', ')
+            INTO v_dupes
+            FROM (
+                SELECT booking_date, time_slot
+                FROM bookings
+                WHERE booking_type = 'NORMAL' AND is_cancelled IS NOT TRUE
+                GROUP BY booking_date, time_slot
+                HAVING count(*) > 1
+                LIMIT 20
+            ) d;
+            IF v_dupes IS NOT NULL THEN
+                RAISE EXCEPTION 'Double-booked slots must be resolved first: %', v_dupes;
+            END IF;
+        END $$;
+    """)
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_bookings_active_normal_slot
+        ON bookings (booking_date, time_slot)
+        WHERE booking_type = 'NORMAL' AND is_cancelled IS NOT TRUE;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS uq_bookings_active_normal_slot;")
@@ -0,0 +1,274 @@
+"""Statement-level transaction summary triggers with transition tables
+
+Revision ID: a8b9c0d1e2f3
+Revises: f7a8b9c0d1e2
+Create Date: 2026-10-17 00:00:11.000000
+
+Why: transactions_sync_summary was FOR EACH ROW, so a statement touching many
+payments (hard-deleting a booking's payments, importing historical payments,
+a bulk correction) updated the same summary row once per transaction row.
+Statement-level triggers see every changed row at once through
+REFERENCING OLD TABLE / NEW TABLE, group them by booking, and update each
+affected summary exactly once per statement. An import of thousands of
+payments costs one UPDATE over the bookings it touches.
+
+Structure:
+  - public.apply_transaction_deltas(booking_ids[], signs[], types[], methods[],
+      amounts[], days[])
+      Set-based form of apply_transaction_delta: the rows are unnested,
+      summed per booking (sign +1 for rows that arrived, -1 for rows that
+      went away) and applied in a single UPDATE ... FROM. In order:
+        1. bookings that lost rows and have no transactions left lose their
+           summary (as before);
+        2. every other affected booking with a summary row gets its deltas;
+           leftover/status/booking_payment_date as in apply_transaction_delta,
+           every SET expression reading the target row itself;
+        3. affected bookings still without a summary get a full
+           recalc_transaction_summary (first payment of a booking created
+           without one).
+      Arrays, because transition tables are only visible inside the trigger
+      function itself.
+  - public.trg_transactions_sync_summary_stmt(): collects the transition
+      rows into those arrays. INSERT -> +new_rows, DELETE -> -old_rows,
+      UPDATE -> -old +new for the rows (paired by id) whose booking, type,
+      method, amount or created_at changed. Moving a payment between bookings
+      is just a -1 on one booking and a +1 on the other, no full recalc.
+  - Triggers transactions_sync_summary_{insert,update,delete}, AFTER ...
+      FOR EACH STATEMENT, one per event (a trigger with transition tables
+      fires for a single event). They replace the row-level
+      transactions_sync_summary.
+
+apply_transaction_delta and trg_transactions_sync_summary stay defined so a
+downgrade can re-create the row-level trigger; verify_transaction_summaries()
+still checks the result.
+
+Idempotent: CREATE OR REPLACE / DROP TRIGGER IF EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'a8b9c0d1e2f3'
+down_revision: Union[str, None] = 'f7a8b9c0d1e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+DELTAS_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.apply_transaction_deltas(
+    p_booking_ids integer[], p_signs integer[], p_types transactiontype[],
+    p_methods paymentmethod[], p_amounts double precision[], p_days date[]
+)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_updated integer[];
+    v_row record;
+BEGIN
+    -- 1. A booking whose last transaction went away loses its summary.
+    DELETE FROM transaction_summaries s
+    WHERE s.booking_id IN (
+        SELECT DISTINCT x.booking_id
+        FROM unnest(p_booking_ids, p_signs) AS x(booking_id, sign)
+        WHERE x.sign < 0
+    )
+      AND NOT EXISTS (SELECT 1 FROM transactions t WHERE t.booking_id = s.booking_id);
+
+    -- 2. One UPDATE for every affected summary that exists.
+    WITH r AS (
+        SELECT *
+        FROM unnest(p_booking_ids, p_signs, p_types, p_methods, p_amounts, p_days)
+            AS r(booking_id, sign, txn_type, method, amount, txn_day)
+    ),
+    d AS (
+        SELECT
+            r.booking_id,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'BOOKING_PAYMENT', NULL)) AS booking,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'SLOT_PAYMENT', NULL)) AS slot,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'DISCOUNT', NULL)) AS discount,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'OTHER_ADJUSTMENT', NULL)) AS other,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, NULL, 'CASH')) AS cash,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, NULL, 'BKASH')) AS bkash,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, NULL, 'NAGAD')) AS nagad,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, NULL, 'CARD')) AS card,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, NULL, 'BANK_TRANSFER')) AS bank,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'BOOKING_PAYMENT', 'CASH')) AS booking_cash,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'BOOKING_PAYMENT', 'BKASH')) AS booking_bkash,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'BOOKING_PAYMENT', 'NAGAD')) AS booking_nagad,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'BOOKING_PAYMENT', 'CARD')) AS booking_card,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'BOOKING_PAYMENT', 'BANK_TRANSFER')) AS booking_bank,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'SLOT_PAYMENT', 'CASH')) AS slot_cash,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'SLOT_PAYMENT', 'BKASH')) AS slot_bkash,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'SLOT_PAYMENT', 'NAGAD')) AS slot_nagad,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'SLOT_PAYMENT', 'CARD')) AS slot_card,
+            SUM(r.sign * public.txn_amount_if(r.txn_type, r.method, r.amount, 'SLOT_PAYMENT', 'BANK_TRANSFER')) AS slot_bank,
+            MIN(r.txn_day) FILTER (WHERE r.sign > 0 AND r.txn_type = 'BOOKING_PAYMENT') AS added_payment_day,
+            MIN(r.txn_day) FILTER (WHERE r.sign < 0 AND r.txn_type = 'BOOKING_PAYMENT') AS removed_payment_day
+        FROM r
+        GROUP BY r.booking_id
+    ),
+    updated AS (
+        -- Totals come from s itself, not a separate read of the table, so a
+        -- concurrent statement's committed deltas are kept (see
+        -- apply_transaction_delta).
+        UPDATE transaction_summaries s SET
+            total_paid = COALESCE(s.total_paid, 0) + d.booking + d.slot,
+            discount = COALESCE(s.discount, 0) + d.discount,
+            other_adjustments = COALESCE(s.other_adjustments, 0) + d.other,
+            leftover = s.total_price
+                - (COALESCE(s.total_paid, 0) + d.booking + d.slot)
+                - (COALESCE(s.discount, 0) + d.discount)
+                - (COALESCE(s.other_adjustments, 0) + d.other),
+            booking_payment = COALESCE(s.booking_payment, 0) + d.booking,
+            booking_payment_date = CASE
+                -- The earliest booking payment went away (or moved): re-read MIN.
+                WHEN d.removed_payment_day <= s.booking_payment_date
+                    THEN (SELECT MIN(t.created_at::date) FROM transactions t
+                          WHERE t.booking_id = s.booking_id AND t.transaction_type = 'BOOKING_PAYMENT')
+                ELSE LEAST(s.booking_payment_date, d.added_payment_day)
+            END,
+            slot_payment = COALESCE(s.slot_payment, 0) + d.slot,
+            cash_payment = COALESCE(s.cash_payment, 0) + d.cash,
+            bkash_payment = COALESCE(s.bkash_payment, 0) + d.bkash,
+            nagad_payment = COALESCE(s.nagad_payment, 0) + d.nagad,
+            card_payment = COALESCE(s.card_payment, 0) + d.card,
+            bank_transfer_payment = COALESCE(s.bank_transfer_payment, 0) + d.bank,
+            booking_cash_payment = COALESCE(s.booking_cash_payment, 0) + d.booking_cash,
+            booking_bkash_payment = COALESCE(s.booking_bkash_payment, 0) + d.booking_bkash,
+            booking_nagad_payment = COALESCE(s.booking_nagad_payment, 0) + d.booking_nagad,
+            booking_card_payment = COALESCE(s.booking_card_payment, 0) + d.booking_card,
+            booking_bank_transfer_payment = COALESCE(s.booking_bank_transfer_payment, 0) + d.booking_bank,
+            slot_cash_payment = COALESCE(s.slot_cash_payment, 0) + d.slot_cash,
+            slot_bkash_payment = COALESCE(s.slot_bkash_payment, 0) + d.slot_bkash,
+            slot_nagad_payment = COALESCE(s.slot_nagad_payment, 0) + d.slot_nagad,
+            slot_card_payment = COALESCE(s.slot_card_payment, 0) + d.slot_card,
+            slot_bank_transfer_payment = COALESCE(s.slot_bank_transfer_payment, 0) + d.slot_bank,
+            status = CASE
+                WHEN s.total_price
+                     - (COALESCE(s.total_paid, 0) + d.booking + d.slot)
+                     - (COALESCE(s.discount, 0) + d.discount)
+                     - (COALESCE(s.other_adjustments, 0) + d.other) <= 0 THEN 'SUCCESSFUL'::transactionstatus
+                WHEN COALESCE(s.total_paid, 0) + d.booking + d.slot > 0 THEN 'PARTIAL'::transactionstatus
+                ELSE 'PENDING'::transactionstatus
+            END,
+            updated_at = NOW()
+        FROM d
+        WHERE s.booking_id = d.booking_id
+        RETURNING s.booking_id
+    )
+    SELECT array_agg(booking_id) INTO v_updated FROM updated;
+
+    -- 3. Bookings with transactions but no summary row yet: build it in full.
+    FOR v_row IN
+        SELECT DISTINCT x.booking_id
+        FROM unnest(p_booking_ids) AS x(booking_id)
+        WHERE x.booking_id <> ALL (COALESCE(v_updated, '{}'))
+          AND EXISTS (SELECT 1 FROM transactions t WHERE t.booking_id = x.booking_id)
+    LOOP
+        PERFORM public.recalc_transaction_summary(v_row.booking_id);
+    END LOOP;
+END;
+$$;
+"""
+
+TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_transactions_sync_summary_stmt()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_booking_ids integer[];
+    v_signs integer[];
+    v_types transactiontype[];
+    v_methods paymentmethod[];
+    v_amounts double precision[];
+    v_days date[];
+BEGIN
+    -- Each branch names only the transition tables its trigger defines.
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(booking_id), array_agg(1), array_agg(transaction_type),
+               array_agg(payment_method), array_agg(amount), array_agg(created_at::date)
+        INTO v_booking_ids, v_signs, v_types, v_methods, v_amounts, v_days
+        FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(booking_id), array_agg(-1), array_agg(transaction_type),
+               array_agg(payment_method), array_agg(amount), array_agg(created_at::date)
+        INTO v_booking_ids, v_signs, v_types, v_methods, v_amounts, v_days
+        FROM old_rows;
+    ELSE
+        WITH changed AS (
+            SELECT o.booking_id AS old_booking_id, o.transaction_type AS old_type,
+                   o.payment_method AS old_method, o.amount AS old_amount, o.created_at::date AS old_day,
+                   n.booking_id AS new_booking_id, n.transaction_type AS new_type,
+                   n.payment_method AS new_method, n.amount AS new_amount, n.created_at::date AS new_day
+            FROM old_rows o
+            JOIN new_rows n ON n.id = o.id
+            WHERE (n.booking_id, n.transaction_type, n.payment_method, n.amount, n.created_at)
+                  IS DISTINCT FROM (o.booking_id, o.transaction_type, o.payment_method, o.amount, o.created_at)
+        ),
+        moved AS (
+            SELECT old_booking_id AS booking_id, -1 AS sign, old_type AS txn_type,
+                   old_method AS method, old_amount AS amount, old_day AS txn_day
+            FROM changed
+            UNION ALL
+            SELECT new_booking_id, 1, new_type, new_method, new_amount, new_day
+            FROM changed
+        )
+        SELECT array_agg(booking_id), array_agg(sign), array_agg(txn_type),
+               array_agg(method), array_agg(amount), array_agg(txn_day)
+        INTO v_booking_ids, v_signs, v_types, v_methods, v_amounts, v_days
+        FROM moved;
+    END IF;
+
+    IF v_booking_ids IS NOT NULL THEN
+        PERFORM public.apply_transaction_deltas(v_booking_ids, v_signs, v_types, v_methods, v_amounts, v_days);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(DELTAS_FUNCTION_SQL)
+    op.execute(TRIGGER_FUNCTION_SQL)
+
+    op.execute("DROP TRIGGER IF EXISTS transactions_sync_summary ON transactions;")
+    op.execute("DROP TRIGGER IF EXISTS transactions_sync_summary_insert ON transactions;")
+    op.execute("DROP TRIGGER IF EXISTS transactions_sync_summary_update ON transactions;")
+    op.execute("DROP TRIGGER IF EXISTS transactions_sync_summary_delete ON transactions;")
+    op.execute("""
+        CREATE TRIGGER transactions_sync_summary_insert
+        AFTER INSERT ON transactions
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public.trg_transactions_sync_summary_stmt();
+    """)
+    op.execute("""
+        CREATE TRIGGER transactions_sync_summary_update
+        AFTER UPDATE ON transactions
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public.trg_transactions_sync_summary_stmt();
+    """)
+    op.execute("""
+        CREATE TRIGGER transactions_sync_summary_delete
+        AFTER DELETE ON transactions
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public.trg_transactions_sync_summary_stmt();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS transactions_sync_summary_insert ON transactions;")
+    op.execute("DROP TRIGGER IF EXISTS transactions_sync_summary_update ON transactions;")
+    op.execute("DROP TRIGGER IF EXISTS transactions_sync_summary_delete ON transactions;")
+    op.execute("DROP TRIGGER IF EXISTS transactions_sync_summary ON transactions;")
+    op.execute("""
+        CREATE TRIGGER transactions_sync_summary
+        AFTER INSERT OR UPDATE OR DELETE ON transactions
+        FOR EACH ROW EXECUTE FUNCTION public.trg_transactions_sync_summary();
+    """)
+    op.execute("DROP FUNCTION IF EXISTS public.trg_transactions_sync_summary_stmt();")
+    op.execute("DROP FUNCTION IF EXISTS public.apply_transaction_deltas("
+               "integer[], integer[], transactiontype[], paymentmethod[], double precision[], date[]);")
@@ -0,0 +1,117 @@
+"""Trigger-maintained customers directory
+
+Revision ID: b3c4d5e6f7a8
+Revises: a2b3c4d5e6f7
+Create Date: 2026-10-17 00:00:06.000000
+
+Why: every booking create/update finished with upsert_customer(), which opened
+its own session, ran INSERT ... ON CONFLICT and committed — a pool checkout and
+an extra commit on the request path, and a directory that silently missed any
+booking written outside those endpoints (SQL fixes, imports), so
+/api/customers/resync had to rescan the whole bookings table to catch up.
+Moving the upsert into an AFTER trigger on bookings, like
+transactions_sync_summary does for summaries, keeps the directory consistent
+inside the booking's own transaction at no extra round trip.
+
+Structure:
+  - public.upsert_customer(p_name text, p_phone text)
+      One row per trimmed phone; name refreshed to the latest write. Blank
+      names/phones are ignored. The DO UPDATE is skipped when the name is
+      already current, so a 30-date series insert doesn't churn the same row.
+  - public.trg_bookings_sync_customer()
+      Calls upsert_customer(NEW.name, NEW.phone). Rows aren't removed when a
+      booking is deleted or its phone edited — the directory is a type-ahead
+      history, same as before.
+  - Triggers on bookings, both AFTER ... FOR EACH ROW:
+      bookings_sync_customer_insert  AFTER INSERT
+      bookings_sync_customer_update  AFTER UPDATE OF name, phone, only WHEN one
+        of the two actually changed, so cancel/reschedule updates never touch
+        customers. (Split in two because a WHEN clause can't read OLD on INSERT.)
+  - One-time repair pass (same query as /api/customers/resync) so anything
+    the old per-request upsert missed is picked up.
+
+Idempotent: CREATE OR REPLACE / DROP TRIGGER IF EXISTS / ON CONFLICT.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'b3c4d5e6f7a8'
+down_revision: Union[str, None] = 'a2b3c4d5e6f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+UPSERT_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.upsert_customer(p_name text, p_phone text)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF p_name IS NULL OR btrim(p_name) = '' OR p_phone IS NULL OR btrim(p_phone) = '' THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO customers (name, phone, created_at, updated_at)
+    VALUES (btrim(p_name), btrim(p_phone),
+            (now() AT TIME ZONE 'utc'), (now() AT TIME ZONE 'utc'))
+    ON CONFLICT (phone) DO UPDATE
+    SET name = EXCLUDED.name, updated_at = (now() AT TIME ZONE 'utc')
+    WHERE customers.name IS DISTINCT FROM EXCLUDED.name;
+END;
+$$;
+"""
+
+TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_bookings_sync_customer()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM public.upsert_customer(NEW.name, NEW.phone);
+    RETURN NULL;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(UPSERT_FUNCTION_SQL)
+    op.execute(TRIGGER_FUNCTION_SQL)
+
+    op.execute("DROP TRIGGER IF EXISTS bookings_sync_customer_insert ON bookings;")
+    op.execute("""
+        CREATE TRIGGER bookings_sync_customer_insert
+        AFTER INSERT ON bookings
+        FOR EACH ROW EXECUTE FUNCTION public.trg_bookings_sync_customer();
+    """)
+    op.execute("DROP TRIGGER IF EXISTS bookings_sync_customer_update ON bookings;")
+    op.execute("""
+        CREATE TRIGGER bookings_sync_customer_update
+        AFTER UPDATE OF name, phone ON bookings
+        FOR EACH ROW
+        WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.phone IS DISTINCT FROM NEW.phone)
+        EXECUTE FUNCTION public.trg_bookings_sync_customer();
+    """)
+
+    # Repair pass: pick up anything the per-request upsert missed.
+    op.execute("""
+        INSERT INTO customers (name, phone, created_at, updated_at)
+        SELECT DISTINCT ON (btrim(phone)) btrim(name), btrim(phone),
+               (now() AT TIME ZONE 'utc'), (now() AT TIME ZONE 'utc')
+        FROM bookings
+        WHERE phone IS NOT NULL AND btrim(phone) <> ''
+          AND name IS NOT NULL AND btrim(name) <> ''
+        ORDER BY btrim(phone), id DESC
+        ON CONFLICT (phone) DO UPDATE
+        SET name = EXCLUDED.name, updated_at = (now() AT TIME ZONE 'utc')
+        WHERE customers.name IS DISTINCT FROM EXCLUDED.name;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS bookings_sync_customer_update ON bookings;")
+    op.execute("DROP TRIGGER IF EXISTS bookings_sync_customer_insert ON bookings;")
+    op.execute("DROP FUNCTION IF EXISTS public.trg_bookings_sync_customer();")
+    op.execute("DROP FUNCTION IF EXISTS public.upsert_customer(text, text);")
@@ -0,0 +1,143 @@
+"""Materialized booking_slot_days occupancy table maintained by trigger
+
+Revision ID: b7c8d9e0f1a2
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-17 00:00:00.000000
+
+Why: /api/bookings loaded every overlapping Booking (plus user and summary) and
+expanded academy bookings day-by-day in Python with strftime('%A') to find the
+cells they occupy. For 3-month ranges with a few long academies that dominated
+matrix latency. Materializing one row per occupied (date, slot) at write time
+turns the matrix read into a single range scan on the primary key.
+
+Structure:
+  - booking_slot_days (slot_date, time_slot, booking_id, is_cancelled)
+      PK (slot_date, time_slot, booking_id) doubles as the range-scan index.
+      FK to bookings ON DELETE CASCADE so hard deletes need no extra work.
+  - public.sync_booking_slot_days(p_booking_id integer)
+      Rewrites the occupancy rows for one booking: a single row for NORMAL
+      bookings, or every matching day of the academy range (honouring
+      academy_days_of_week, same rules as the old Python expansion).
+  - public.trg_bookings_sync_slot_days()
+      AFTER INSERT/UPDATE on bookings. Only re-expands when a scheduling column
+      changes; a cancel/restore just flips is_cancelled in place.
+  - One-time backfill for every existing booking.
+
+Idempotent: CREATE TABLE / INDEX IF NOT EXISTS, CREATE OR REPLACE FUNCTION and
+DROP TRIGGER IF EXISTS — safe to re-run.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'b7c8d9e0f1a2'
+down_revision: Union[str, None] = 'a1b2c3d4e5f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SYNC_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.sync_booking_slot_days(p_booking_id integer)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM booking_slot_days WHERE booking_id = p_booking_id;
+
+    INSERT INTO booking_slot_days (slot_date, time_slot, booking_id, is_cancelled)
+    SELECT d::date, b.time_slot, b.id, COALESCE(b.is_cancelled, FALSE)
+    FROM bookings b
+    CROSS JOIN LATERAL generate_series(
+        CASE WHEN b.booking_type = 'ACADEMY'
+                  AND b.academy_start_date IS NOT NULL AND b.academy_end_date IS NOT NULL
+             THEN b.academy_start_date ELSE b.booking_date END,
+        CASE WHEN b.booking_type = 'ACADEMY'
+                  AND b.academy_start_date IS NOT NULL AND b.academy_end_date IS NOT NULL
+             THEN b.academy_end_date ELSE b.booking_date END,
+        interval '1 day'
+    ) AS d
+    WHERE b.id = p_booking_id
+      AND (
+          b.booking_type <> 'ACADEMY'
+          OR b.academy_days_of_week IS NULL
+          OR btrim(b.academy_days_of_week) = ''
+          OR upper(to_char(d, 'FMDay')) = ANY (
+              string_to_array(upper(replace(b.academy_days_of_week, ' ', '')), ',')
+          )
+      )
+    ON CONFLICT DO NOTHING;
+END;
+$$;
+"""
+
+TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_bookings_sync_slot_days()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND NEW.booking_date IS NOT DISTINCT FROM OLD.booking_date
+       AND NEW.time_slot IS NOT DISTINCT FROM OLD.time_slot
+       AND NEW.booking_type IS NOT DISTINCT FROM OLD.booking_type
+       AND NEW.academy_start_date IS NOT DISTINCT FROM OLD.academy_start_date
+       AND NEW.academy_end_date IS NOT DISTINCT FROM OLD.academy_end_date
+       AND NEW.academy_days_of_week IS NOT DISTINCT FROM OLD.academy_days_of_week
+    THEN
+        -- Schedule unchanged: a cancel/restore only flips the flag in place.
+        IF NEW.is_cancelled IS DISTINCT FROM OLD.is_cancelled THEN
+            UPDATE booking_slot_days
+            SET is_cancelled = COALESCE(NEW.is_cancelled, FALSE)
+            WHERE booking_id = NEW.id;
+        END IF;
+        RETURN NEW;
+    END IF;
+
+    PERFORM public.sync_booking_slot_days(NEW.id);
+    RETURN NEW;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS booking_slot_days (
+            slot_date DATE NOT NULL,
+            time_slot VARCHAR NOT NULL,
+            booking_id INTEGER NOT NULL REFERENCES bookings(id) ON DELETE CASCADE,
+            is_cancelled BOOLEAN NOT NULL DEFAULT FALSE,
+            PRIMARY KEY (slot_date, time_slot, booking_id)
+        );
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_booking_slot_days_booking ON booking_slot_days (booking_id);")
+
+    op.execute(SYNC_FUNCTION_SQL)
+    op.execute(TRIGGER_FUNCTION_SQL)
+
+    op.execute("DROP TRIGGER IF EXISTS bookings_sync_slot_days ON bookings;")
+    op.execute("""
+        CREATE TRIGGER bookings_sync_slot_days
+        AFTER INSERT OR UPDATE ON bookings
+        FOR EACH ROW EXECUTE FUNCTION public.trg_bookings_sync_slot_days();
+    """)
+
+    # Backfill every existing booking through the same function the trigger uses.
+    op.execute("""
+        DO $$
+        DECLARE
+            r record;
+        BEGIN
+            FOR r IN SELECT id FROM bookings LOOP
+                PERFORM public.sync_booking_slot_days(r.id);
+            END LOOP;
+        END $$;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS bookings_sync_slot_days ON bookings;")
+    op.execute("DROP FUNCTION IF EXISTS public.trg_bookings_sync_slot_days();")
+    op.execute("DROP FUNCTION IF EXISTS public.sync_booking_slot_days(integer);")
+    op.execute("DROP TABLE IF EXISTS booking_slot_days;")
@@ -0,0 +1,36 @@
+"""(created_at, id) index for keyset pagination of the transactions list
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2026-10-17 00:00:12.000000
+
+Why: /transactions_list now pages newest-first with a keyset cursor,
+WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC.
+idx_transaction_created alone orders by created_at but leaves ties to a
+sort and can't take the row comparison as an index condition. With
+(created_at, id), each page is a backward index range scan that stops after
+`limit` rows, so page 1000 costs the same as page 1, and the NDJSON stream
+reads in index order with no sort step.
+
+Idempotent: CREATE INDEX IF NOT EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'b9c0d1e2f3a4'
+down_revision: Union[str, None] = 'a8b9c0d1e2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transaction_created_id
+            ON transactions (created_at, id);
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_transaction_created_id;")
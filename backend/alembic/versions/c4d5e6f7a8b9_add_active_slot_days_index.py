@@ -0,0 +1,37 @@
+"""Partial index of active occupancy cells for availability search
+
+Revision ID: c4d5e6f7a8b9
+Revises: b3c4d5e6f7a8
+Create Date: 2026-10-17 00:00:07.000000
+
+Why: /api/availability/search generates every (date, slot) cell in the window
+and anti-joins it against booking_slot_days to keep only the free ones. The
+primary key (slot_date, time_slot, booking_id) can find the rows, but it still
+has to visit the heap to check is_cancelled. This index holds only the
+occupied (not cancelled) cells, so each probe is an index-only lookup. A
+3-month search stays a few hundred index probes instead of expanding
+bookings.
+
+Idempotent: CREATE INDEX IF NOT EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'c4d5e6f7a8b9'
+down_revision: Union[str, None] = 'b3c4d5e6f7a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_booking_slot_days_active
+            ON booking_slot_days (slot_date, time_slot)
+            WHERE NOT is_cancelled;
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_booking_slot_days_active;")
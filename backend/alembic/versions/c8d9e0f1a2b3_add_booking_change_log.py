@@ -0,0 +1,299 @@
+"""Monotonic booking change log for delta matrix sync
+
+Revision ID: c8d9e0f1a2b3
+Revises: b7c8d9e0f1a2
+Create Date: 2026-10-17 00:00:01.000000
+
+Why: every booking mutation and every SWR revalidation re-sent the whole
+visible matrix. Recording which (date, slot) cells changed under a global,
+monotonic sequence lets /api/bookings?since=<seq> return only those cells.
+
+Structure:
+  - booking_change_counter: single row holding the current sequence. Writers
+      bump it once per transaction and keep the row lock until commit, so
+      sequence order == commit order and a reader that saw seq N is guaranteed
+      to have seen every change <= N (no gaps from in-flight transactions).
+      pruned_through records the oldest sequence still answerable as a delta.
+  - booking_changes (seq, slot_date, time_slot, booking_id, changed_at)
+      One row per touched cell per transaction.
+  - public.next_booking_change_seq()       -> seq for the current transaction.
+  - public.log_booking_cells(p_booking_id) -> log every cell a booking holds.
+  - Trigger booking_slot_days_log_change: any occupancy insert/update/delete
+      (new booking, reschedule, cancel/restore, cascade from hard delete).
+  - trg_bookings_sync_slot_days is replaced so display-only edits (name,
+      phone, notes) that leave the schedule untouched are logged too.
+  - Trigger transaction_summaries_log_change: status / paid totals shown in
+      the matrix change with every payment.
+  - public.prune_booking_changes(p_keep interval): drops old rows and advances
+      pruned_through; clients with an older cursor get a full matrix instead.
+  - Triggers bookings_take_change_seq / transaction_summaries_take_change_seq:
+      BEFORE ... FOR EACH STATEMENT, they bump the counter before the
+      statement locks any booking or summary row. Without them the order
+      depended on the path: a reschedule locked the counter (slot-days
+      trigger) and then the summary row, while a payment locked the summary
+      row and then waited on the counter, and the two could deadlock. Now the
+      counter is always the first of those locks a transaction takes.
+
+Idempotent: IF NOT EXISTS / CREATE OR REPLACE / DROP TRIGGER IF EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'c8d9e0f1a2b3'
+down_revision: Union[str, None] = 'b7c8d9e0f1a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NEXT_SEQ_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.next_booking_change_seq()
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_seq bigint;
+    v_xid bigint;
+BEGIN
+    -- Once this transaction has bumped the counter it already holds the row
+    -- lock, so the cheap read below is race-free; reuse the same sequence.
+    SELECT seq, last_xid INTO v_seq, v_xid FROM booking_change_counter WHERE id = 1;
+    IF v_xid = txid_current() THEN
+        RETURN v_seq;
+    END IF;
+
+    UPDATE booking_change_counter
+    SET seq = seq + 1, last_xid = txid_current()
+    WHERE id = 1
+    RETURNING seq INTO v_seq;
+    RETURN v_seq;
+END;
+$$;
+"""
+
+LOG_CELLS_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.log_booking_cells(p_booking_id integer)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO booking_changes (seq, slot_date, time_slot, booking_id)
+    SELECT public.next_booking_change_seq(), slot_date, time_slot, booking_id
+    FROM booking_slot_days
+    WHERE booking_id = p_booking_id
+    ON CONFLICT DO NOTHING;
+END;
+$$;
+"""
+
+SLOT_DAYS_LOG_TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_booking_slot_days_log_change()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO booking_changes (seq, slot_date, time_slot, booking_id)
+        VALUES (public.next_booking_change_seq(), OLD.slot_date, OLD.time_slot, OLD.booking_id)
+        ON CONFLICT DO NOTHING;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO booking_changes (seq, slot_date, time_slot, booking_id)
+        VALUES (public.next_booking_change_seq(), NEW.slot_date, NEW.time_slot, NEW.booking_id)
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+"""
+
+TAKE_SEQ_TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_take_booking_change_seq()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM public.next_booking_change_seq();
+    RETURN NULL;
+END;
+$$;
+"""
+
+SUMMARY_LOG_TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_transaction_summaries_log_change()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM public.log_booking_cells(OLD.booking_id);
+    ELSE
+        PERFORM public.log_booking_cells(NEW.booking_id);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+"""
+
+BOOKINGS_TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_bookings_sync_slot_days()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND NEW.booking_date IS NOT DISTINCT FROM OLD.booking_date
+       AND NEW.time_slot IS NOT DISTINCT FROM OLD.time_slot
+       AND NEW.booking_type IS NOT DISTINCT FROM OLD.booking_type
+       AND NEW.academy_start_date IS NOT DISTINCT FROM OLD.academy_start_date
+       AND NEW.academy_end_date IS NOT DISTINCT FROM OLD.academy_end_date
+       AND NEW.academy_days_of_week IS NOT DISTINCT FROM OLD.academy_days_of_week
+    THEN
+        -- Schedule unchanged: a cancel/restore only flips the flag in place
+        -- (logged by the booking_slot_days trigger); other visible edits are
+        -- logged against the booking's existing cells.
+        IF NEW.is_cancelled IS DISTINCT FROM OLD.is_cancelled THEN
+            UPDATE booking_slot_days
+            SET is_cancelled = COALESCE(NEW.is_cancelled, FALSE)
+            WHERE booking_id = NEW.id;
+        ELSIF NEW.name IS DISTINCT FROM OLD.name
+           OR NEW.phone IS DISTINCT FROM OLD.phone
+           OR NEW.academy_notes IS DISTINCT FROM OLD.academy_notes
+           OR NEW.booked_by IS DISTINCT FROM OLD.booked_by
+        THEN
+            PERFORM public.log_booking_cells(NEW.id);
+        END IF;
+        RETURN NEW;
+    END IF;
+
+    PERFORM public.sync_booking_slot_days(NEW.id);
+    RETURN NEW;
+END;
+$$;
+"""
+
+PREVIOUS_BOOKINGS_TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_bookings_sync_slot_days()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND NEW.booking_date IS NOT DISTINCT FROM OLD.booking_date
+       AND NEW.time_slot IS NOT DISTINCT FROM OLD.time_slot
+       AND NEW.booking_type IS NOT DISTINCT FROM OLD.booking_type
+       AND NEW.academy_start_date IS NOT DISTINCT FROM OLD.academy_start_date
+       AND NEW.academy_end_date IS NOT DISTINCT FROM OLD.academy_end_date
+       AND NEW.academy_days_of_week IS NOT DISTINCT FROM OLD.academy_days_of_week
+    THEN
+        IF NEW.is_cancelled IS DISTINCT FROM OLD.is_cancelled THEN
+            UPDATE booking_slot_days
+            SET is_cancelled = COALESCE(NEW.is_cancelled, FALSE)
+            WHERE booking_id = NEW.id;
+        END IF;
+        RETURN NEW;
+    END IF;
+
+    PERFORM public.sync_booking_slot_days(NEW.id);
+    RETURN NEW;
+END;
+$$;
+"""
+
+PRUNE_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.prune_booking_changes(p_keep interval)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_max_pruned bigint;
+BEGIN
+    WITH pruned AS (
+        DELETE FROM booking_changes
+        WHERE changed_at < now() - p_keep
+        RETURNING seq
+    )
+    SELECT MAX(seq) INTO v_max_pruned FROM pruned;
+
+    IF v_max_pruned IS NOT NULL THEN
+        UPDATE booking_change_counter
+        SET pruned_through = GREATEST(pruned_through, v_max_pruned)
+        WHERE id = 1;
+    END IF;
+    RETURN COALESCE(v_max_pruned, 0);
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS booking_change_counter (
+            id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+            seq BIGINT NOT NULL DEFAULT 0,
+            last_xid BIGINT,
+            pruned_through BIGINT NOT NULL DEFAULT 0
+        );
+    """)
+    op.execute("INSERT INTO booking_change_counter (id) VALUES (1) ON CONFLICT DO NOTHING;")
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS booking_changes (
+            seq BIGINT NOT NULL,
+            slot_date DATE NOT NULL,
+            time_slot VARCHAR NOT NULL,
+            booking_id INTEGER NOT NULL,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (seq, slot_date, time_slot, booking_id)
+        );
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_booking_changes_changed_at ON booking_changes (changed_at);")
+
+    op.execute(NEXT_SEQ_FUNCTION_SQL)
+    op.execute(LOG_CELLS_FUNCTION_SQL)
+    op.execute(SLOT_DAYS_LOG_TRIGGER_FUNCTION_SQL)
+    op.execute(SUMMARY_LOG_TRIGGER_FUNCTION_SQL)
+    op.execute(TAKE_SEQ_TRIGGER_FUNCTION_SQL)
+    op.execute(BOOKINGS_TRIGGER_FUNCTION_SQL)
+    op.execute(PRUNE_FUNCTION_SQL)
+
+    op.execute("DROP TRIGGER IF EXISTS booking_slot_days_log_change ON booking_slot_days;")
+    op.execute("""
+        CREATE TRIGGER booking_slot_days_log_change
+        AFTER INSERT OR UPDATE OR DELETE ON booking_slot_days
+        FOR EACH ROW EXECUTE FUNCTION public.trg_booking_slot_days_log_change();
+    """)
+    op.execute("DROP TRIGGER IF EXISTS transaction_summaries_log_change ON transaction_summaries;")
+    op.execute("""
+        CREATE TRIGGER transaction_summaries_log_change
+        AFTER INSERT OR UPDATE OR DELETE ON transaction_summaries
+        FOR EACH ROW EXECUTE FUNCTION public.trg_transaction_summaries_log_change();
+    """)
+    op.execute("DROP TRIGGER IF EXISTS bookings_take_change_seq ON bookings;")
+    op.execute("""
+        CREATE TRIGGER bookings_take_change_seq
+        BEFORE UPDATE OR DELETE ON bookings
+        FOR EACH STATEMENT EXECUTE FUNCTION public.trg_take_booking_change_seq();
+    """)
+    op.execute("DROP TRIGGER IF EXISTS transaction_summaries_take_change_seq ON transaction_summaries;")
+    op.execute("""
+        CREATE TRIGGER transaction_summaries_take_change_seq
+        BEFORE INSERT OR UPDATE OR DELETE ON transaction_summaries
+        FOR EACH STATEMENT EXECUTE FUNCTION public.trg_take_booking_change_seq();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS transaction_summaries_take_change_seq ON transaction_summaries;")
+    op.execute("DROP TRIGGER IF EXISTS bookings_take_change_seq ON bookings;")
+    op.execute("DROP TRIGGER IF EXISTS transaction_summaries_log_change ON transaction_summaries;")
+    op.execute("DROP TRIGGER IF EXISTS booking_slot_days_log_change ON booking_slot_days;")
+    op.execute(PREVIOUS_BOOKINGS_TRIGGER_FUNCTION_SQL)
+    op.execute("DROP FUNCTION IF EXISTS public.prune_booking_changes(interval);")
+    op.execute("DROP FUNCTION IF EXISTS public.trg_transaction_summaries_log_change();")
+    op.execute("DROP FUNCTION IF EXISTS public.trg_take_booking_change_seq();")
+    op.execute("DROP FUNCTION IF EXISTS public.trg_booking_slot_days_log_change();")
+    op.execute("DROP FUNCTION IF EXISTS public.log_booking_cells(integer);")
+    op.execute("DROP FUNCTION IF EXISTS public.next_booking_change_seq();")
+    op.execute("DROP TABLE IF EXISTS booking_changes;")
+    op.execute("DROP TABLE IF EXISTS booking_change_counter;")
@@ -0,0 +1,60 @@
+"""Slot holds: temporary TTL claims on a cell during checkout
+
+Revision ID: d5e6f7a8b9c0
+Revises: c4d5e6f7a8b9
+Create Date: 2026-10-17 00:00:08.000000
+
+Why: the customer booking flow has to keep a slot while a bKash payment
+completes, and let it go if the payment times out. Nothing could express a
+temporary claim, so two customers could both pay for the same evening slot.
+
+Structure:
+  - slot_holds (hold_token, slot_date, time_slot, name, phone, held_by,
+      version, created_at, expires_at)
+      uq_slot_holds_cell UNIQUE (slot_date, time_slot) makes taking a hold a
+      single INSERT ... ON CONFLICT DO UPDATE ... WHERE expires_at <= now().
+      Concurrent customers on the same cell contend only on that one index
+      entry for one statement. No counter row or booking row is locked, and
+      an expired hold is taken over in place without waiting for the sweeper.
+  - slot_holds_version_seq: a new value on every insert and takeover.
+      Sequences are non-transactional and never block. (count, max version)
+      of the active holds in a window is part of the matrix ETag, so holds
+      don't go through the booking_change_counter row lock.
+  - idx_slot_holds_expires_at: the sweeper's range scan for expired rows.
+
+Idempotent: CREATE ... IF NOT EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'd5e6f7a8b9c0'
+down_revision: Union[str, None] = 'c4d5e6f7a8b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE SEQUENCE IF NOT EXISTS slot_holds_version_seq;")
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS slot_holds (
+            id SERIAL PRIMARY KEY,
+            hold_token VARCHAR NOT NULL UNIQUE,
+            slot_date DATE NOT NULL,
+            time_slot VARCHAR NOT NULL,
+            name VARCHAR NOT NULL,
+            phone VARCHAR NOT NULL,
+            held_by INTEGER REFERENCES users (id),
+            version BIGINT NOT NULL DEFAULT nextval('slot_holds_version_seq'),
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            expires_at TIMESTAMPTZ NOT NULL,
+            CONSTRAINT uq_slot_holds_cell UNIQUE (slot_date, time_slot)
+        );
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_slot_holds_expires_at ON slot_holds (expires_at);")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS slot_holds;")
+    op.execute("DROP SEQUENCE IF EXISTS slot_holds_version_seq;")
@@ -0,0 +1,33 @@
+"""Index booking_changes by (slot_date, seq) for per-range matrix versions
+
+Revision ID: d9e0f1a2b3c4
+Revises: c8d9e0f1a2b3
+Create Date: 2026-10-17 00:00:02.000000
+
+Why: /api/bookings answers If-None-Match by computing the highest change
+sequence logged inside the requested window. With this index that is a short
+index-only scan per date instead of walking the whole change log, so a 304
+costs one tiny query and never builds the matrix.
+
+Idempotent: CREATE INDEX IF NOT EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'd9e0f1a2b3c4'
+down_revision: Union[str, None] = 'c8d9e0f1a2b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_booking_changes_slot_date_seq
+            ON booking_changes (slot_date, seq);
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_booking_changes_slot_date_seq;")
@@ -0,0 +1,56 @@
+"""NOTIFY booking_matrix on every logged matrix change
+
+Revision ID: e0f1a2b3c4d5
+Revises: d9e0f1a2b3c4
+Create Date: 2026-10-17 00:00:03.000000
+
+Why: admins with the matrix open only saw each other's changes by refetching
+/api/bookings. Each uvicorn worker now keeps one LISTEN connection and pushes
+changed cells to its open SSE streams (/api/bookings/stream). Raising the
+NOTIFY from the change log means every writer is covered — booking routes,
+payment routes (via the summary trigger) and manual SQL alike — and delivery
+happens only on commit.
+
+The payload is just the change sequence. NOTIFY folds identical payloads sent
+within one transaction, so an academy edit touching 60 cells still produces a
+single notification; listeners read the touched cells from booking_changes.
+
+Idempotent: CREATE OR REPLACE FUNCTION / DROP TRIGGER IF EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'e0f1a2b3c4d5'
+down_revision: Union[str, None] = 'd9e0f1a2b3c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NOTIFY_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_booking_changes_notify()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('booking_matrix', NEW.seq::text);
+    RETURN NULL;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(NOTIFY_FUNCTION_SQL)
+    op.execute("DROP TRIGGER IF EXISTS booking_changes_notify ON booking_changes;")
+    op.execute("""
+        CREATE TRIGGER booking_changes_notify
+        AFTER INSERT ON booking_changes
+        FOR EACH ROW EXECUTE FUNCTION public.trg_booking_changes_notify();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS booking_changes_notify ON booking_changes;")
+    op.execute("DROP FUNCTION IF EXISTS public.trg_booking_changes_notify();")
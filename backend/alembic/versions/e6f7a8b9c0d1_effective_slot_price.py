@@ -0,0 +1,357 @@
+"""Single price-precedence rule in SQL, matching app/pricing.py
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2026-10-17 00:00:09.000000
+
+Why: each price lookup picked its own winner. recalc_transaction_summary and
+the bulk-series insert took default rows first, so a promotional window never
+priced a booking. /current_slot_prices preferred the promotion. The academy
+quote ignored windows altogether. Python now resolves every price through
+app/pricing.py (PriceEngine). This migration gives SQL the same rule once, so
+totals the summary trigger fills in agree with Python to the row.
+
+Structure:
+  - public.effective_slot_price(p_time_slot, p_date, p_academy) -> price
+      Rows for the slot and the date's weekday that apply on the date
+      (window covers it, or no window), best first:
+        ACADEMY rows before NORMAL/NULL rows when p_academy;
+        non-default row with a window (promotion), latest start first;
+        default row without a window;
+        default row with a window;
+        non-default row without a window;
+        ties by id.
+  - public.recalc_transaction_summary: first-time total_price now comes from
+      effective_slot_price (academy bookings get the academy rate).
+  - Trigger slot_prices_notify (AFTER ..., FOR EACH STATEMENT) raises
+      NOTIFY slot_prices. Every worker's PriceEngine and availability snapshot
+      hear about a price edit made on any other worker.
+
+Idempotent: CREATE OR REPLACE / DROP TRIGGER IF EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'e6f7a8b9c0d1'
+down_revision: Union[str, None] = 'd5e6f7a8b9c0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+EFFECTIVE_PRICE_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.effective_slot_price(
+    p_time_slot varchar, p_date date, p_academy boolean DEFAULT FALSE
+)
+RETURNS double precision
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT price
+    FROM slot_prices
+    WHERE time_slot = p_time_slot
+      AND day_of_week = upper(to_char(p_date, 'FMDay'))::dayofweek
+      AND (booking_type IS DISTINCT FROM 'ACADEMY' OR p_academy)
+      AND (
+          (start_date <= p_date AND end_date >= p_date)
+          OR (start_date IS NULL AND end_date IS NULL)
+      )
+    ORDER BY
+        (booking_type = 'ACADEMY') IS TRUE DESC,
+        CASE
+            WHEN NOT COALESCE(is_default, FALSE) AND start_date IS NOT NULL THEN 0
+            WHEN COALESCE(is_default, FALSE) AND start_date IS NULL THEN 1
+            WHEN COALESCE(is_default, FALSE) THEN 2
+            ELSE 3
+        END,
+        start_date DESC NULLS LAST,
+        id
+    LIMIT 1;
+$$;
+"""
+
+PRICE_NOTIFY_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_slot_prices_notify()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('slot_prices', '');
+    RETURN NULL;
+END;
+$$;
+"""
+
+RECALC_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.recalc_transaction_summary(p_booking_id integer)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count integer;
+    v_booking bookings%ROWTYPE;
+    v_total_price double precision;
+    v_existing_total_price double precision;
+BEGIN
+    -- If no transactions remain for this booking, drop any summary row.
+    SELECT COUNT(*) INTO v_count FROM transactions WHERE booking_id = p_booking_id;
+    IF v_count = 0 THEN
+        DELETE FROM transaction_summaries WHERE booking_id = p_booking_id;
+        RETURN;
+    END IF;
+
+    SELECT * INTO v_booking FROM bookings WHERE id = p_booking_id;
+    IF NOT FOUND THEN
+        -- Orphan transactions (shouldn't happen with FK, but be defensive).
+        RETURN;
+    END IF;
+
+    -- Reuse existing total_price if the summary already exists; otherwise take
+    -- the effective price, resolved exactly as app/pricing.py resolves it.
+    SELECT total_price INTO v_existing_total_price
+        FROM transaction_summaries WHERE booking_id = p_booking_id;
+
+    IF v_existing_total_price IS NULL THEN
+        v_total_price := public.effective_slot_price(
+            v_booking.time_slot, v_booking.booking_date, v_booking.booking_type = 'ACADEMY'
+        );
+
+        IF v_total_price IS NULL THEN
+            v_total_price := 0;
+        END IF;
+    ELSE
+        v_total_price := v_existing_total_price;
+    END IF;
+
+    INSERT INTO transaction_summaries (
+        booking_id, total_price,
+        total_paid, discount, other_adjustments, leftover,
+        booking_payment, booking_payment_date, slot_payment,
+        cash_payment, bkash_payment, nagad_payment, card_payment, bank_transfer_payment,
+        booking_cash_payment, booking_bkash_payment, booking_nagad_payment,
+        booking_card_payment, booking_bank_transfer_payment,
+        slot_cash_payment, slot_bkash_payment, slot_nagad_payment,
+        slot_card_payment, slot_bank_transfer_payment,
+        status, updated_at
+    )
+    SELECT
+        p_booking_id,
+        v_total_price,
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type IN ('BOOKING_PAYMENT','SLOT_PAYMENT')), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'DISCOUNT'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'OTHER_ADJUSTMENT'), 0),
+        v_total_price
+            - COALESCE(SUM(amount) FILTER (WHERE transaction_type IN ('BOOKING_PAYMENT','SLOT_PAYMENT')), 0)
+            - COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'DISCOUNT'), 0)
+            - COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'OTHER_ADJUSTMENT'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT'), 0),
+        (SELECT MIN(created_at::date) FROM transactions
+            WHERE booking_id = p_booking_id AND transaction_type = 'BOOKING_PAYMENT'),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE payment_method = 'CASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE payment_method = 'BKASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE payment_method = 'NAGAD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE payment_method = 'CARD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE payment_method = 'BANK_TRANSFER'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'CASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'BKASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'NAGAD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'CARD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'BANK_TRANSFER'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'CASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'BKASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'NAGAD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'CARD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'BANK_TRANSFER'), 0),
+        CASE
+            WHEN v_total_price
+                - COALESCE(SUM(amount) FILTER (WHERE transaction_type IN ('BOOKING_PAYMENT','SLOT_PAYMENT')), 0)
+                - COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'DISCOUNT'), 0)
+                - COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'OTHER_ADJUSTMENT'), 0) <= 0
+                THEN 'SUCCESSFUL'::transactionstatus
+            WHEN COALESCE(SUM(amount) FILTER (WHERE transaction_type IN ('BOOKING_PAYMENT','SLOT_PAYMENT')), 0) > 0
+                THEN 'PARTIAL'::transactionstatus
+            ELSE 'PENDING'::transactionstatus
+        END,
+        NOW()
+    FROM transactions
+    WHERE booking_id = p_booking_id
+    ON CONFLICT (booking_id) DO UPDATE SET
+        total_paid = EXCLUDED.total_paid,
+        discount = EXCLUDED.discount,
+        other_adjustments = EXCLUDED.other_adjustments,
+        leftover = EXCLUDED.leftover,
+        booking_payment = EXCLUDED.booking_payment,
+        booking_payment_date = EXCLUDED.booking_payment_date,
+        slot_payment = EXCLUDED.slot_payment,
+        cash_payment = EXCLUDED.cash_payment,
+        bkash_payment = EXCLUDED.bkash_payment,
+        nagad_payment = EXCLUDED.nagad_payment,
+        card_payment = EXCLUDED.card_payment,
+        bank_transfer_payment = EXCLUDED.bank_transfer_payment,
+        booking_cash_payment = EXCLUDED.booking_cash_payment,
+        booking_bkash_payment = EXCLUDED.booking_bkash_payment,
+        booking_nagad_payment = EXCLUDED.booking_nagad_payment,
+        booking_card_payment = EXCLUDED.booking_card_payment,
+        booking_bank_transfer_payment = EXCLUDED.booking_bank_transfer_payment,
+        slot_cash_payment = EXCLUDED.slot_cash_payment,
+        slot_bkash_payment = EXCLUDED.slot_bkash_payment,
+        slot_nagad_payment = EXCLUDED.slot_nagad_payment,
+        slot_card_payment = EXCLUDED.slot_card_payment,
+        slot_bank_transfer_payment = EXCLUDED.slot_bank_transfer_payment,
+        status = EXCLUDED.status,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$;
+"""
+
+PREVIOUS_RECALC_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.recalc_transaction_summary(p_booking_id integer)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count integer;
+    v_booking bookings%ROWTYPE;
+    v_total_price double precision;
+    v_existing_total_price double precision;
+BEGIN
+    -- If no transactions remain for this booking, drop any summary row.
+    SELECT COUNT(*) INTO v_count FROM transactions WHERE booking_id = p_booking_id;
+    IF v_count = 0 THEN
+        DELETE FROM transaction_summaries WHERE booking_id = p_booking_id;
+        RETURN;
+    END IF;
+
+    SELECT * INTO v_booking FROM bookings WHERE id = p_booking_id;
+    IF NOT FOUND THEN
+        -- Orphan transactions (shouldn't happen with FK, but be defensive).
+        RETURN;
+    END IF;
+
+    -- Reuse existing total_price if the summary already exists; otherwise derive
+    -- from the slot_prices table using the same lookup the Python code used.
+    SELECT total_price INTO v_existing_total_price
+        FROM transaction_summaries WHERE booking_id = p_booking_id;
+
+    IF v_existing_total_price IS NULL THEN
+        SELECT price INTO v_total_price
+        FROM slot_prices
+        WHERE time_slot = v_booking.time_slot
+          AND day_of_week = upper(to_char(v_booking.booking_date, 'FMDay'))::dayofweek
+          AND (
+              (start_date <= v_booking.booking_date AND end_date >= v_booking.booking_date)
+              OR (start_date IS NULL AND end_date IS NULL)
+          )
+        ORDER BY is_default DESC
+        LIMIT 1;
+
+        IF v_total_price IS NULL THEN
+            v_total_price := 0;
+        END IF;
+    ELSE
+        v_total_price := v_existing_total_price;
+    END IF;
+
+    INSERT INTO transaction_summaries (
+        booking_id, total_price,
+        total_paid, discount, other_adjustments, leftover,
+        booking_payment, booking_payment_date, slot_payment,
+        cash_payment, bkash_payment, nagad_payment, card_payment, bank_transfer_payment,
+        booking_cash_payment, booking_bkash_payment, booking_nagad_payment,
+        booking_card_payment, booking_bank_transfer_payment,
+        slot_cash_payment, slot_bkash_payment, slot_nagad_payment,
+        slot_card_payment, slot_bank_transfer_payment,
+        status, updated_at
+    )
+    SELECT
+        p_booking_id,
+        v_total_price,
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type IN ('BOOKING_PAYMENT','SLOT_PAYMENT')), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'DISCOUNT'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'OTHER_ADJUSTMENT'), 0),
+        v_total_price
+            - COALESCE(SUM(amount) FILTER (WHERE transaction_type IN ('BOOKING_PAYMENT','SLOT_PAYMENT')), 0)
+            - COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'DISCOUNT'), 0)
+            - COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'OTHER_ADJUSTMENT'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT'), 0),
+        (SELECT MIN(created_at::date) FROM transactions
+            WHERE booking_id = p_booking_id AND transaction_type = 'BOOKING_PAYMENT'),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE payment_method = 'CASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE payment_method = 'BKASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE payment_method = 'NAGAD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE payment_method = 'CARD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE payment_method = 'BANK_TRANSFER'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'CASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'BKASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'NAGAD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'CARD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'BANK_TRANSFER'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'CASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'BKASH'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'NAGAD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'CARD'), 0),
+        COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'BANK_TRANSFER'), 0),
+        CASE
+            WHEN v_total_price
+                - COALESCE(SUM(amount) FILTER (WHERE transaction_type IN ('BOOKING_PAYMENT','SLOT_PAYMENT')), 0)
+                - COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'DISCOUNT'), 0)
+                - COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'OTHER_ADJUSTMENT'), 0) <= 0
+                THEN 'SUCCESSFUL'::transactionstatus
+            WHEN COALESCE(SUM(amount) FILTER (WHERE transaction_type IN ('BOOKING_PAYMENT','SLOT_PAYMENT')), 0) > 0
+                THEN 'PARTIAL'::transactionstatus
+            ELSE 'PENDING'::transactionstatus
+        END,
+        NOW()
+    FROM transactions
+    WHERE booking_id = p_booking_id
+    ON CONFLICT (booking_id) DO UPDATE SET
+        total_paid = EXCLUDED.total_paid,
+        discount = EXCLUDED.discount,
+        other_adjustments = EXCLUDED.other_adjustments,
+        leftover = EXCLUDED.leftover,
+        booking_payment = EXCLUDED.booking_payment,
+        booking_payment_date = EXCLUDED.booking_payment_date,
+        slot_payment = EXCLUDED.slot_payment,
+        cash_payment = EXCLUDED.cash_payment,
+        bkash_payment = EXCLUDED.bkash_payment,
+        nagad_payment = EXCLUDED.nagad_payment,
+        card_payment = EXCLUDED.card_payment,
+        bank_transfer_payment = EXCLUDED.bank_transfer_payment,
+        booking_cash_payment = EXCLUDED.booking_cash_payment,
+        booking_bkash_payment = EXCLUDED.booking_bkash_payment,
+        booking_nagad_payment = EXCLUDED.booking_nagad_payment,
+        booking_card_payment = EXCLUDED.booking_card_payment,
+        booking_bank_transfer_payment = EXCLUDED.booking_bank_transfer_payment,
+        slot_cash_payment = EXCLUDED.slot_cash_payment,
+        slot_bkash_payment = EXCLUDED.slot_bkash_payment,
+        slot_nagad_payment = EXCLUDED.slot_nagad_payment,
+        slot_card_payment = EXCLUDED.slot_card_payment,
+        slot_bank_transfer_payment = EXCLUDED.slot_bank_transfer_payment,
+        status = EXCLUDED.status,
+        updated_at = EXCLUDED.updated_at;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(EFFECTIVE_PRICE_FUNCTION_SQL)
+    op.execute(RECALC_FUNCTION_SQL)
+
+    op.execute(PRICE_NOTIFY_FUNCTION_SQL)
+    op.execute("DROP TRIGGER IF EXISTS slot_prices_notify ON slot_prices;")
+    op.execute("""
+        CREATE TRIGGER slot_prices_notify
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON slot_prices
+        FOR EACH STATEMENT EXECUTE FUNCTION public.trg_slot_prices_notify();
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS slot_prices_notify ON slot_prices;")
+    op.execute("DROP FUNCTION IF EXISTS public.trg_slot_prices_notify();")
+    op.execute(PREVIOUS_RECALC_FUNCTION_SQL)
+    op.execute("DROP FUNCTION IF EXISTS public.effective_slot_price(varchar, date, boolean);")
@@ -0,0 +1,170 @@
+"""Weekday bitmask for academy schedules
+
+Revision ID: f1a2b3c4d5e6
+Revises: e0f1a2b3c4d5
+Create Date: 2026-10-17 00:00:04.000000
+
+Why: academy_days_of_week is a comma-separated string ("MONDAY,FRIDAY") that
+the price quote, the conflict check, the bulk-booking path and the occupancy
+expansion all re-split and tested day by day. A 7-bit mask lets Python count
+and enumerate matching dates by weekday arithmetic (app/weekdays.py) and lets
+SQL test schedule overlap with a single bitwise AND.
+
+Structure:
+  - bookings.academy_days_mask SMALLINT
+      Bit i = ISO weekday i + 1 (Monday = bit 0 … Sunday = bit 6), the same
+      layout as Python's date.weekday(). 127 for an academy with no day filter,
+      NULL for NORMAL bookings.
+  - public.weekday_mask(p_days text) -> smallint: CSV to mask.
+  - Trigger bookings_days_mask (BEFORE INSERT/UPDATE OF booking_type,
+      academy_days_of_week) keeps the mask derived from the CSV, so no writer
+      can let the two drift apart. The CSV stays the source of truth.
+  - public.sync_booking_slot_days now filters academy days on the mask
+      instead of string_to_array/to_char per generated day.
+  - One-time backfill of the mask for every existing academy booking.
+
+Idempotent: ADD COLUMN IF NOT EXISTS / CREATE OR REPLACE / DROP TRIGGER IF EXISTS.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'f1a2b3c4d5e6'
+down_revision: Union[str, None] = 'e0f1a2b3c4d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+WEEKDAY_MASK_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.weekday_mask(p_days text)
+RETURNS smallint
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT (CASE
+        WHEN p_days IS NULL OR btrim(p_days) = '' THEN 127
+        ELSE COALESCE((
+            SELECT bit_or(1 << (pos - 1))
+            FROM unnest(string_to_array(p_days, ',')) AS day,
+                 LATERAL array_position(
+                     ARRAY['MONDAY','TUESDAY','WEDNESDAY','THURSDAY','FRIDAY','SATURDAY','SUNDAY'],
+                     upper(btrim(day))
+                 ) AS pos
+            WHERE pos IS NOT NULL
+        ), 0)
+    END)::smallint;
+$$;
+"""
+
+MASK_TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_bookings_days_mask()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.academy_days_mask := CASE
+        WHEN NEW.booking_type = 'ACADEMY' THEN public.weekday_mask(NEW.academy_days_of_week)
+        ELSE NULL
+    END;
+    RETURN NEW;
+END;
+$$;
+"""
+
+SYNC_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.sync_booking_slot_days(p_booking_id integer)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM booking_slot_days WHERE booking_id = p_booking_id;
+
+    INSERT INTO booking_slot_days (slot_date, time_slot, booking_id, is_cancelled)
+    SELECT d::date, b.time_slot, b.id, COALESCE(b.is_cancelled, FALSE)
+    FROM bookings b
+    CROSS JOIN LATERAL generate_series(
+        CASE WHEN b.booking_type = 'ACADEMY'
+                  AND b.academy_start_date IS NOT NULL AND b.academy_end_date IS NOT NULL
+             THEN b.academy_start_date ELSE b.booking_date END,
+        CASE WHEN b.booking_type = 'ACADEMY'
+                  AND b.academy_start_date IS NOT NULL AND b.academy_end_date IS NOT NULL
+             THEN b.academy_end_date ELSE b.booking_date END,
+        interval '1 day'
+    ) AS d
+    WHERE b.id = p_booking_id
+      AND (
+          b.booking_type <> 'ACADEMY'
+          OR (COALESCE(b.academy_days_mask, 127) >> (extract(isodow FROM d)::int - 1)) & 1 = 1
+      )
+    ON CONFLICT DO NOTHING;
+END;
+$$;
+"""
+
+PREVIOUS_SYNC_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.sync_booking_slot_days(p_booking_id integer)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM booking_slot_days WHERE booking_id = p_booking_id;
+
+    INSERT INTO booking_slot_days (slot_date, time_slot, booking_id, is_cancelled)
+    SELECT d::date, b.time_slot, b.id, COALESCE(b.is_cancelled, FALSE)
+    FROM bookings b
+    CROSS JOIN LATERAL generate_series(
+        CASE WHEN b.booking_type = 'ACADEMY'
+                  AND b.academy_start_date IS NOT NULL AND b.academy_end_date IS NOT NULL
+             THEN b.academy_start_date ELSE b.booking_date END,
+        CASE WHEN b.booking_type = 'ACADEMY'
+                  AND b.academy_start_date IS NOT NULL AND b.academy_end_date IS NOT NULL
+             THEN b.academy_end_date ELSE b.booking_date END,
+        interval '1 day'
+    ) AS d
+    WHERE b.id = p_booking_id
+      AND (
+          b.booking_type <> 'ACADEMY'
+          OR b.academy_days_of_week IS NULL
+          OR btrim(b.academy_days_of_week) = ''
+          OR upper(to_char(d, 'FMDay')) = ANY (
+              string_to_array(upper(replace(b.academy_days_of_week, ' ', '')), ',')
+          )
+      )
+    ON CONFLICT DO NOTHING;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE bookings ADD COLUMN IF NOT EXISTS academy_days_mask SMALLINT;")
+
+    op.execute(WEEKDAY_MASK_FUNCTION_SQL)
+    op.execute(MASK_TRIGGER_FUNCTION_SQL)
+
+    op.execute("DROP TRIGGER IF EXISTS bookings_days_mask ON bookings;")
+    op.execute("""
+        CREATE TRIGGER bookings_days_mask
+        BEFORE INSERT OR UPDATE OF booking_type, academy_days_of_week ON bookings
+        FOR EACH ROW EXECUTE FUNCTION public.trg_bookings_days_mask();
+    """)
+
+    # Backfill. Schedule columns are untouched, so the occupancy trigger
+    # treats these updates as no-ops.
+    op.execute("""
+        UPDATE bookings
+        SET academy_days_mask = public.weekday_mask(academy_days_of_week)
+        WHERE booking_type = 'ACADEMY'
+          AND academy_days_mask IS DISTINCT FROM public.weekday_mask(academy_days_of_week);
+    """)
+
+    op.execute(SYNC_FUNCTION_SQL)
+
+
+def downgrade() -> None:
+    op.execute(PREVIOUS_SYNC_FUNCTION_SQL)
+    op.execute("DROP TRIGGER IF EXISTS bookings_days_mask ON bookings;")
+    op.execute("DROP FUNCTION IF EXISTS public.trg_bookings_days_mask();")
+    op.execute("DROP FUNCTION IF EXISTS public.weekday_mask(text);")
+    op.execute("ALTER TABLE bookings DROP COLUMN IF EXISTS academy_days_mask;")
@@ -0,0 +1,370 @@
+"""Delta-apply transaction_summaries maintenance, plus a drift check
+
+Revision ID: f7a8b9c0d1e2
+Revises: e6f7a8b9c0d1
+Create Date: 2026-10-17 00:00:10.000000
+
+Why: transactions_sync_summary called recalc_transaction_summary for every
+row written. That is a COUNT(*), a booking lookup, a summary lookup and a
+20-column SUM(...) FILTER(...) scan over all of the booking's transactions,
+just to add one payment. A transaction contributes to a fixed set of
+summary columns (its type's, its method's, and its type+method's), so the
+trigger now adds NEW and subtracts OLD from exactly those columns in one
+UPDATE of the summary row.
+
+Structure:
+  - public.txn_amount_if(type, method, amount, want_type, want_method)
+      amount when the transaction counts toward a column (NULL want_* means
+      "any"), else 0. Keeps the delta expressions short.
+  - public.apply_transaction_delta(booking_id, old type/method/amount/date,
+      new type/method/amount/date) -> boolean
+      One UPDATE of the summary row: every column += NEW part - OLD part;
+      leftover and status derived from the new totals exactly as recalc
+      derives them. Every SET expression reads the target row itself, so
+      concurrent payments on one booking serialize on its row lock instead
+      of overwriting each other's totals. booking_payment_date takes LEAST with a new booking
+      payment; only when the removed payment was the earliest one is MIN()
+      re-read, via idx_transaction_booking_type. Returns FALSE when there
+      is no summary row, so the caller can fall back.
+  - public.trg_transactions_sync_summary():
+      INSERT / DELETE / same-booking UPDATE -> apply_transaction_delta.
+      Full recalc only when an UPDATE moves a row to another booking or the
+      summary row is missing. A DELETE of a booking's last transaction
+      still drops the summary (an EXISTS probe, not a COUNT). An UPDATE that
+      touches none of type/method/amount/created_at leaves the summary alone.
+  - public.verify_transaction_summaries() -> (booking_id, field, stored, expected)
+      Full recompute of every booking with transactions, compared against
+      the stored summary; returns only the rows that differ (money to within
+      half a paisa). Empty result = no drift. Run it after bulk loads or in
+      CI against a seeded database; recalc_transaction_summary(id) repairs a
+      booking it reports.
+
+recalc_transaction_summary itself is unchanged and stays the source of truth
+for the fallback paths and for repairs.
+
+Idempotent: CREATE OR REPLACE everywhere; the trigger itself is untouched
+(it already points at trg_transactions_sync_summary).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'f7a8b9c0d1e2'
+down_revision: Union[str, None] = 'e6f7a8b9c0d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+AMOUNT_IF_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.txn_amount_if(
+    p_type transactiontype, p_method paymentmethod, p_amount double precision,
+    p_want_type transactiontype, p_want_method paymentmethod
+)
+RETURNS double precision
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT CASE
+        WHEN p_amount IS NOT NULL
+         AND (p_want_type IS NULL OR p_type = p_want_type)
+         AND (p_want_method IS NULL OR p_method = p_want_method)
+        THEN p_amount
+        ELSE 0
+    END;
+$$;
+"""
+
+DELTA_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.apply_transaction_delta(
+    p_booking_id integer,
+    p_old_type transactiontype, p_old_method paymentmethod, p_old_amount double precision, p_old_date date,
+    p_new_type transactiontype, p_new_method paymentmethod, p_new_amount double precision, p_new_date date
+)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    WITH d AS (
+        SELECT
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'BOOKING_PAYMENT', NULL)
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'BOOKING_PAYMENT', NULL) AS booking,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'SLOT_PAYMENT', NULL)
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'SLOT_PAYMENT', NULL) AS slot,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'DISCOUNT', NULL)
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'DISCOUNT', NULL) AS discount,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'OTHER_ADJUSTMENT', NULL)
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'OTHER_ADJUSTMENT', NULL) AS other,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, NULL, 'CASH')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, NULL, 'CASH') AS cash,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, NULL, 'BKASH')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, NULL, 'BKASH') AS bkash,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, NULL, 'NAGAD')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, NULL, 'NAGAD') AS nagad,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, NULL, 'CARD')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, NULL, 'CARD') AS card,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, NULL, 'BANK_TRANSFER')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, NULL, 'BANK_TRANSFER') AS bank,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'BOOKING_PAYMENT', 'CASH')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'BOOKING_PAYMENT', 'CASH') AS booking_cash,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'BOOKING_PAYMENT', 'BKASH')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'BOOKING_PAYMENT', 'BKASH') AS booking_bkash,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'BOOKING_PAYMENT', 'NAGAD')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'BOOKING_PAYMENT', 'NAGAD') AS booking_nagad,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'BOOKING_PAYMENT', 'CARD')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'BOOKING_PAYMENT', 'CARD') AS booking_card,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'BOOKING_PAYMENT', 'BANK_TRANSFER')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'BOOKING_PAYMENT', 'BANK_TRANSFER') AS booking_bank,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'SLOT_PAYMENT', 'CASH')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'SLOT_PAYMENT', 'CASH') AS slot_cash,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'SLOT_PAYMENT', 'BKASH')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'SLOT_PAYMENT', 'BKASH') AS slot_bkash,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'SLOT_PAYMENT', 'NAGAD')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'SLOT_PAYMENT', 'NAGAD') AS slot_nagad,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'SLOT_PAYMENT', 'CARD')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'SLOT_PAYMENT', 'CARD') AS slot_card,
+            public.txn_amount_if(p_new_type, p_new_method, p_new_amount, 'SLOT_PAYMENT', 'BANK_TRANSFER')
+              - public.txn_amount_if(p_old_type, p_old_method, p_old_amount, 'SLOT_PAYMENT', 'BANK_TRANSFER') AS slot_bank
+    )
+    -- Every new value is computed from s, the row being updated, never from
+    -- a separate read of transaction_summaries: when two payments for one
+    -- booking race, the second UPDATE waits for the first to commit and then
+    -- re-evaluates SET against the committed row, so neither delta is lost.
+    UPDATE transaction_summaries s SET
+        total_paid = COALESCE(s.total_paid, 0) + d.booking + d.slot,
+        discount = COALESCE(s.discount, 0) + d.discount,
+        other_adjustments = COALESCE(s.other_adjustments, 0) + d.other,
+        leftover = s.total_price
+            - (COALESCE(s.total_paid, 0) + d.booking + d.slot)
+            - (COALESCE(s.discount, 0) + d.discount)
+            - (COALESCE(s.other_adjustments, 0) + d.other),
+        booking_payment = COALESCE(s.booking_payment, 0) + d.booking,
+        booking_payment_date = CASE
+            -- The earliest booking payment went away (or moved): re-read MIN.
+            WHEN p_old_type = 'BOOKING_PAYMENT' AND p_old_date <= s.booking_payment_date
+                THEN (SELECT MIN(t.created_at::date) FROM transactions t
+                      WHERE t.booking_id = p_booking_id AND t.transaction_type = 'BOOKING_PAYMENT')
+            WHEN p_new_type = 'BOOKING_PAYMENT'
+                THEN LEAST(s.booking_payment_date, p_new_date)
+            ELSE s.booking_payment_date
+        END,
+        slot_payment = COALESCE(s.slot_payment, 0) + d.slot,
+        cash_payment = COALESCE(s.cash_payment, 0) + d.cash,
+        bkash_payment = COALESCE(s.bkash_payment, 0) + d.bkash,
+        nagad_payment = COALESCE(s.nagad_payment, 0) + d.nagad,
+        card_payment = COALESCE(s.card_payment, 0) + d.card,
+        bank_transfer_payment = COALESCE(s.bank_transfer_payment, 0) + d.bank,
+        booking_cash_payment = COALESCE(s.booking_cash_payment, 0) + d.booking_cash,
+        booking_bkash_payment = COALESCE(s.booking_bkash_payment, 0) + d.booking_bkash,
+        booking_nagad_payment = COALESCE(s.booking_nagad_payment, 0) + d.booking_nagad,
+        booking_card_payment = COALESCE(s.booking_card_payment, 0) + d.booking_card,
+        booking_bank_transfer_payment = COALESCE(s.booking_bank_transfer_payment, 0) + d.booking_bank,
+        slot_cash_payment = COALESCE(s.slot_cash_payment, 0) + d.slot_cash,
+        slot_bkash_payment = COALESCE(s.slot_bkash_payment, 0) + d.slot_bkash,
+        slot_nagad_payment = COALESCE(s.slot_nagad_payment, 0) + d.slot_nagad,
+        slot_card_payment = COALESCE(s.slot_card_payment, 0) + d.slot_card,
+        slot_bank_transfer_payment = COALESCE(s.slot_bank_transfer_payment, 0) + d.slot_bank,
+        status = CASE
+            WHEN s.total_price
+                 - (COALESCE(s.total_paid, 0) + d.booking + d.slot)
+                 - (COALESCE(s.discount, 0) + d.discount)
+                 - (COALESCE(s.other_adjustments, 0) + d.other) <= 0 THEN 'SUCCESSFUL'::transactionstatus
+            WHEN COALESCE(s.total_paid, 0) + d.booking + d.slot > 0 THEN 'PARTIAL'::transactionstatus
+            ELSE 'PENDING'::transactionstatus
+        END,
+        updated_at = NOW()
+    FROM d
+    WHERE s.booking_id = p_booking_id;
+
+    RETURN FOUND;
+END;
+$$;
+"""
+
+TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_transactions_sync_summary()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        IF NOT EXISTS (SELECT 1 FROM transactions WHERE booking_id = OLD.booking_id) THEN
+            DELETE FROM transaction_summaries WHERE booking_id = OLD.booking_id;
+        ELSIF NOT public.apply_transaction_delta(
+            OLD.booking_id,
+            OLD.transaction_type, OLD.payment_method, OLD.amount, OLD.created_at::date,
+            NULL, NULL, NULL, NULL
+        ) THEN
+            PERFORM public.recalc_transaction_summary(OLD.booking_id);
+        END IF;
+        RETURN OLD;
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF NEW.booking_id IS DISTINCT FROM OLD.booking_id THEN
+            PERFORM public.recalc_transaction_summary(OLD.booking_id);
+            PERFORM public.recalc_transaction_summary(NEW.booking_id);
+        ELSIF (NEW.transaction_type, NEW.payment_method, NEW.amount, NEW.created_at)
+              IS DISTINCT FROM (OLD.transaction_type, OLD.payment_method, OLD.amount, OLD.created_at) THEN
+            IF NOT public.apply_transaction_delta(
+                NEW.booking_id,
+                OLD.transaction_type, OLD.payment_method, OLD.amount, OLD.created_at::date,
+                NEW.transaction_type, NEW.payment_method, NEW.amount, NEW.created_at::date
+            ) THEN
+                PERFORM public.recalc_transaction_summary(NEW.booking_id);
+            END IF;
+        END IF;
+        RETURN NEW;
+    ELSE
+        IF NOT public.apply_transaction_delta(
+            NEW.booking_id,
+            NULL, NULL, NULL, NULL,
+            NEW.transaction_type, NEW.payment_method, NEW.amount, NEW.created_at::date
+        ) THEN
+            PERFORM public.recalc_transaction_summary(NEW.booking_id);
+        END IF;
+        RETURN NEW;
+    END IF;
+END;
+$$;
+"""
+
+VERIFY_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.verify_transaction_summaries()
+RETURNS TABLE (booking_id integer, field text, stored text, expected text)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH agg AS (
+        SELECT
+            t.booking_id,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type IN ('BOOKING_PAYMENT','SLOT_PAYMENT')), 0) AS total_paid,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'DISCOUNT'), 0) AS discount,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'OTHER_ADJUSTMENT'), 0) AS other_adjustments,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT'), 0) AS booking_payment,
+            MIN(created_at::date) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT') AS booking_payment_date,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT'), 0) AS slot_payment,
+            COALESCE(SUM(amount) FILTER (WHERE payment_method = 'CASH'), 0) AS cash_payment,
+            COALESCE(SUM(amount) FILTER (WHERE payment_method = 'BKASH'), 0) AS bkash_payment,
+            COALESCE(SUM(amount) FILTER (WHERE payment_method = 'NAGAD'), 0) AS nagad_payment,
+            COALESCE(SUM(amount) FILTER (WHERE payment_method = 'CARD'), 0) AS card_payment,
+            COALESCE(SUM(amount) FILTER (WHERE payment_method = 'BANK_TRANSFER'), 0) AS bank_transfer_payment,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'CASH'), 0) AS booking_cash_payment,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'BKASH'), 0) AS booking_bkash_payment,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'NAGAD'), 0) AS booking_nagad_payment,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'CARD'), 0) AS booking_card_payment,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'BOOKING_PAYMENT' AND payment_method = 'BANK_TRANSFER'), 0) AS booking_bank_transfer_payment,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'CASH'), 0) AS slot_cash_payment,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'BKASH'), 0) AS slot_bkash_payment,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'NAGAD'), 0) AS slot_nagad_payment,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'CARD'), 0) AS slot_card_payment,
+            COALESCE(SUM(amount) FILTER (WHERE transaction_type = 'SLOT_PAYMENT' AND payment_method = 'BANK_TRANSFER'), 0) AS slot_bank_transfer_payment
+        FROM transactions t
+        GROUP BY t.booking_id
+    ),
+    expected AS (
+        SELECT agg.*,
+               s.booking_id IS NOT NULL AS has_summary,
+               s.total_price - agg.total_paid - agg.discount - agg.other_adjustments AS leftover,
+               CASE
+                   WHEN s.total_price - agg.total_paid - agg.discount - agg.other_adjustments <= 0 THEN 'SUCCESSFUL'
+                   WHEN agg.total_paid > 0 THEN 'PARTIAL'
+                   ELSE 'PENDING'
+               END AS status
+        FROM agg
+        LEFT JOIN transaction_summaries s ON s.booking_id = agg.booking_id
+    )
+    SELECT e.booking_id, 'summary', NULL, 'present'
+    FROM expected e
+    WHERE NOT e.has_summary
+    UNION ALL
+    SELECT e.booking_id, v.field, v.stored::text, v.expected::text
+    FROM expected e
+    JOIN transaction_summaries s ON s.booking_id = e.booking_id
+    CROSS JOIN LATERAL (VALUES
+        ('total_paid', s.total_paid, e.total_paid),
+        ('discount', s.discount, e.discount),
+        ('other_adjustments', s.other_adjustments, e.other_adjustments),
+        ('leftover', s.leftover, e.leftover),
+        ('booking_payment', s.booking_payment, e.booking_payment),
+        ('slot_payment', s.slot_payment, e.slot_payment),
+        ('cash_payment', s.cash_payment, e.cash_payment),
+        ('bkash_payment', s.bkash_payment, e.bkash_payment),
+        ('nagad_payment', s.nagad_payment, e.nagad_payment),
+        ('card_payment', s.card_payment, e.card_payment),
+        ('bank_transfer_payment', s.bank_transfer_payment, e.bank_transfer_payment),
+        ('booking_cash_payment', s.booking_cash_payment, e.booking_cash_payment),
+        ('booking_bkash_payment', s.booking_bkash_payment, e.booking_bkash_payment),
+        ('booking_nagad_payment', s.booking_nagad_payment, e.booking_nagad_payment),
+        ('booking_card_payment', s.booking_card_payment, e.booking_card_payment),
+        ('booking_bank_transfer_payment', s.booking_bank_transfer_payment, e.booking_bank_transfer_payment),
+        ('slot_cash_payment', s.slot_cash_payment, e.slot_cash_payment),
+        ('slot_bkash_payment', s.slot_bkash_payment, e.slot_bkash_payment),
+        ('slot_nagad_payment', s.slot_nagad_payment, e.slot_nagad_payment),
+        ('slot_card_payment', s.slot_card_payment, e.slot_card_payment),
+        ('slot_bank_transfer_payment', s.slot_bank_transfer_payment, e.slot_bank_transfer_payment)
+    ) AS v(field, stored, expected)
+    WHERE v.stored IS NULL OR abs(v.stored - v.expected) > 0.005
+    UNION ALL
+    SELECT e.booking_id, 'booking_payment_date', s.booking_payment_date::text, e.booking_payment_date::text
+    FROM expected e
+    JOIN transaction_summaries s ON s.booking_id = e.booking_id
+    WHERE s.booking_payment_date IS DISTINCT FROM e.booking_payment_date
+    UNION ALL
+    SELECT e.booking_id, 'status', s.status::text, e.status
+    FROM expected e
+    JOIN transaction_summaries s ON s.booking_id = e.booking_id
+    WHERE s.status::text IS DISTINCT FROM e.status
+    ORDER BY 1, 2;
+$$;
+"""
+
+# trg_transactions_sync_summary as of d2b3e4f5a6c7, restored on downgrade.
+PREVIOUS_TRIGGER_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION public.trg_transactions_sync_summary()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM public.recalc_transaction_summary(OLD.booking_id);
+        RETURN OLD;
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF NEW.booking_id IS DISTINCT FROM OLD.booking_id THEN
+            PERFORM public.recalc_transaction_summary(OLD.booking_id);
+        END IF;
+        PERFORM public.recalc_transaction_summary(NEW.booking_id);
+        RETURN NEW;
+    ELSE
+        PERFORM public.recalc_transaction_summary(NEW.booking_id);
+        RETURN NEW;
+    END IF;
+END;
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute(AMOUNT_IF_FUNCTION_SQL)
+    op.execute(DELTA_FUNCTION_SQL)
+    op.execute(VERIFY_FUNCTION_SQL)
+    # Summaries are only ever adjusted from here on, so start from exact ones.
+    op.execute("""
+        DO $$
+        DECLARE
+            r record;
+        BEGIN
+            FOR r IN SELECT DISTINCT booking_id FROM public.verify_transaction_summaries() LOOP
+                PERFORM public.recalc_transaction_summary(r.booking_id);
+            END LOOP;
+        END $$;
+    """)
+    op.execute(TRIGGER_FUNCTION_SQL)
+
+
+def downgrade() -> None:
+    op.execute(PREVIOUS_TRIGGER_FUNCTION_SQL)
+    op.execute("DROP FUNCTION IF EXISTS public.verify_transaction_summaries();")
+    op.execute("DROP FUNCTION IF EXISTS public.apply_transaction_delta("
+               "integer, transactiontype, paymentmethod, double precision, date, "
+               "transactiontype, paymentmethod, double precision, date);")
+    op.execute("DROP FUNCTION IF EXISTS public.txn_amount_if("
+               "transactiontype, paymentmethod, double precision, transactiontype, paymentmethod);")
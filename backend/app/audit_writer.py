@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import insert
+
+from .database import SessionLocal
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Events held in memory waiting for a flush. When the database is down or slow
+# for long enough to fill this, new events are dropped (and counted) rather
+# than growing without bound or blocking requests.
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "1000"))
+# A batch is written when it reaches this many events...
+AUDIT_FLUSH_BATCH = int(os.getenv("AUDIT_FLUSH_BATCH", "100"))
+# ...or this long after its first event arrived, whichever comes first.
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500"))
+
+# Queued by stop(): the writer flushes the batch in hand and exits.
+_STOP = object()
+
+
+class AuditWriter:
+    """Buffers activity-trail rows and writes them in multi-row inserts.
+
+    Request handlers call enqueue() and return immediately; one background
+    task per worker drains the queue, so a busy minute of bookings costs a
+    handful of INSERTs instead of a session checkout and commit per event.
+    Best-effort like the old per-event writer: a failed batch is logged and
+    counted, never retried into the business request. stop() flushes what's
+    left so a clean shutdown loses nothing.
+    """
+
+    def __init__(self):
+        # Bounded in enqueue() rather than via maxsize, so stop() can always
+        # queue its sentinel.
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def enqueue(self, row: dict) -> None:
+        if self._queue.qsize() >= AUDIT_BUFFER_SIZE:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logger.warning(f"Audit buffer full, dropped action={row.get('action')} "
+                               f"({self.dropped} dropped so far)")
+            return
+        self._queue.put_nowait(row)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._queue.put_nowait(_STOP)
+            try:
+                await asyncio.wait_for(self._task, timeout=10)
+            except asyncio.TimeoutError:
+                logger.error("Audit writer did not stop in time")
+            self._task = None
+        # Final drain: anything queued after the sentinel goes out now.
+        rows = [row for row in (self._queue.get_nowait() for _ in range(self._queue.qsize()))
+                if row is not _STOP]
+        for i in range(0, len(rows), AUDIT_FLUSH_BATCH):
+            await self._write(rows[i:i + AUDIT_FLUSH_BATCH])
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL_MS / 1000
+            while len(batch) < AUDIT_FLUSH_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._write(batch)
+
+    async def _write(self, batch: list) -> None:
+        try:
+            async with SessionLocal() as session:
+                await session.execute(insert(AuditLog), batch)
+                await session.commit()
+            self.written += len(batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Audit log flush failed for {len(batch)} events: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "buffered": self._queue.qsize(),
+            "buffer_size": AUDIT_BUFFER_SIZE,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+audit_writer = AuditWriter()
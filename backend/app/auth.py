@@ -1,4 +1,4 @@
-from fastapi import Depends, HTTPException, Request
+from fastapi import Depends, HTTPException, Request, Query
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
@@ -13,6 +13,8 @@ logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+STREAM_TICKET_PURPOSE = "stream"
+
 
 
 
@@ -21,6 +23,22 @@ async def get_db():
         yield session
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    return await _user_from_token(token, db)
+
+
+async def get_current_user_from_ticket(ticket: str = Query(...)):
+    """Auth for EventSource streams, which can't send an Authorization header.
+
+    Takes a stream ticket from create_stream_ticket rather than the access
+    token, so the long-lived JWT never lands in a URL or an access log.
+    Uses its own short-lived session: a request-scoped one would stay checked
+    out of the pool for as long as the stream is open.
+    """
+    async with SessionLocal() as db:
+        return await _user_from_token(ticket, db, purpose=STREAM_TICKET_PURPOSE)
+
+
+async def _user_from_token(token: str, db: AsyncSession, purpose: str = None):
     logger.info(f"Validating token: {token[:10]}...")
     credentials_exception = HTTPException(
         status_code=401,
@@ -37,6 +55,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         if token_exp is None or datetime.utcfromtimestamp(token_exp) < datetime.utcnow():
             logger.warning("Token expired")
             raise credentials_exception
+        # A stream ticket is only good for the stream, and an access token isn't a ticket
+        if payload.get("purpose") != purpose:
+            logger.warning("Token used for the wrong purpose")
+            raise credentials_exception
     except JWTError as e:
         logger.error(f"JWT error: {str(e)}")
         raise credentials_exception
@@ -68,3 +90,10 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
+
+def create_stream_ticket(user: User):
+    """Short-lived token that only get_current_user_from_ticket accepts."""
+    return create_access_token(
+        data={"sub": user.email, "purpose": STREAM_TICKET_PURPOSE},
+        expires_delta=timedelta(seconds=settings.STREAM_TICKET_EXPIRE_SECONDS),
+    )
@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+
+from .database import SessionLocal
+from .pricing import price_engine
+from .weekdays import ALL_DAYS, WEEKDAY_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Canonical time slot order (chronological).
+SLOT_ORDER = [
+    "9:30 AM - 11:00 AM",
+    "11:00 AM - 12:30 PM",
+    "12:30 PM - 2:00 PM",
+    "3:00 PM - 4:30 PM",
+    "4:30 PM - 6:00 PM",
+    "6:00 PM - 7:30 PM",
+    "7:30 PM - 9:00 PM",
+    "9:00 PM - 10:30 PM"
+]
+
+# How many days ahead (from today) the public snapshot publishes.
+AVAILABILITY_SNAPSHOT_DAYS = int(os.getenv("AVAILABILITY_SNAPSHOT_DAYS", "60"))
+# Rebuild at least this often even without a change notification. This covers
+# price edits made on another worker, a LISTEN connection that is down, and
+# the date rolling over.
+AVAILABILITY_SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("AVAILABILITY_SNAPSHOT_MAX_AGE_SECONDS", "300"))
+# A burst of changes (a batch booking, an academy edit) is folded into one
+# rebuild after this pause.
+AVAILABILITY_REFRESH_DEBOUNCE_MS = int(os.getenv("AVAILABILITY_REFRESH_DEBOUNCE_MS", "250"))
+
+
+def slot_sort_key(time_slot: str) -> int:
+    return SLOT_ORDER.index(time_slot) if time_slot in SLOT_ORDER else 999
+
+
+# Every (date, slot) cell in a window and whether an active booking or an
+# unexpired slot hold has it. All of it runs in one statement:
+#   - Dates come from generate_series, filtered by the weekday mask.
+#   - The slots are every slot that has a price.
+#   - Occupancy is a probe on idx_booking_slot_days_active plus one on
+#     uq_slot_holds_cell.
+# No booking is expanded or loaded into Python. Prices are added afterwards
+# from the compiled price table (app/pricing.py), so there's no per-cell lookup.
+AVAILABILITY_CELLS_SQL = text("""
+    WITH days AS (
+        SELECT d::date AS slot_date
+        FROM generate_series(CAST(:start_date AS date), CAST(:end_date AS date), interval '1 day') AS d
+        WHERE (CAST(:days_mask AS integer) >> (extract(isodow FROM d)::int - 1)) & 1 = 1
+    ),
+    slots AS (
+        SELECT DISTINCT time_slot
+        FROM slot_prices
+        WHERE CAST(:time_slots AS text[]) IS NULL
+           OR time_slot = ANY (CAST(:time_slots AS text[]))
+    )
+    SELECT days.slot_date, slots.time_slot, occupied.taken IS NOT NULL AS taken
+    FROM days
+    CROSS JOIN slots
+    LEFT JOIN LATERAL (
+        SELECT TRUE AS taken
+        FROM booking_slot_days o
+        WHERE o.slot_date = days.slot_date
+          AND o.time_slot = slots.time_slot
+          AND NOT o.is_cancelled
+        UNION ALL
+        SELECT TRUE
+        FROM slot_holds h
+        WHERE h.slot_date = days.slot_date
+          AND h.time_slot = slots.time_slot
+          AND h.expires_at > now()
+        LIMIT 1
+    ) AS occupied ON TRUE
+    WHERE NOT (CAST(:free_only AS boolean) AND occupied.taken IS NOT NULL)
+""")
+
+
+async def fetch_availability(db: AsyncSession, start_date: date, end_date: date,
+                             days_mask: int = ALL_DAYS, time_slots: list = None,
+                             free_only: bool = False) -> list:
+    """(date, time_slot, price, taken) rows for [start_date, end_date], sorted
+    by date and then slot order. price is the effective NORMAL price, or None
+    if the cell has none."""
+    prices = await price_engine.table(db)
+    result = await db.execute(AVAILABILITY_CELLS_SQL, {
+        "start_date": start_date,
+        "end_date": end_date,
+        "days_mask": days_mask,
+        "time_slots": time_slots or None,
+        "free_only": free_only,
+    })
+    rows = [
+        (slot_date, time_slot, prices.price(time_slot, slot_date), taken)
+        for slot_date, time_slot, taken in result.all()
+    ]
+    return sorted(rows, key=lambda r: (r[0], slot_sort_key(r[1])))
+
+
+def _encode(payload: dict, generated_at: str) -> tuple[bytes, str]:
+    """Body with generated_at stamped in, and an ETag over the data alone.
+
+    Content hash, so every worker hands out the same ETag for the same data,
+    and a rebuild that finds nothing changed keeps it: caches revalidate with
+    a 304 instead of refetching. The bodies then differ only in generated_at,
+    which is why the ETag is weak.
+    """
+    content = json.dumps(payload, separators=(",", ":")).encode()
+    body = json.dumps({"generated_at": generated_at, **payload}, separators=(",", ":")).encode()
+    return body, 'W/"' + hashlib.sha1(content).hexdigest()[:20] + '"'
+
+
+class _Snapshot:
+    __slots__ = ("start_date", "end_date", "body", "etag", "by_date", "built_at")
+
+    def __init__(self, start_date, end_date, body, etag, by_date, built_at):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.body = body
+        self.etag = etag
+        self.by_date = by_date  # {date: (body, etag)} for ?date= requests
+        self.built_at = built_at
+
+
+class AvailabilitySnapshot:
+    """Pre-encoded free/taken + price grid for the public availability endpoint.
+
+    Customer traffic never reaches the database. Requests get the bytes of the
+    last build, and one background task per worker rebuilds it:
+      - after mark_stale(): every booking change (via the matrix broker's
+        LISTEN connection), plus slot price edits, holds and hold expiry in
+        this worker. Debounced, so a burst of changes costs one query;
+      - at least every AVAILABILITY_SNAPSHOT_MAX_AGE_SECONDS regardless.
+    A rebuild is one AVAILABILITY_CELLS_SQL query in its own session. If it
+    fails, the previous snapshot keeps being served.
+    """
+
+    def __init__(self, days: int, max_age_seconds: int):
+        self.days = days
+        self.max_age_seconds = max_age_seconds
+        self._snapshot: _Snapshot | None = None
+        self._stale = asyncio.Event()
+        self._build_lock = asyncio.Lock()
+        self._task = None
+        self.builds = 0
+        self.failures = 0
+        self.last_build_ms = None
+
+    def mark_stale(self) -> None:
+        self._stale.set()
+
+    async def get(self) -> _Snapshot | None:
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Cold start: concurrent first requests share a single build.
+            await self._refresh(force=False)
+            return self._snapshot
+        if snapshot.start_date != date.today():
+            self.mark_stale()
+        return snapshot
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._stale.wait(), timeout=self.max_age_seconds)
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.sleep(AVAILABILITY_REFRESH_DEBOUNCE_MS / 1000)
+            # Changes arriving from here on set the flag again and get their
+            # own rebuild; everything before is covered by this one.
+            self._stale.clear()
+            await self._refresh(force=True)
+
+    async def _refresh(self, force: bool) -> None:
+        async with self._build_lock:
+            if not force and self._snapshot is not None:
+                return
+            started = time.perf_counter()
+            try:
+                self._snapshot = await self._build()
+                self.builds += 1
+                self.last_build_ms = round((time.perf_counter() - started) * 1000, 1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Availability snapshot build failed: {e}")
+
+    async def _build(self) -> _Snapshot:
+        start_date = date.today()
+        end_date = start_date + timedelta(days=self.days - 1)
+        async with SessionLocal() as session:
+            rows = await fetch_availability(session, start_date, end_date)
+
+        slots = sorted({r[1] for r in rows}, key=slot_sort_key)
+        days = {}
+        for slot_date, time_slot, price, taken in rows:
+            days.setdefault(slot_date, []).append(
+                {"time_slot": time_slot, "available": not taken, "price": price}
+            )
+
+        generated_at = datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+        day_payloads = [
+            {
+                "date": slot_date.isoformat(),
+                "day_of_week": WEEKDAY_NAMES[slot_date.weekday()],
+                "slots": cells,
+            }
+            for slot_date, cells in days.items()
+        ]
+        by_date = {
+            date.fromisoformat(day["date"]): _encode(day, generated_at)
+            for day in day_payloads
+        }
+        body, etag = _encode({
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "time_slots": slots,
+            "days": day_payloads,
+        }, generated_at)
+        return _Snapshot(start_date, end_date, body, etag, by_date, generated_at)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "built_at": snapshot.built_at if snapshot else None,
+            "start_date": snapshot.start_date.isoformat() if snapshot else None,
+            "end_date": snapshot.end_date.isoformat() if snapshot else None,
+            "bytes": len(snapshot.body) if snapshot else 0,
+            "builds": self.builds,
+            "failures": self.failures,
+            "last_build_ms": self.last_build_ms,
+            "stale": self._stale.is_set(),
+        }
+
+
+availability_snapshot = AvailabilitySnapshot(AVAILABILITY_SNAPSHOT_DAYS, AVAILABILITY_SNAPSHOT_MAX_AGE_SECONDS)
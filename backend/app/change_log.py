@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import os
+
+from sqlalchemy.sql import text
+
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# How much of the matrix change log to keep, and how often each worker trims
+# it. Clients holding a cursor older than what's kept simply receive a full
+# matrix on their next ?since= request.
+BOOKING_CHANGES_RETENTION_DAYS = int(os.getenv("BOOKING_CHANGES_RETENTION_DAYS", "7"))
+BOOKING_CHANGES_PRUNE_SECONDS = int(os.getenv("BOOKING_CHANGES_PRUNE_SECONDS", "3600"))
+
+
+class ChangeLogPruner:
+    """Trims booking_changes in the background, one task per worker.
+
+    Prunes once at start and then every `interval_seconds`, so a worker that
+    stays up for weeks doesn't let the log grow unbounded. Several workers
+    pruning at once is harmless: prune_booking_changes deletes by age, and
+    whichever gets there second finds nothing left to delete.
+    """
+
+    def __init__(self, interval_seconds: int, retention_days: int):
+        self.interval_seconds = interval_seconds
+        self.retention_days = retention_days
+        self._task = None
+        self.runs = 0
+        self.pruned_through = 0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Pruning booking change log failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def prune(self) -> int:
+        """Delete changes older than the retention window; returns the highest seq removed."""
+        async with SessionLocal() as session:
+            result = await session.execute(
+                text("SELECT public.prune_booking_changes(make_interval(days => :days))"),
+                {"days": self.retention_days},
+            )
+            await session.commit()
+            pruned = result.scalar() or 0
+        self.runs += 1
+        self.pruned_through = max(self.pruned_through, pruned)
+        return pruned
+
+
+change_log_pruner = ChangeLogPruner(BOOKING_CHANGES_PRUNE_SECONDS, BOOKING_CHANGES_RETENTION_DAYS)
@@ -19,6 +19,9 @@ class Settings:
     # Default 30 days for the admin app — daily-use tool, infrequent re-auth
     # is the desired behavior. Override per-environment via env var.
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES', '43200'))  # 30 days
+    # EventSource tickets only need to outlive the connect, so they stay out
+    # of URLs and logs for a minute rather than for the life of a session.
+    STREAM_TICKET_EXPIRE_SECONDS: int = int(os.getenv('STREAM_TICKET_EXPIRE_SECONDS', '60'))
 
     # Legacy alias for compatibility
     SQLALCHEMY_DATABASE_URI: str = DATABASE_URL
@@ -5,6 +5,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.exc import SQLAlchemyError
 from .database import engine, Base
 from .routes import router as api_router
+from .matrix_stream import matrix_broker
+from .audit_writer import audit_writer
+from .availability import availability_snapshot
+from .slot_holds import hold_sweeper
+from .change_log import change_log_pruner
+from .pricing import price_engine
 from .config import settings
 
 # Set up logging
@@ -51,6 +57,29 @@ async def startup_event():
         # import sys
         # sys.exit(1)
 
+    # Trim the matrix change log now and then every
+    # BOOKING_CHANGES_PRUNE_SECONDS, keeping BOOKING_CHANGES_RETENTION_DAYS.
+    await change_log_pruner.start()
+
+    # LISTEN for matrix changes from every worker so /api/bookings/stream can
+    # push them to open admin sessions.
+    await matrix_broker.start()
+
+    # Background writer that batches activity-trail rows (see record_audit).
+    await audit_writer.start()
+
+    # Public availability grid: rebuilt in the background whenever the matrix
+    # broker hears of a booking change, so customer reads never hit the DB.
+    matrix_broker.add_change_listener(availability_snapshot.mark_stale)
+    # Price edits from any worker recompile the price table and the grid.
+    matrix_broker.add_price_listener(price_engine.invalidate)
+    matrix_broker.add_price_listener(availability_snapshot.mark_stale)
+    await availability_snapshot.start()
+
+    # Clears expired slot holds; a sweep that frees cells refreshes the grid.
+    hold_sweeper.on_expire = availability_snapshot.mark_stale
+    await hold_sweeper.start()
+
 
 
 @app.on_event("shutdown")
@@ -59,6 +88,12 @@ async def shutdown_event():
     Function that runs on application shutdown.
     Close any open connections or perform cleanup here.
     """
+    await hold_sweeper.stop()
+    await change_log_pruner.stop()
+    await availability_snapshot.stop()
+    await matrix_broker.stop()
+    # Flush buffered audit rows before the pool goes away.
+    await audit_writer.stop()
     await engine.dispose()
     logger.info("Application shutting down, connections closed.")
 
@@ -0,0 +1,102 @@
+import os
+from collections import OrderedDict
+from datetime import date
+
+# Byte budget for cached matrix bodies in this worker. A 3-month matrix is a
+# few hundred KB of JSON, a week a few KB. Set to 0 to disable caching.
+MATRIX_CACHE_MAX_BYTES = int(os.getenv("MATRIX_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+class _Entry:
+    __slots__ = ("version", "body")
+
+    def __init__(self, version: str, body: bytes):
+        self.version = version
+        self.body = body
+
+
+class MatrixResponseCache:
+    """LRU of serialized full-matrix bodies keyed by (start_date, end_date, format).
+
+    Every entry carries the range version it was built under (the same token
+    /api/bookings sends as its ETag), and a lookup only hits when the current
+    version still matches — so a write from another worker, or straight from
+    SQL, can never be served stale. On top of that, mutations in this worker
+    call invalidate_range() with the dates they touched, which frees exactly the
+    cached windows overlapping those dates instead of flushing the lot.
+
+    Bounded by total body size; the least recently used windows go first.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple[date, date, str], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, start_date: date, end_date: date, version: str, fmt: str = "full") -> bytes | None:
+        key = (start_date, end_date, fmt)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.version != version:
+            # Changed elsewhere since it was cached; it can never hit again.
+            self._drop(key)
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.body
+
+    def put(self, start_date: date, end_date: date, version: str, body: bytes, fmt: str = "full") -> None:
+        if len(body) > self.max_bytes:
+            return
+        key = (start_date, end_date, fmt)
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = _Entry(version, body)
+        self._bytes += len(body)
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate_range(self, start_date: date, end_date: date) -> int:
+        """Drop every cached window overlapping [start_date, end_date]."""
+        stale = [
+            key for key in self._entries
+            if key[0] <= end_date and key[1] >= start_date
+        ]
+        for key in stale:
+            self._drop(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+
+    def _drop(self, key) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+matrix_cache = MatrixResponseCache(MATRIX_CACHE_MAX_BYTES)
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+from datetime import date
+
+import asyncpg
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel the booking_changes_notify trigger publishes on. The payload
+# is just the change sequence; NOTIFY folds identical payloads within one
+# transaction, so a 60-day academy edit still yields a single notification.
+MATRIX_CHANNEL = "booking_matrix"
+# Raised once per statement that touches slot_prices (slot_prices_notify).
+PRICE_CHANNEL = "slot_prices"
+
+# Per-subscriber backlog. A client that falls this far behind is told to
+# resync (one delta fetch) instead of growing the queue without bound.
+SUBSCRIBER_QUEUE_SIZE = 100
+
+RECONNECT_DELAY_SECONDS = 5
+
+
+def _asyncpg_dsn(url: str) -> str:
+    """asyncpg wants a plain postgresql:// DSN, not the SQLAlchemy dialect URL."""
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+class _Subscription:
+    __slots__ = ("start_date", "end_date", "queue")
+
+    def __init__(self, start_date: date, end_date: date):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+
+class MatrixChangeBroker:
+    """Fans booking-matrix change notifications out to open SSE streams.
+
+    One LISTEN connection per worker process. Every committed change to a
+    matrix cell — from any worker, or straight from SQL — raises a NOTIFY with
+    its change sequence; the broker reads the touched cells for the new
+    sequences from booking_changes and hands each subscriber the keys inside
+    its visible date range. If the LISTEN connection drops, subscribers get a
+    "resync" event since notifications may have been missed meanwhile.
+    """
+
+    def __init__(self):
+        self._subscriptions: set[_Subscription] = set()
+        self._conn = None
+        self._task = None
+        self._last_seq = None
+        self._wakeup = asyncio.Event()
+        self._change_listeners = []
+        self._price_listeners = []
+
+    def subscribe(self, start_date: date, end_date: date) -> _Subscription:
+        sub = _Subscription(start_date, end_date)
+        self._subscriptions.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: _Subscription) -> None:
+        self._subscriptions.discard(sub)
+
+    def add_change_listener(self, callback) -> None:
+        """Call `callback()` (sync, cheap) whenever any booking cell changes, or
+        after a reconnect when changes may have been missed."""
+        self._change_listeners.append(callback)
+
+    def add_price_listener(self, callback) -> None:
+        """Call `callback()` (sync, cheap) whenever slot_prices changes, or after
+        a reconnect when a change may have been missed."""
+        self._price_listeners.append(callback)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close()
+
+    async def _close(self) -> None:
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def _run(self) -> None:
+        first_connect = True
+        while True:
+            try:
+                self._conn = await asyncpg.connect(
+                    _asyncpg_dsn(settings.SQLALCHEMY_DATABASE_URI),
+                    statement_cache_size=0,
+                )
+                self._last_seq = await self._conn.fetchval(
+                    "SELECT seq FROM booking_change_counter WHERE id = 1"
+                )
+                await self._conn.add_listener(MATRIX_CHANNEL, self._on_notify)
+                await self._conn.add_listener(PRICE_CHANNEL, self._on_price_notify)
+                if not first_connect:
+                    self._broadcast({"type": "resync", "data": {}})
+                    self._notify_listeners()
+                    self._notify_price_listeners()
+                first_connect = False
+                logger.info("Matrix change listener connected")
+
+                while not self._conn.is_closed():
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=30)
+                    except asyncio.TimeoutError:
+                        # Idle health check; raises if the connection is gone.
+                        await self._conn.execute("SELECT 1")
+                        continue
+                    self._wakeup.clear()
+                    await self._dispatch_new_changes()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Matrix change listener error, reconnecting: {e}")
+            await self._close()
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        # Called from asyncpg's protocol; just wake the dispatch loop, which
+        # coalesces bursts into a single booking_changes read.
+        self._wakeup.set()
+        self._notify_listeners()
+
+    def _on_price_notify(self, connection, pid, channel, payload) -> None:
+        self._notify_price_listeners()
+
+    def _notify_listeners(self) -> None:
+        self._call_all(self._change_listeners)
+
+    def _notify_price_listeners(self) -> None:
+        self._call_all(self._price_listeners)
+
+    @staticmethod
+    def _call_all(callbacks) -> None:
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Matrix change listener callback failed: {e}")
+
+    async def _dispatch_new_changes(self) -> None:
+        if not self._subscriptions:
+            # Nobody listening: just advance the cursor.
+            self._last_seq = await self._conn.fetchval(
+                "SELECT seq FROM booking_change_counter WHERE id = 1"
+            )
+            return
+        rows = await self._conn.fetch(
+            """
+            SELECT DISTINCT seq, slot_date, time_slot
+            FROM booking_changes
+            WHERE seq > $1
+            ORDER BY seq
+            """,
+            self._last_seq or 0,
+        )
+        if not rows:
+            return
+        self._last_seq = rows[-1]["seq"]
+
+        for sub in list(self._subscriptions):
+            keys = sorted({
+                f"{r['slot_date'].isoformat()}_{r['time_slot']}"
+                for r in rows
+                if sub.start_date <= r["slot_date"] <= sub.end_date
+            })
+            if keys:
+                self._offer(sub, {"type": "cells", "data": {"seq": self._last_seq, "changedKeys": keys}})
+
+    def _broadcast(self, event: dict) -> None:
+        for sub in list(self._subscriptions):
+            self._offer(sub, event)
+
+    @staticmethod
+    def _offer(sub: _Subscription, event: dict) -> None:
+        try:
+            sub.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Collapse the backlog into one resync instruction.
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.queue.put_nowait({"type": "resync", "data": {}})
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+matrix_broker = MatrixChangeBroker()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String , Date, DateTime, ForeignKey , Float , Boolean , Enum
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, String , Date, DateTime, ForeignKey , Float , Boolean , Enum, Sequence, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -60,6 +60,7 @@ class Booking(Base):
     academy_end_date = Column(Date, nullable=True)
     academy_month_days = Column(Integer, nullable=True)  # Number of days in the academy booking period
     academy_days_of_week = Column(String, nullable=True)  # Comma-separated days: e.g., "MONDAY,WEDNESDAY,FRIDAY"
+    academy_days_mask = Column(SmallInteger, nullable=True)  # 7-bit weekday mask (Monday = bit 0) derived from academy_days_of_week by trigger
     academy_notes = Column(String, nullable=True)
     is_cancelled = Column(Boolean, default=False)  # Soft delete flag for cancelled bookings
     cancelled_at = Column(DateTime, nullable=True)  # Timestamp when booking was cancelled
@@ -76,6 +77,83 @@ class Booking(Base):
         return f'<Booking {self.name} for {self.date} at {self.time_slot}>'
 
 
+class BookingSlotDay(Base):
+    """Materialized occupancy: one row per (date, slot) cell a booking holds.
+
+    Written only by the bookings_sync_slot_days trigger (academy bookings are
+    expanded across their matching days at write time), so matrix reads are a
+    plain range scan on the primary key. Never written from Python.
+    """
+    __tablename__ = "booking_slot_days"
+
+    slot_date = Column(Date, primary_key=True)
+    time_slot = Column(String, primary_key=True)
+    booking_id = Column(Integer, ForeignKey('bookings.id', ondelete='CASCADE'), primary_key=True)
+    is_cancelled = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f'<BookingSlotDay {self.slot_date} {self.time_slot} booking={self.booking_id}>'
+
+
+class BookingChangeCounter(Base):
+    """Single-row global change sequence for the bookings matrix.
+
+    Bumped once per writing transaction by next_booking_change_seq(), before
+    the transaction locks any booking or summary row; the row lock is held
+    until commit so sequence order matches commit order.
+    """
+    __tablename__ = "booking_change_counter"
+
+    id = Column(SmallInteger, primary_key=True, default=1)
+    seq = Column(BigInteger, nullable=False, default=0)
+    last_xid = Column(BigInteger, nullable=True)
+    pruned_through = Column(BigInteger, nullable=False, default=0)  # oldest cursor still answerable as a delta
+
+
+class BookingChange(Base):
+    """Append-only log of matrix cells touched per change sequence.
+
+    Written only by triggers (occupancy rows, display edits, summary changes);
+    read by /api/bookings?since=<seq> to return just the changed cells.
+    """
+    __tablename__ = "booking_changes"
+
+    seq = Column(BigInteger, primary_key=True)
+    slot_date = Column(Date, primary_key=True)
+    time_slot = Column(String, primary_key=True)
+    booking_id = Column(Integer, primary_key=True)  # no FK: outlives hard-deleted bookings
+    changed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class SlotHold(Base):
+    """Temporary claim on one (date, slot) cell while a checkout completes.
+
+    At most one row per cell; an expired row is taken over in place by the next
+    hold or removed by the sweeper (app/slot_holds.py). Confirming a hold
+    deletes it and inserts the booking in one statement.
+    """
+    __tablename__ = "slot_holds"
+    __table_args__ = (
+        UniqueConstraint('slot_date', 'time_slot', name='uq_slot_holds_cell'),
+        Index('idx_slot_holds_expires_at', 'expires_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    hold_token = Column(String, nullable=False, unique=True)  # handed to the holder; needed to confirm/release
+    slot_date = Column(Date, nullable=False)
+    time_slot = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    phone = Column(String, nullable=False)
+    held_by = Column(Integer, ForeignKey('users.id'), nullable=True)
+    # New value on every insert/takeover; feeds the matrix ETag (matrix_range_version).
+    version = Column(BigInteger, Sequence('slot_holds_version_seq'), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f'<SlotHold {self.slot_date} {self.time_slot} until {self.expires_at}>'
+
+
 class TransactionStatus(enum.Enum):
     PENDING = "Pending"
     SUCCESSFUL = "Successful"
@@ -162,8 +240,8 @@ class DayOfWeek(enum.Enum):
 class Customer(Base):
     """Lightweight customer directory powering name/phone autocomplete on the
     booking form. One row per phone number (the stable identity); name reflects
-    the most recent booking. Kept fresh by an upsert on every booking and a
-    backfill/resync from the bookings table."""
+    the most recent booking. Kept fresh by the bookings_sync_customer_* triggers
+    on bookings; /api/customers/resync rebuilds it if it ever drifts."""
     __tablename__ = "customers"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -0,0 +1,23 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+
+# Every writer of an occupancy cell (a time_slot on a date) takes this lock on
+# the slot before it checks the cell and holds it until commit. The unique
+# index only covers normal bookings; academies span a date range, so without
+# the lock two admins could each check an empty cell and both insert. Locking
+# by slot rather than by cell keeps academy ranges to one lock each.
+# Advisory locks are re-entrant within a session, so nested callers are fine,
+# and the slots are taken in sorted order so two batches can't deadlock.
+LOCK_SLOTS_SQL = text("""
+    SELECT pg_advisory_xact_lock(hashtext('booking_slot:' || s))
+    FROM (
+        SELECT DISTINCT s FROM unnest(CAST(:slots AS text[])) AS s ORDER BY s
+    ) ordered
+""")
+
+
+async def lock_slots(db: AsyncSession, time_slots) -> None:
+    """Serialize occupancy writes on these slots until the transaction ends."""
+    slots = sorted({slot for slot in time_slots if slot})
+    if slots:
+        await db.execute(LOCK_SLOTS_SQL, {"slots": slots})
@@ -0,0 +1,244 @@
+import asyncio
+import os
+import time
+from datetime import date, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .models import SlotPrice, BookingType
+from .weekdays import WEEKDAY_NAMES, count_occurrences
+
+# Safety net for price edits this worker never heard about: a NOTIFY missed
+# while the LISTEN connection was down, or a row changed by hand. Edits are
+# normally picked up right away through invalidate().
+PRICE_ENGINE_MAX_AGE_SECONDS = int(os.getenv("PRICE_ENGINE_MAX_AGE_SECONDS", "300"))
+
+# Precedence among the rows that apply to a date, best first. The SQL mirror,
+# public.effective_slot_price(), uses the same order.
+ACTIVE_TEMPORARY = "ACTIVE_TEMPORARY"   # non-default row whose window covers the date
+DEFAULT = "DEFAULT"                     # default row without a window
+DATED_DEFAULT = "DATED_DEFAULT"         # default row whose window covers the date
+FALLBACK = "FALLBACK"                   # non-default row without a window
+_RANK = {ACTIVE_TEMPORARY: 0, DEFAULT: 1, DATED_DEFAULT: 2, FALLBACK: 3}
+
+
+class PriceRule:
+    __slots__ = ("id", "price", "is_default", "start_date", "end_date", "source")
+
+    def __init__(self, row: SlotPrice):
+        self.id = row.id
+        self.price = row.price
+        self.is_default = bool(row.is_default)
+        self.start_date = row.start_date
+        self.end_date = row.end_date
+        dated = row.start_date is not None and row.end_date is not None
+        if self.is_default:
+            self.source = DATED_DEFAULT if dated else DEFAULT
+        else:
+            self.source = ACTIVE_TEMPORARY if dated else FALLBACK
+
+    def applies_on(self, on_date: date) -> bool:
+        """Undated rows apply on any date. Dated rows apply only inside their
+        window. A row with just one bound never applies, same as in SQL."""
+        if self.start_date is None and self.end_date is None:
+            return True
+        if self.start_date is None or self.end_date is None:
+            return False
+        return self.start_date <= on_date <= self.end_date
+
+
+def _rule_order(rule: PriceRule):
+    # Among temporaries the most recently started window wins; ties by id so
+    # the pick is deterministic (and the same as the SQL ORDER BY).
+    return (_RANK[rule.source], -(rule.start_date.toordinal() if rule.start_date else 0), rule.id)
+
+
+class PriceQuote:
+    """Result of PriceTable.quote(): the total for a run of dates plus one
+    breakdown line per (weekday, price rule) that priced any of them."""
+    __slots__ = ("total", "days", "lines", "unpriced_days", "first_unpriced")
+
+    def __init__(self):
+        self.total = 0.0
+        self.days = 0
+        self.lines: dict = {}
+        self.unpriced_days = 0
+        self.first_unpriced: date | None = None
+
+    def breakdown(self) -> list:
+        return sorted(self.lines.values(), key=lambda line: (line["first_date"], line["day_of_week"]))
+
+    def to_dict(self) -> dict:
+        return {
+            "total_price": self.total,
+            "days": self.days,
+            "unpriced_days": self.unpriced_days,
+            "breakdown": [
+                {**line, "first_date": line["first_date"].isoformat(), "last_date": line["last_date"].isoformat()}
+                for line in self.breakdown()
+            ],
+        }
+
+
+class PriceTable:
+    """slot_prices compiled for lookup: (time_slot, weekday, kind) -> rules, best first.
+
+    kind is "ACADEMY" for rows priced for academies and "NORMAL" for the rest
+    (booking_type NULL or NORMAL). An academy date with no ACADEMY row that
+    applies falls back to the NORMAL rules. Each list holds a handful of rules,
+    so resolving a price is a dict lookup and a short scan with no query.
+    """
+
+    def __init__(self, rows: list):
+        self._rules: dict = {}
+        slots = set()
+        for row in rows:
+            kind = "ACADEMY" if row.booking_type == BookingType.ACADEMY else "NORMAL"
+            weekday = WEEKDAY_NAMES.index(row.day_of_week.name)
+            self._rules.setdefault((row.time_slot, weekday, kind), []).append(PriceRule(row))
+            slots.add(row.time_slot)
+        for rules in self._rules.values():
+            rules.sort(key=_rule_order)
+        self.time_slots = slots
+        self.row_count = len(rows)
+
+    def candidates(self, time_slot: str, weekday: int, kind: str = "NORMAL") -> list:
+        return self._rules.get((time_slot, weekday, kind), [])
+
+    def resolve_weekday(self, time_slot: str, weekday: int, on_date: date,
+                        booking_type: BookingType = BookingType.NORMAL) -> PriceRule | None:
+        """Best rule for a weekday's price as of `on_date`, which need not fall on
+        that weekday. /current_slot_prices uses this to show today's grid."""
+        if booking_type == BookingType.ACADEMY:
+            for rule in self._rules.get((time_slot, weekday, "ACADEMY"), ()):
+                if rule.applies_on(on_date):
+                    return rule
+        for rule in self._rules.get((time_slot, weekday, "NORMAL"), ()):
+            if rule.applies_on(on_date):
+                return rule
+        return None
+
+    def resolve(self, time_slot: str, on_date: date,
+                booking_type: BookingType = BookingType.NORMAL) -> PriceRule | None:
+        """The rule that prices (on_date, time_slot) for this booking type, or None."""
+        return self.resolve_weekday(time_slot, on_date.weekday(), on_date, booking_type)
+
+    def price(self, time_slot: str, on_date: date,
+              booking_type: BookingType = BookingType.NORMAL) -> float | None:
+        rule = self.resolve(time_slot, on_date, booking_type)
+        return rule.price if rule else None
+
+    def quote(self, time_slot: str, start_date: date, end_date: date, days_mask: int,
+              booking_type: BookingType = BookingType.ACADEMY) -> PriceQuote:
+        """Price every date in [start_date, end_date] on a weekday in `days_mask`
+        at the rule that applies on that exact date.
+
+        Dates are never walked one by one. For each weekday the range is cut
+        at the window edges of that weekday's rules; inside a piece the same
+        rule applies throughout, so the piece costs one resolve and one
+        count_occurrences. A six-month academy is a few dozen steps.
+        """
+        quote = PriceQuote()
+        kinds = ("ACADEMY", "NORMAL") if booking_type == BookingType.ACADEMY else ("NORMAL",)
+        for weekday in range(7):
+            if not days_mask & (1 << weekday):
+                continue
+            cuts = {start_date, end_date + timedelta(days=1)}
+            for kind in kinds:
+                for rule in self._rules.get((time_slot, weekday, kind), ()):
+                    if rule.start_date is not None and rule.end_date is not None:
+                        cuts.add(rule.start_date)
+                        cuts.add(rule.end_date + timedelta(days=1))
+            edges = sorted(c for c in cuts if start_date <= c <= end_date + timedelta(days=1))
+            for piece_start, next_start in zip(edges, edges[1:]):
+                piece_end = next_start - timedelta(days=1)
+                days = count_occurrences(piece_start, piece_end, 1 << weekday)
+                if not days:
+                    continue
+                first = piece_start + timedelta(days=(weekday - piece_start.weekday()) % 7)
+                last = piece_end - timedelta(days=(piece_end.weekday() - weekday) % 7)
+                rule = self.resolve_weekday(time_slot, weekday, piece_start, booking_type)
+                if rule is None:
+                    quote.unpriced_days += days
+                    if quote.first_unpriced is None or first < quote.first_unpriced:
+                        quote.first_unpriced = first
+                    continue
+                quote.days += days
+                quote.total += rule.price * days
+                line = quote.lines.get((weekday, rule.id))
+                if line is None:
+                    quote.lines[(weekday, rule.id)] = {
+                        "day_of_week": WEEKDAY_NAMES[weekday],
+                        "price": rule.price,
+                        "days": days,
+                        "subtotal": rule.price * days,
+                        "source": rule.source,
+                        "price_id": rule.id,
+                        "first_date": first,
+                        "last_date": last,
+                    }
+                else:
+                    line["days"] += days
+                    line["subtotal"] += rule.price * days
+                    line["last_date"] = max(line["last_date"], last)
+                    line["first_date"] = min(line["first_date"], first)
+        return quote
+
+
+class PriceEngine:
+    """Per-worker cache of the compiled PriceTable.
+
+    table() loads slot_prices at most once per invalidation and reuses the
+    caller's session for it. Otherwise it returns the compiled table without a
+    query. invalidate() runs after this worker edits a price, and on the
+    slot_prices NOTIFY the matrix broker relays from any worker. A load
+    that overlaps an invalidation is never marked fresh, so it can't cache the
+    pre-edit prices.
+    """
+
+    def __init__(self, max_age_seconds: int):
+        self.max_age_seconds = max_age_seconds
+        self._table: PriceTable | None = None
+        self._loaded_generation = -1
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self.loads = 0
+
+    def invalidate(self) -> None:
+        self._generation += 1
+
+    def _fresh(self) -> bool:
+        return (
+            self._table is not None
+            and self._loaded_generation == self._generation
+            and time.monotonic() - self._loaded_at < self.max_age_seconds
+        )
+
+    async def table(self, db: AsyncSession) -> PriceTable:
+        if self._fresh():
+            return self._table
+        async with self._lock:
+            if self._fresh():
+                return self._table
+            generation = self._generation
+            result = await db.execute(select(SlotPrice))
+            table = PriceTable(result.scalars().all())
+            self._table = table
+            self._loaded_generation = generation
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+            return table
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._table is not None,
+            "fresh": self._fresh(),
+            "rows": self._table.row_count if self._table else 0,
+            "loads": self.loads,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._table else None,
+        }
+
+
+price_engine = PriceEngine(PRICE_ENGINE_MAX_AGE_SECONDS)
@@ -3,20 +3,30 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.sql import text , func
 from sqlalchemy.orm import joinedload
-from sqlalchemy import or_, and_, case, literal
-from fastapi.responses import HTMLResponse , RedirectResponse , JSONResponse
+from sqlalchemy import or_, and_, case, literal, tuple_, extract, cast, Integer
+from fastapi.responses import HTMLResponse , RedirectResponse , JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.security import OAuth2PasswordRequestForm
 from passlib.context import CryptContext
 from datetime import datetime , timedelta  ,timezone , date
 from dateutil.relativedelta import relativedelta
 from .database import get_db, SessionLocal
-from .models import User , Booking , Transaction, SlotPrice, PaymentMethod , TransactionStatus , TransactionType , TransactionSummary, DayOfWeek, BookingType, UserRole, AuditLog, Customer
-from .auth import create_access_token, get_current_user, require_master
+from .models import User , Booking , Transaction, SlotPrice, PaymentMethod , TransactionStatus , TransactionType , TransactionSummary, DayOfWeek, BookingType, UserRole, AuditLog, Customer, BookingSlotDay, BookingChange, BookingChangeCounter, SlotHold
+from .auth import create_access_token, create_stream_ticket, get_current_user, get_current_user_from_ticket, require_master
+from .matrix_stream import matrix_broker, format_sse
+from .matrix_cache import matrix_cache
+from .audit_writer import audit_writer
+from .availability import availability_snapshot, fetch_availability, slot_sort_key
+from .slot_holds import place_hold, confirm_hold, release_hold, hold_is_live, active_holds, held_cells
+from .pricing import price_engine, DATED_DEFAULT
+from .occupancy import lock_slots
+from .weekdays import ALL_DAYS, WEEKDAY_NAMES, mask_from_csv, count_occurrences, has_occurrence, iter_occurrences
 import os
 import asyncio
-from sqlalchemy.exc import SQLAlchemyError
-from pydantic import ValidationError
+import base64
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional
 from enum import Enum
 import logging
 import time
@@ -58,6 +68,24 @@ def invalidate_booking_summary_cache(booking_id: int | None = None):
         _booking_summary_cache.pop(booking_id, None)
 
 
+# Full /api/bookings matrix bodies are cached per (start_date, end_date) in
+# app.matrix_cache, validated against the range version on every read. Mutations
+# also drop the cached windows overlapping the dates they touched, so memory
+# isn't held by matrices that can no longer hit. Size via MATRIX_CACHE_MAX_BYTES.
+def invalidate_matrix_cache(start_date: date, end_date: date | None = None):
+    """Drop cached matrix windows overlapping [start_date, end_date]."""
+    if start_date is None:
+        return
+    matrix_cache.invalidate_range(start_date, end_date or start_date)
+
+
+def booking_span(booking) -> tuple:
+    """First and last date a booking occupies on the matrix (academy: whole range)."""
+    if booking.booking_type == BookingType.ACADEMY and booking.academy_start_date and booking.academy_end_date:
+        return booking.academy_start_date, booking.academy_end_date
+    return booking.booking_date, booking.booking_date
+
+
 '''
 --------------------
 AUDIT LOG HELPER
@@ -68,70 +96,194 @@ async def record_audit(user, action: str, entity_type: str = None, entity_id: in
                        summary: str = None, details: dict = None):
     """Append one row to the activity trail.
 
-    Runs in its own session so an audit failure can never roll back or break the
-    business action that triggered it (best-effort logging). Call AFTER the main
-    mutation has committed.
+    Queued to the background audit_writer (app/audit_writer.py), which writes
+    rows in batches, so the request neither checks out a connection nor waits
+    on a commit for it. Best-effort: an audit failure can never roll back or
+    break the business action that triggered it. Call AFTER the main mutation
+    has committed.
     """
     try:
-        async with SessionLocal() as session:
-            session.add(AuditLog(
-                user_id=getattr(user, 'id', None),
-                actor_name=getattr(user, 'username', None),
-                action=action,
-                entity_type=entity_type,
-                entity_id=entity_id,
-                summary=summary,
-                details=json.dumps(details, default=str) if details is not None else None,
-            ))
-            await session.commit()
+        audit_writer.enqueue({
+            "user_id": getattr(user, 'id', None),
+            "actor_name": getattr(user, 'username', None),
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "summary": summary,
+            "details": json.dumps(details, default=str) if details is not None else None,
+            "created_at": datetime.now(timezone.utc),  # event time, not flush time
+        })
     except Exception as e:
         logger.error(f"Audit log failed for action={action}: {e}")
 
 
-async def upsert_customer(name: str, phone: str):
-    """Keep the customer directory fresh: insert a new phone, or refresh the name
-    on an existing one. Best-effort (own session) so it never blocks a booking."""
-    if not name or not phone or not phone.strip():
-        return
-    try:
-        async with SessionLocal() as session:
-            await session.execute(text("""
-                INSERT INTO customers (name, phone, created_at, updated_at)
-                VALUES (:name, :phone, (now() AT TIME ZONE 'utc'), (now() AT TIME ZONE 'utc'))
-                ON CONFLICT (phone) DO UPDATE
-                SET name = EXCLUDED.name, updated_at = (now() AT TIME ZONE 'utc')
-            """), {"name": name.strip(), "phone": phone.strip()})
-            await session.commit()
-    except Exception as e:
-        logger.error(f"Customer upsert failed for {phone}: {e}")
-
-
 '''
 --------------------
 MATRIX RESPONSE HELPER
 --------------------
 '''
 
-def _expand_booking_dates(b):
-    """Yield (date, key_suffix) for every matrix cell a booking occupies.
+# Only the columns the matrix actually renders. Plain rows — no Booking/User/
+# TransactionSummary instances, no identity map, no relationship loading.
+MATRIX_COLUMNS = (
+    BookingSlotDay.slot_date,
+    Booking.id,
+    Booking.name,
+    Booking.phone,
+    Booking.time_slot,
+    Booking.booking_type,
+    Booking.academy_start_date,
+    Booking.academy_end_date,
+    Booking.academy_days_of_week,
+    Booking.academy_notes,
+    Booking.is_cancelled,
+    Booking.cancelled_at,
+    User.username,
+    TransactionSummary.status,
+    TransactionSummary.total_price,
+    TransactionSummary.total_paid,
+    TransactionSummary.leftover,
+)
+
+
+def matrix_query(start_date: date, end_date: date):
+    """Column-projected select behind every bookingsData payload."""
+    return (
+        select(*MATRIX_COLUMNS)
+        .select_from(BookingSlotDay)
+        .join(Booking, Booking.id == BookingSlotDay.booking_id)
+        .outerjoin(User, User.id == Booking.booked_by)
+        .outerjoin(TransactionSummary, TransactionSummary.booking_id == Booking.id)
+        .filter(BookingSlotDay.slot_date.between(start_date, end_date))
+        .order_by(BookingSlotDay.slot_date, BookingSlotDay.time_slot, Booking.id)
+    )
+
+
+def _active_matrix_entry(row) -> dict:
+    """Shared (per-booking) fields of a live matrix cell."""
+    entry = {
+        "id": row.id,
+        "name": row.name,
+        "phone": row.phone,
+        "time_slot": row.time_slot,
+        "booking_type": row.booking_type.value,
+        "booked_by": row.username if row.username else "Unknown",
+        "transaction_status": row.status.name if row.status else None,
+    }
+    if row.booking_type == BookingType.ACADEMY:
+        entry.update({
+            "academy_start_date": row.academy_start_date.isoformat() if row.academy_start_date else None,
+            "academy_end_date": row.academy_end_date.isoformat() if row.academy_end_date else None,
+            "academy_days_of_week": row.academy_days_of_week,
+            "academy_notes": row.academy_notes,
+        })
+    return entry
+
+
+def _cancelled_matrix_entry(row) -> dict:
+    """Fields of a cancelled-but-paid overlay entry."""
+    return {
+        "id": row.id,
+        "name": row.name,
+        "phone": row.phone,
+        "booking_type": row.booking_type.value,
+        "transaction_status": row.status.name if row.status else None,
+        "total_price": float(row.total_price) if row.total_price is not None else 0.0,
+        "total_paid": float(row.total_paid) if row.total_paid else 0.0,
+        "leftover": float(row.leftover) if row.leftover is not None else 0.0,
+        "cancelled_at": row.cancelled_at.isoformat() if row.cancelled_at else None,
+    }
+
+
+def _is_hidden_cancellation(row) -> bool:
+    # Only surface cancelled bookings that still hold money — a plain
+    # cancelled/empty slot should just look open.
+    return bool(row.is_cancelled) and not (row.total_paid and row.total_paid > 0)
 
-    Normal bookings occupy a single date; academy bookings expand across their
-    date range, honouring the selected days-of-week.
+
+def serialize_matrix_rows(rows):
+    """Turn projected matrix rows into (bookings_data, cancelled_data).
+
+    A booking's shared fields are serialized once and reused for every cell it
+    occupies (an academy spans dozens of days in a 90-day window); only
+    booking_date differs per cell.
     """
-    if b.booking_type == BookingType.ACADEMY and b.academy_start_date and b.academy_end_date:
-        selected_days = None
-        if b.academy_days_of_week:
-            selected_days = [d.strip().upper() for d in b.academy_days_of_week.split(',')]
-        current = b.academy_start_date
-        while current <= b.academy_end_date:
-            if not selected_days or current.strftime('%A').upper() in selected_days:
-                yield current
-            current += timedelta(days=1)
-    else:
-        yield b.booking_date
+    bookings_data: dict = {}
+    cancelled_data: dict = {}
+    active_base: dict = {}
+    cancelled_base: dict = {}
+
+    for row in rows:
+        if _is_hidden_cancellation(row):
+            continue
+        key = f"{row.slot_date.isoformat()}_{row.time_slot}"
+
+        if row.is_cancelled:
+            entry = cancelled_base.get(row.id)
+            if entry is None:
+                entry = cancelled_base[row.id] = _cancelled_matrix_entry(row)
+            cancelled_data.setdefault(key, []).append(dict(entry))
+            continue
+
+        base = active_base.get(row.id)
+        if base is None:
+            base = active_base[row.id] = _active_matrix_entry(row)
+        entry = dict(base)
+        entry["booking_date"] = row.slot_date.isoformat()
+        bookings_data[key] = entry
+
+    return bookings_data, cancelled_data
 
 
-async def build_matrix_response(db: AsyncSession, start_date: date, end_date: date):
+def serialize_matrix_rows_compact(rows) -> dict:
+    """Columnar form of the matrix for long ranges (?format=compact).
+
+    Instead of one dict per cell, each booking's attributes are sent once and
+    every date carries [slot_index, booking_id] pairs:
+      - slots: slot names, referenced by index.
+      - bookings / cancelledBookings: id -> attributes (no booking_date or
+        time_slot; the client takes those from the cell).
+      - cells / cancelledCells: "YYYY-MM-DD" -> [[slot_index, booking_id], ...].
+    An academy occupying 40 days costs one attributes entry plus 40 pairs,
+    rather than 40 copies of name, phone, booked_by, dates and notes.
+    """
+    slot_index: dict = {}
+    bookings: dict = {}
+    cancelled_bookings: dict = {}
+    cells: dict = {}
+    cancelled_cells: dict = {}
+
+    for row in rows:
+        if _is_hidden_cancellation(row):
+            continue
+        idx = slot_index.get(row.time_slot)
+        if idx is None:
+            idx = slot_index[row.time_slot] = len(slot_index)
+        day = row.slot_date.isoformat()
+
+        if row.is_cancelled:
+            if row.id not in cancelled_bookings:
+                cancelled_bookings[row.id] = _cancelled_matrix_entry(row)
+            cancelled_cells.setdefault(day, []).append([idx, row.id])
+            continue
+
+        if row.id not in bookings:
+            entry = _active_matrix_entry(row)
+            del entry["time_slot"]
+            bookings[row.id] = entry
+        cells.setdefault(day, []).append([idx, row.id])
+
+    return {
+        "format": "compact",
+        "slots": list(slot_index),
+        "bookings": bookings,
+        "cancelledBookings": cancelled_bookings,
+        "cells": cells,
+        "cancelledCells": cancelled_cells,
+    }
+
+
+async def build_matrix_response(db: AsyncSession, start_date: date, end_date: date, cells=None):
     """Build the matrix payload for a date range.
 
     Returns (bookings_data, cancelled_data):
@@ -140,82 +292,185 @@ async def build_matrix_response(db: AsyncSession, start_date: date, end_date: da
         keyed the same way but each value is a LIST — a slot can accumulate more
         than one cancelled-but-paid booking over its lifetime, and it can also
         have a live booking sitting on top of it.
+
+    Cells come straight from the booking_slot_days occupancy table (academy
+    bookings are already expanded per matching day by the DB trigger), so this
+    is one range scan over (slot_date, time_slot) — no per-day loop in Python.
+    The select is column-projected (see MATRIX_COLUMNS) rather than loading
+    ORM objects; benchmark_matrix.py compares it against the old path.
+
+    Pass `cells` (a list of (date, time_slot) tuples) to restrict the payload
+    to just those cells — used by the delta sync path.
+    """
+    query = matrix_query(start_date, end_date)
+    if cells is not None:
+        if not cells:
+            return {}, {}
+        query = query.filter(tuple_(BookingSlotDay.slot_date, BookingSlotDay.time_slot).in_(cells))
+    result = await db.execute(query)
+    return serialize_matrix_rows(result.all())
+
+
+async def build_compact_matrix(db: AsyncSession, start_date: date, end_date: date) -> dict:
+    """Same rows as build_matrix_response, in the columnar ?format=compact shape."""
+    result = await db.execute(matrix_query(start_date, end_date))
+    return serialize_matrix_rows_compact(result.all())
+
+
+async def build_held_data(db: AsyncSession, start_date: date, end_date: date) -> dict:
+    """Unexpired slot holds in the range, keyed "YYYY-MM-DD_slot".
+
+    Holds don't go through the booking change log (taking one must not queue on
+    the counter row), so every matrix body, delta included, carries the full
+    set for its window. It is a handful of rows at most.
+    """
+    return {
+        f"{slot_date.isoformat()}_{time_slot}": {
+            "name": name,
+            "phone": phone,
+            "expires_at": expires_at.isoformat(),
+        }
+        for slot_date, time_slot, name, phone, expires_at in await active_holds(db, start_date, end_date)
+    }
+
+
+async def current_change_seq(db: AsyncSession):
+    """Latest committed matrix change sequence, or None if the log isn't set up.
+
+    Read this BEFORE building a payload: anything committed afterwards has a
+    higher sequence and will be picked up by the client's next ?since= call.
     """
     result = await db.execute(
-        select(Booking)
-        .options(
-            joinedload(Booking.user),
-            joinedload(Booking.transaction_summary),
-        )
+        select(BookingChangeCounter.seq, BookingChangeCounter.pruned_through)
+        .filter(BookingChangeCounter.id == 1)
+    )
+    return result.one_or_none()
+
+
+async def build_matrix_delta(db: AsyncSession, since: int, start_date: date, end_date: date):
+    """Matrix cells in [start_date, end_date] changed after sequence `since`.
+
+    Returns a payload dict with:
+      - seq: cursor to send as ?since= next time.
+      - changedKeys: every "YYYY-MM-DD_slot" touched since the cursor. The client
+        replaces these keys in both maps (dropping any key absent below).
+      - bookingsData / cancelledData: current values for the changed keys only.
+      - removed: changed keys that no longer hold a live booking.
+      - heldData: every unexpired hold in the range (see build_held_data).
+    Returns None when the cursor can't be answered incrementally (pruned,
+    ahead of the server, or no change log) — callers send the full matrix.
+    """
+    counter = await current_change_seq(db)
+    if counter is None or since < counter.pruned_through or since > counter.seq:
+        return None
+
+    changed_result = await db.execute(
+        select(BookingChange.slot_date, BookingChange.time_slot)
+        .distinct()
         .filter(
-            or_(
-                and_(
-                    Booking.booking_type == BookingType.NORMAL,
-                    Booking.booking_date.between(start_date, end_date),
-                ),
-                and_(
-                    Booking.booking_type == BookingType.ACADEMY,
-                    Booking.academy_start_date <= end_date,
-                    Booking.academy_end_date >= start_date,
-                ),
-            )
+            BookingChange.seq > since,
+            BookingChange.seq <= counter.seq,
+            BookingChange.slot_date.between(start_date, end_date),
         )
-        .order_by(Booking.booking_date, Booking.time_slot)
     )
-    bookings = result.unique().scalars().all()
+    changed_cells = [(row[0], row[1]) for row in changed_result.all()]
+    bookings_data, cancelled_data = await build_matrix_response(
+        db, start_date, end_date, cells=changed_cells
+    )
+    changed_keys = [f"{d.isoformat()}_{slot}" for d, slot in changed_cells]
+    return {
+        "delta": True,
+        "since": since,
+        "seq": counter.seq,
+        "changedKeys": changed_keys,
+        "bookingsData": bookings_data,
+        "cancelledData": cancelled_data,
+        "removed": [k for k in changed_keys if k not in bookings_data],
+        "heldData": await build_held_data(db, start_date, end_date),
+    }
 
-    bookings_data: dict = {}
-    cancelled_data: dict = {}
 
-    for b in bookings:
-        summary = b.transaction_summary
-        txn_status = summary.status.name if (summary and summary.status) else None
-        is_cancelled = bool(getattr(b, 'is_cancelled', False))
-        total_paid = float(summary.total_paid) if summary and summary.total_paid else 0.0
+async def matrix_payload(db: AsyncSession, start_date: date, end_date: date,
+                         since: int | None = None, compact: bool = False) -> dict:
+    """The one matrix body every booking endpoint returns.
 
-        for current in _expand_booking_dates(b):
-            if not (start_date <= current <= end_date):
-                continue
-            key = f"{current.isoformat()}_{b.time_slot}"
+    With a usable `since` cursor this is the delta payload; otherwise the full
+    bookingsData/cancelledData for the range plus the current `seq` (or the
+    columnar layout when `compact`), and heldData either way. The sequence is read before the matrix so
+    nothing committed in between is skipped by the client's next ?since= call.
+    """
+    if since is not None:
+        delta = await build_matrix_delta(db, since, start_date, end_date)
+        if delta is not None:
+            return delta
+    counter = await current_change_seq(db)
+    held_data = await build_held_data(db, start_date, end_date)
+    if compact:
+        return {"seq": counter.seq if counter else None,
+                **await build_compact_matrix(db, start_date, end_date),
+                "heldData": held_data}
+    bookings_data, cancelled_data = await build_matrix_response(db, start_date, end_date)
+    return {
+        "seq": counter.seq if counter else None,
+        "bookingsData": bookings_data,
+        "cancelledData": cancelled_data,
+        "heldData": held_data,
+    }
 
-            if is_cancelled:
-                # Only surface cancelled bookings that still hold money — a
-                # plain cancelled/empty slot should just look open.
-                if total_paid <= 0:
-                    continue
-                cancelled_data.setdefault(key, []).append({
-                    "id": b.id,
-                    "name": b.name,
-                    "phone": b.phone,
-                    "booking_type": b.booking_type.value,
-                    "transaction_status": txn_status,
-                    "total_price": float(summary.total_price) if summary else 0.0,
-                    "total_paid": total_paid,
-                    "leftover": float(summary.leftover) if summary else 0.0,
-                    "cancelled_at": b.cancelled_at.isoformat() if b.cancelled_at else None,
-                })
-                continue
 
-            entry = {
-                "id": b.id,
-                "name": b.name,
-                "phone": b.phone,
-                "booking_date": current.isoformat(),
-                "time_slot": b.time_slot,
-                "booking_type": b.booking_type.value,
-                "booked_by": b.user.username if b.user else "Unknown",
-                "transaction_status": txn_status,
-            }
-            if b.booking_type == BookingType.ACADEMY:
-                entry.update({
-                    "academy_start_date": b.academy_start_date.isoformat() if b.academy_start_date else None,
-                    "academy_end_date": b.academy_end_date.isoformat() if b.academy_end_date else None,
-                    "academy_days_of_week": b.academy_days_of_week,
-                    "academy_notes": b.academy_notes,
-                })
-            bookings_data[key] = entry
+async def matrix_range_version(db: AsyncSession, start_date: date, end_date: date):
+    """Cheap version token for the matrix over [start_date, end_date].
 
-    return bookings_data, cancelled_data
+    Every change to a cell logs a strictly higher sequence, so the max logged
+    sequence inside the window only moves when something in it changed.
+    pruned_through is folded in so pruning the log can never make the token go
+    back to a value a client saw for different content. Returns a weak ETag, or
+    None if the change log isn't available.
+
+    Unexpired holds in the window add (count, max version). Every new hold or
+    takeover draws a higher version, and a hold that is released or expires
+    never comes back. So the pair only repeats for the same set of holds, and
+    an expiry changes the token the moment it happens, before any sweep.
+    """
+    latest_in_range = (
+        select(func.max(BookingChange.seq))
+        .filter(BookingChange.slot_date.between(start_date, end_date))
+        .scalar_subquery()
+    )
+    live_holds = (
+        select(func.count(SlotHold.id), func.max(SlotHold.version))
+        .filter(
+            SlotHold.slot_date.between(start_date, end_date),
+            SlotHold.expires_at > func.now(),
+        )
+        .subquery()
+    )
+    result = await db.execute(
+        select(BookingChangeCounter.pruned_through, latest_in_range, *live_holds.c)
+        .filter(BookingChangeCounter.id == 1)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    if row[2]:
+        return f'W/"{row[1] or 0}-{row[0]}-h{row[2]}.{row[3]}"'
+    return f'W/"{row[1] or 0}-{row[0]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """True if an If-None-Match header value covers `etag` (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
 
 
 '''
@@ -224,83 +479,30 @@ ACADEMY BOOKING HELPER FUNCTIONS
 --------------------
 '''
 
-async def calculate_academy_price(db: AsyncSession, time_slot: str, start_date: date, end_date: date, days_of_week: str = None) -> float:
+async def calculate_academy_price(db: AsyncSession, time_slot: str, start_date: date, end_date: date, days_of_week: str = None):
     """
-    Calculate the total price for an academy booking
-    Price = (rate per day × number of matching days in period)
+    Quote an academy booking: every matching day in the period is priced at
+    the rate in effect on that date (academy rate first, then the normal
+    rate), so promotional windows and per-weekday rates are honoured.
+    Returns a PriceQuote (total, days, per-weekday/per-window breakdown).
 
     Args:
         days_of_week: Comma-separated days (e.g., "MONDAY,FRIDAY") or None for all days
     """
-    from calendar import monthrange
-    from datetime import timedelta
-
-    # Parse selected days of week if provided
-    selected_days = None
-    if days_of_week:
-        selected_days = [day.strip().upper() for day in days_of_week.split(',')]
-
-    # Count only days that match the selected days of week
-    current_date = start_date
-    matching_days = 0
-
-    while current_date <= end_date:
-        day_name = current_date.strftime('%A').upper()
-
-        # If no specific days selected, count all days
-        # Otherwise, only count if this day matches the selection
-        if not selected_days or day_name in selected_days:
-            matching_days += 1
-
-        current_date += timedelta(days=1)
-
-    if matching_days == 0:
+    days_mask = mask_from_csv(days_of_week)
+    if count_occurrences(start_date, end_date, days_mask) == 0:
         raise HTTPException(status_code=400, detail="No matching days found in the selected period")
 
-    # Get a sample day to fetch pricing
-    sample_date = start_date
-    if selected_days:
-        # Find the first date that matches our selection
-        while sample_date <= end_date:
-            if sample_date.strftime('%A').upper() in selected_days:
-                break
-            sample_date += timedelta(days=1)
+    prices = await price_engine.table(db)
+    quote = prices.quote(time_slot, start_date, end_date, days_mask, BookingType.ACADEMY)
 
-    day_of_week = DayOfWeek[sample_date.strftime('%A').upper()]
-
-    # Get the academy price for this time slot and day
-    slot_price_result = await db.execute(
-        select(SlotPrice)
-        .filter(
-            SlotPrice.time_slot == time_slot,
-            SlotPrice.day_of_week == day_of_week,
-            SlotPrice.booking_type == BookingType.ACADEMY
-        )
-    )
-    academy_price = slot_price_result.scalar_one_or_none()
-
-    if not academy_price:
-        # Fallback to normal price if no academy price found
-        slot_price_result = await db.execute(
-            select(SlotPrice)
-            .filter(
-                SlotPrice.time_slot == time_slot,
-                SlotPrice.day_of_week == day_of_week,
-                or_(
-                    SlotPrice.booking_type == None,
-                    SlotPrice.booking_type == BookingType.NORMAL
-                )
-            )
+    if quote.unpriced_days:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No price found for time slot {time_slot} on {quote.first_unpriced.isoformat()}"
         )
-        academy_price = slot_price_result.scalar_one_or_none()
 
-    if not academy_price:
-        raise HTTPException(status_code=404, detail=f"No price found for time slot {time_slot}")
-
-    # Total price = price per day × number of matching days
-    total_price = academy_price.price * matching_days
-
-    return total_price, academy_price.price, matching_days
+    return quote
 
 
 async def check_academy_booking_conflicts(
@@ -308,19 +510,28 @@ async def check_academy_booking_conflicts(
     time_slot: str,
     start_date: date,
     end_date: date,
-    exclude_booking_id: int = None
+    exclude_booking_id: int = None,
+    days_mask: int = ALL_DAYS
 ) -> bool:
     """
-    Check if there are any conflicting bookings for this academy slot.
-    Returns True if there's a conflict, False otherwise.
+    Check if there are any conflicting bookings for this slot between
+    start_date and end_date on the weekdays in `days_mask` (default: every day).
+    Returns (has_conflict, conflicting_bookings).
     """
-    # Check for normal bookings in the date range
+    # Check for normal bookings in the date range that fall on a selected weekday
+    # Cancelled bookings don't hold their cells (same rule as find_cell_conflicts)
     normal_query = select(Booking).filter(
         Booking.time_slot == time_slot,
         Booking.booking_type == BookingType.NORMAL,
         Booking.booking_date >= start_date,
-        Booking.booking_date <= end_date
+        Booking.booking_date <= end_date,
+        or_(Booking.is_cancelled == False, Booking.is_cancelled.is_(None))
     )
+    if days_mask != ALL_DAYS:
+        isodow = cast(extract('isodow', Booking.booking_date), Integer)
+        normal_query = normal_query.filter(
+            literal(days_mask).op('>>')(isodow - 1).op('&')(1) == 1
+        )
 
     if exclude_booking_id:
         normal_query = normal_query.filter(Booking.id != exclude_booking_id)
@@ -331,12 +542,14 @@ async def check_academy_booking_conflicts(
     if normal_conflicts:
         return True, normal_conflicts
 
-    # Check for academy bookings that might overlap
+    # Academy bookings whose range overlaps and that share at least one weekday
     academy_query = select(Booking).filter(
         Booking.time_slot == time_slot,
         Booking.booking_type == BookingType.ACADEMY,
         Booking.academy_start_date <= end_date,
-        Booking.academy_end_date >= start_date
+        Booking.academy_end_date >= start_date,
+        func.coalesce(Booking.academy_days_mask, ALL_DAYS).op('&')(days_mask) != 0,
+        or_(Booking.is_cancelled == False, Booking.is_cancelled.is_(None))
     )
 
     if exclude_booking_id:
@@ -345,28 +558,276 @@ async def check_academy_booking_conflicts(
     result = await db.execute(academy_query)
     academy_bookings = result.scalars().all()
 
-    # For each academy booking, check if any dates in the range match its selected days
-    conflicting_academy_bookings = []
-    for academy_booking in academy_bookings:
-        # Parse the selected days of week
-        if academy_booking.academy_days_of_week:
-            selected_days = [day.strip().upper() for day in academy_booking.academy_days_of_week.split(',')]
-        else:
-            selected_days = None
+    # Sharing a weekday isn't enough when the ranges only partly overlap: the
+    # shared weekdays must actually occur inside the overlap window.
+    conflicting_academy_bookings = [
+        academy_booking for academy_booking in academy_bookings
+        if has_occurrence(
+            max(start_date, academy_booking.academy_start_date),
+            min(end_date, academy_booking.academy_end_date),
+            days_mask & mask_from_csv(academy_booking.academy_days_of_week),
+        )
+    ]
 
-        # Check each date in the range
-        current_date = max(start_date, academy_booking.academy_start_date)
-        end_check = min(end_date, academy_booking.academy_end_date)
+    return len(conflicting_academy_bookings) > 0, conflicting_academy_bookings
 
-        while current_date <= end_check:
-            day_name = current_date.strftime('%A').upper()
-            # If no days specified or this day matches the selected days, it's a conflict
-            if not selected_days or day_name in selected_days:
-                conflicting_academy_bookings.append(academy_booking)
-                break
-            current_date += timedelta(days=1)
 
-    return len(conflicting_academy_bookings) > 0, conflicting_academy_bookings
+async def find_cell_conflicts(db: AsyncSession, cells: list) -> dict:
+    """
+    Every (date, time_slot) in `cells` held by an active booking, in one query.
+
+    Reads the booking_slot_days occupancy table, where academy bookings are
+    already expanded to their matching days, so a single indexed lookup covers
+    normal and academy bookings alike however many cells are asked about.
+    Cancelled bookings don't hold their cell (the matrix shows it as open and
+    uq_bookings_active_normal_slot ignores them).
+    Returns {(date, time_slot): BookingType} (ACADEMY wins if both hold it).
+    """
+    if not cells:
+        return {}
+    result = await db.execute(
+        select(BookingSlotDay.slot_date, BookingSlotDay.time_slot, Booking.booking_type)
+        .join(Booking, Booking.id == BookingSlotDay.booking_id)
+        .filter(
+            tuple_(BookingSlotDay.slot_date, BookingSlotDay.time_slot).in_(cells),
+            BookingSlotDay.is_cancelled == False,
+        )
+    )
+    conflicts: dict = {}
+    for slot_date, slot, booking_type in result.all():
+        if conflicts.get((slot_date, slot)) != BookingType.ACADEMY:
+            conflicts[(slot_date, slot)] = booking_type
+    return conflicts
+
+
+async def find_slot_conflicts(db: AsyncSession, time_slot: str, dates: list) -> dict:
+    """find_cell_conflicts for one slot over many dates; returns {date: BookingType}."""
+    taken = await find_cell_conflicts(db, [(d, time_slot) for d in dates])
+    return {d: booking_type for (d, _), booking_type in taken.items()}
+
+
+async def find_held_dates(db: AsyncSession, time_slot: str, dates) -> list:
+    """The dates among `dates` on which a live slot hold has this slot, in order."""
+    held = await held_cells(db, [(d, time_slot) for d in dates])
+    return sorted(d for d, _ in held)
+
+
+def held_response(held_dates: list) -> JSONResponse:
+    """409 for a write blocked by someone else's slot hold."""
+    return JSONResponse(content={
+        "success": False,
+        "message": f"This slot is held on {', '.join(d.isoformat() for d in held_dates[:5])}"
+    }, status_code=409)
+
+
+async def insert_normal_booking(db: AsyncSession, user_id: int, name: str, phone: str,
+                                booking_date: date, time_slot: str):
+    """
+    Book one normal slot in a single statement; returns the new id or None.
+
+    The insert only happens if no active academy has the cell and no
+    unexpired slot hold covers it, and the uq_bookings_active_normal_slot
+    index turns a concurrent (or existing) normal booking into ON CONFLICT
+    DO NOTHING — so there's no read-then-write window for two admins to
+    double-book the same slot. On None, callers can ask find_slot_conflicts
+    which booking type has the slot, or held_cells whether a hold does.
+    """
+    await lock_slots(db, [time_slot])
+    result = await db.execute(text("""
+        INSERT INTO bookings (booked_by, name, phone, booking_date, time_slot, booking_type,
+                              is_cancelled, created_at, updated_at, last_modified_by)
+        SELECT CAST(:user_id AS integer), CAST(:name AS varchar), CAST(:phone AS varchar),
+               CAST(:booking_date AS date), CAST(:time_slot AS varchar), 'NORMAL'::bookingtype,
+               FALSE, (now() AT TIME ZONE 'utc'), (now() AT TIME ZONE 'utc'), CAST(:user_id AS integer)
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM booking_slot_days s
+            JOIN bookings a ON a.id = s.booking_id
+            WHERE s.slot_date = CAST(:booking_date AS date)
+              AND s.time_slot = CAST(:time_slot AS varchar)
+              AND NOT s.is_cancelled
+              AND a.booking_type = 'ACADEMY'
+        )
+        AND NOT EXISTS (
+            SELECT 1
+            FROM slot_holds h
+            WHERE h.slot_date = CAST(:booking_date AS date)
+              AND h.time_slot = CAST(:time_slot AS varchar)
+              AND h.expires_at > now()
+        )
+        ON CONFLICT (booking_date, time_slot)
+            WHERE booking_type = 'NORMAL' AND is_cancelled IS NOT TRUE
+        DO NOTHING
+        RETURNING id
+    """), {"user_id": user_id, "name": name, "phone": phone,
+           "booking_date": booking_date, "time_slot": time_slot})
+    return result.scalar_one_or_none()
+
+
+async def insert_normal_booking_series(db: AsyncSession, user_id: int, name: str, phone: str,
+                                       time_slot: str, dates: list) -> list:
+    """
+    Insert one normal booking per date, plus its PENDING transaction summary,
+    in a single round trip. Returns [(booking_id, booking_date), ...] for the
+    rows actually written.
+
+    Both inserts ride one statement: bookings from unnest(dates) with the same
+    academy / hold / ON CONFLICT guards as insert_normal_booking, then a summary for
+    each returned id at the price the compiled price table gives its date
+    (the same rule effective_slot_price applies in recalc). A date with no
+    price gets no summary, just like a single booking, instead of a PENDING
+    one at 0; recalc builds it on the first payment. A date that was
+    taken concurrently is simply missing from the result, so callers compare
+    lengths and roll back if they need all-or-nothing.
+    """
+    if not dates:
+        return []
+    prices = await price_engine.table(db)
+    date_prices = [prices.price(time_slot, d) for d in dates]
+    await lock_slots(db, [time_slot])
+    result = await db.execute(text("""
+        WITH new_bookings AS (
+            INSERT INTO bookings (booked_by, name, phone, booking_date, time_slot, booking_type,
+                                  is_cancelled, created_at, updated_at, last_modified_by)
+            SELECT CAST(:user_id AS integer), CAST(:name AS varchar), CAST(:phone AS varchar),
+                   d, CAST(:time_slot AS varchar), 'NORMAL'::bookingtype,
+                   FALSE, (now() AT TIME ZONE 'utc'), (now() AT TIME ZONE 'utc'), CAST(:user_id AS integer)
+            FROM unnest(CAST(:dates AS date[])) AS d
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM booking_slot_days s
+                JOIN bookings a ON a.id = s.booking_id
+                WHERE s.slot_date = d
+                  AND s.time_slot = CAST(:time_slot AS varchar)
+                  AND NOT s.is_cancelled
+                  AND a.booking_type = 'ACADEMY'
+            )
+            AND NOT EXISTS (
+                SELECT 1
+                FROM slot_holds h
+                WHERE h.slot_date = d
+                  AND h.time_slot = CAST(:time_slot AS varchar)
+                  AND h.expires_at > now()
+            )
+            ON CONFLICT (booking_date, time_slot)
+                WHERE booking_type = 'NORMAL' AND is_cancelled IS NOT TRUE
+            DO NOTHING
+            RETURNING id, booking_date
+        ),
+        new_summaries AS (
+            INSERT INTO transaction_summaries (
+                booking_id, total_price, total_paid, leftover, status, updated_at,
+                cash_payment, bkash_payment, nagad_payment, card_payment, bank_transfer_payment,
+                booking_payment, booking_cash_payment, booking_bkash_payment, booking_nagad_payment,
+                booking_card_payment, booking_bank_transfer_payment,
+                slot_payment, slot_cash_payment, slot_bkash_payment, slot_nagad_payment,
+                slot_card_payment, slot_bank_transfer_payment,
+                discount, other_adjustments
+            )
+            SELECT nb.id, p.price, 0, p.price, 'PENDING'::transactionstatus,
+                   (now() AT TIME ZONE 'utc'),
+                   0, 0, 0, 0, 0,
+                   0, 0, 0, 0, 0, 0,
+                   0, 0, 0, 0, 0, 0,
+                   0, 0
+            FROM new_bookings nb
+            JOIN unnest(CAST(:dates AS date[]), CAST(:prices AS float8[])) AS p(price_date, price)
+              ON p.price_date = nb.booking_date
+            WHERE p.price IS NOT NULL
+            RETURNING booking_id
+        )
+        SELECT id, booking_date FROM new_bookings ORDER BY booking_date
+    """), {"user_id": user_id, "name": name, "phone": phone,
+           "time_slot": time_slot, "dates": list(dates), "prices": date_prices})
+    return [(row.id, row.booking_date) for row in result.all()]
+
+
+async def hard_delete_bookings(db: AsyncSession, booking_ids: list, keep_paid: bool = False) -> list:
+    """
+    Permanently delete bookings with their transactions and summaries in one
+    statement. Returns a row per booking deleted: (id, name, time_slot,
+    booking_type, booking_date, academy_start_date, academy_end_date,
+    transaction_count).
+
+    The summary and transaction deletes ride the same statement as the
+    booking delete, so the FK checks pass at its end, and the
+    transactions_sync_summary_delete trigger fires once with every payment
+    in its transition table, finding nothing left to update. booking_slot_days
+    go by ON DELETE CASCADE. With keep_paid, bookings that have any
+    transaction are left alone (callers cancel those instead).
+    """
+    if not booking_ids:
+        return []
+    result = await db.execute(text("""
+        WITH doomed AS (
+            SELECT b.id
+            FROM bookings b
+            WHERE b.id = ANY (CAST(:ids AS integer[]))
+              AND NOT (CAST(:keep_paid AS boolean)
+                       AND EXISTS (SELECT 1 FROM transactions t WHERE t.booking_id = b.id))
+        ),
+        gone_summaries AS (
+            DELETE FROM transaction_summaries
+            WHERE booking_id IN (SELECT id FROM doomed)
+        ),
+        gone_transactions AS (
+            DELETE FROM transactions
+            WHERE booking_id IN (SELECT id FROM doomed)
+            RETURNING booking_id
+        ),
+        gone_bookings AS (
+            DELETE FROM bookings
+            WHERE id IN (SELECT id FROM doomed)
+            RETURNING id, name, time_slot, booking_type, booking_date,
+                      academy_start_date, academy_end_date
+        )
+        SELECT g.id, g.name, g.time_slot, g.booking_type, g.booking_date,
+               g.academy_start_date, g.academy_end_date,
+               (SELECT count(*) FROM gone_transactions t WHERE t.booking_id = g.id) AS transaction_count
+        FROM gone_bookings g
+        ORDER BY g.id
+    """), {"ids": list(booking_ids), "keep_paid": keep_paid})
+    return result.all()
+
+
+async def cancel_paid_bookings(db: AsyncSession, booking_ids: list, user_id: int) -> list:
+    """
+    Soft-delete the bookings among `booking_ids` that have transactions: mark
+    them cancelled so their payments stay on the books. One statement; returns
+    the same row shape as hard_delete_bookings (transaction_count is 0 here,
+    nothing was removed) plus already_cancelled. Bookings that were cancelled
+    before are returned with already_cancelled set and left untouched, so
+    their original cancelled_at and last_modified_by survive.
+    """
+    if not booking_ids:
+        return []
+    result = await db.execute(text("""
+        WITH paid AS (
+            SELECT b.id
+            FROM bookings b
+            WHERE b.id = ANY (CAST(:ids AS integer[]))
+              AND EXISTS (SELECT 1 FROM transactions t WHERE t.booking_id = b.id)
+        ),
+        cancelled AS (
+            UPDATE bookings b
+            SET is_cancelled = TRUE,
+                cancelled_at = (now() AT TIME ZONE 'utc'),
+                last_modified_by = CAST(:user_id AS integer)
+            WHERE b.id IN (SELECT id FROM paid)
+              AND b.is_cancelled IS NOT TRUE
+            RETURNING b.id, b.name, b.time_slot, b.booking_type, b.booking_date,
+                      b.academy_start_date, b.academy_end_date
+        )
+        SELECT c.*, 0 AS transaction_count, FALSE AS already_cancelled
+        FROM cancelled c
+        UNION ALL
+        SELECT b.id, b.name, b.time_slot, b.booking_type, b.booking_date,
+               b.academy_start_date, b.academy_end_date, 0, TRUE
+        FROM bookings b
+        WHERE b.id IN (SELECT id FROM paid)
+          AND b.is_cancelled IS TRUE
+    """), {"ids": list(booking_ids), "user_id": user_id})
+    return sorted(result.all(), key=lambda row: row.id)
 
 
 '''
@@ -654,6 +1115,7 @@ async def book(
     academy_notes: str = Form(None),       # Optional notes for academy
     start_date: str = Form(None),  # For date range display
     end_date: str = Form(None),    # For date range display
+    since: int = Form(None),       # Client's matrix change cursor → respond with a delta
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -689,9 +1151,11 @@ async def book(
                     "message": "Invalid academy date format. Use YYYY-MM-DD."
                 }, status_code=400)
 
-            # Check for conflicts
+            # Check for conflicts, holding the slot lock until commit
+            await lock_slots(db, [time_slot])
             has_conflict, conflicts = await check_academy_booking_conflicts(
-                db, time_slot, academy_start, academy_end
+                db, time_slot, academy_start, academy_end,
+                days_mask=mask_from_csv(academy_days_of_week)
             )
 
             if has_conflict:
@@ -704,10 +1168,18 @@ async def book(
                     "message": f"Conflict with existing bookings: {', '.join(conflict_details[:3])}"
                 }, status_code=409)
 
+            # A live hold on any of the academy's days blocks it too
+            held = await find_held_dates(db, time_slot, iter_occurrences(
+                academy_start, academy_end, mask_from_csv(academy_days_of_week)
+            ))
+            if held:
+                return held_response(held)
+
             # Calculate price and days
-            total_price, price_per_day, days_count = await calculate_academy_price(
+            quote = await calculate_academy_price(
                 db, time_slot, academy_start, academy_end, academy_days_of_week
             )
+            total_price, days_count = quote.total, quote.days
 
             # Create academy booking
             booking = Booking(
@@ -738,13 +1210,13 @@ async def book(
             )
             db.add(summary)
             await db.commit()
+            invalidate_matrix_cache(academy_start, academy_end)
 
             message = f"Academy slot booked successfully for {days_count} days (₹{total_price:.2f})"
             await record_audit(current_user, "booking.create", "booking", new_booking_id,
                                f"Created academy booking for {name} · {time_slot}",
                                {"type": "ACADEMY", "days": days_count, "total_price": total_price,
                                 "start": str(academy_start), "end": str(academy_end)})
-            await upsert_customer(name, phone)
 
         # Handle Normal booking (including bulk normal bookings)
         else:
@@ -760,20 +1232,8 @@ async def book(
                         "message": "Invalid date format. Use YYYY-MM-DD."
                     }, status_code=400)
 
-                # Parse selected days of week
-                selected_days = None
-                if academy_days_of_week:
-                    selected_days = [day.strip().upper() for day in academy_days_of_week.split(',')]
-
-                # Collect dates that match the criteria
-                dates_to_book = []
-                current_date = bulk_start
-                while current_date <= bulk_end:
-                    day_name = current_date.strftime('%A').upper()
-                    # Only include dates that match the selected days of week
-                    if not selected_days or day_name in selected_days:
-                        dates_to_book.append(current_date)
-                    current_date += timedelta(days=1)
+                # Collect dates on the selected days of week
+                dates_to_book = list(iter_occurrences(bulk_start, bulk_end, mask_from_csv(academy_days_of_week)))
 
                 if not dates_to_book:
                     return JSONResponse(content={
@@ -781,101 +1241,74 @@ async def book(
                         "message": "No matching days found in the selected period"
                     }, status_code=400)
 
-                # Check for conflicts on all dates
-                conflicts = []
-                for date_to_check in dates_to_book:
-                    # Check if slot is already booked on this date
-                    existing_booking_result = await db.execute(
-                        select(Booking).filter(
-                            Booking.booking_date == date_to_check,
-                            Booking.time_slot == time_slot
-                        )
-                    )
-                    existing_booking = existing_booking_result.scalar_one_or_none()
-                    if existing_booking:
-                        conflicts.append(f"{date_to_check.isoformat()}")
-
-                    # Check if there's an academy booking covering this slot
-                    has_conflict, academy_conflicts = await check_academy_booking_conflicts(
-                        db, time_slot, date_to_check, date_to_check
-                    )
-                    if has_conflict:
-                        conflicts.append(f"{date_to_check.isoformat()} (academy)")
+                # Check for conflicts on all dates at once
+                taken = await find_slot_conflicts(db, time_slot, dates_to_book)
+                conflicts = [
+                    f"{d.isoformat()} (academy)" if taken[d] == BookingType.ACADEMY else d.isoformat()
+                    for d in dates_to_book if d in taken
+                ]
 
                 if conflicts:
                     return JSONResponse(content={
                         "success": False,
                         "message": f"Conflict on dates: {', '.join(conflicts[:5])}"
                     }, status_code=409)
+                held = await find_held_dates(db, time_slot, dates_to_book)
+                if held:
+                    return held_response(held)
 
-                # Create bookings for all dates
-                for date_to_book in dates_to_book:
-                    booking = Booking(
-                        booked_by=current_user.id,
-                        name=name,
-                        phone=phone,
-                        booking_date=date_to_book,
-                        time_slot=time_slot,
-                        booking_type=BookingType.NORMAL,
-                        last_modified_by=current_user.id
-                    )
-                    db.add(booking)
+                # Create all bookings (and their summaries) in one statement
+                created = await insert_normal_booking_series(
+                    db, current_user.id, name, phone, time_slot, dates_to_book
+                )
+                if len(created) < len(dates_to_book):
+                    # Lost a race for some dates since the conflict check.
+                    await db.rollback()
+                    created_dates = {d for _, d in created}
+                    lost = [d.isoformat() for d in dates_to_book if d not in created_dates]
+                    return JSONResponse(content={
+                        "success": False,
+                        "message": f"Conflict on dates: {', '.join(lost[:5])}"
+                    }, status_code=409)
 
                 await db.commit()
+                invalidate_matrix_cache(dates_to_book[0], dates_to_book[-1])
                 message = f"Successfully booked {len(dates_to_book)} slots"
                 await record_audit(current_user, "booking.create", "booking", None,
                                    f"Created {len(dates_to_book)} bookings for {name} · {time_slot}",
                                    {"type": "BULK", "count": len(dates_to_book), "slot": time_slot,
-                                    "dates": [d.isoformat() for d in dates_to_book[:20]]})
-                await upsert_customer(name, phone)
+                                    "dates": [d.isoformat() for d in dates_to_book[:20]],
+                                    "booking_ids": [booking_id for booking_id, _ in created[:20]]})
 
             else:
-                # Single normal booking
-                # Check if slot is already booked
-                existing_booking_result = await db.execute(
-                    select(Booking).filter(
-                        Booking.booking_date == booking_date_parsed,
-                        Booking.time_slot == time_slot
-                    )
+                # Single normal booking: insert-or-nothing in one statement
+                new_booking_id = await insert_normal_booking(
+                    db, current_user.id, name, phone, booking_date_parsed, time_slot
                 )
-                existing_booking = existing_booking_result.scalar_one_or_none()
 
-                if existing_booking:
+                if new_booking_id is None:
+                    await db.rollback()
+                    taken = await find_slot_conflicts(db, time_slot, [booking_date_parsed])
+                    if taken.get(booking_date_parsed) == BookingType.ACADEMY:
+                        return JSONResponse(content={
+                            "success": False,
+                            "message": "This slot is blocked by an academy booking"
+                        }, status_code=409)
+                    if booking_date_parsed not in taken:
+                        held = await find_held_dates(db, time_slot, [booking_date_parsed])
+                        if held:
+                            return held_response(held)
                     return JSONResponse(content={
                         "success": False,
                         "message": "This slot is already booked"
-                    })
-
-                # Check if there's an academy booking covering this slot
-                has_conflict, conflicts = await check_academy_booking_conflicts(
-                    db, time_slot, booking_date_parsed, booking_date_parsed
-                )
-
-                if has_conflict:
-                    return JSONResponse(content={
-                        "success": False,
-                        "message": "This slot is blocked by an academy booking"
                     }, status_code=409)
 
-                # Create normal booking
-                booking = Booking(
-                    booked_by=current_user.id,
-                    name=name,
-                    phone=phone,
-                    booking_date=booking_date_parsed,
-                    time_slot=time_slot,
-                    booking_type=BookingType.NORMAL,
-                    last_modified_by=current_user.id
-                )
-                db.add(booking)
-                await db.flush()
-                new_booking_id = booking.id  # capture before commit (expire_on_commit)
                 await db.commit()
+                invalidate_matrix_cache(booking_date_parsed)
                 message = "Slot has been successfully booked"
                 await record_audit(current_user, "booking.create", "booking", new_booking_id,
                                    f"Booked {name} · {booking_date_parsed} · {time_slot}",
                                    {"type": "NORMAL", "date": str(booking_date_parsed), "slot": time_slot})
-                await upsert_customer(name, phone)
 
         # Determine date range for returning bookings
         fetch_start_date = None
@@ -900,79 +1333,8 @@ async def book(
         max_end_date = fetch_start_date + relativedelta(months=3)
         fetch_end_date = min(fetch_end_date, max_end_date)
 
-
-        # Fetch updated bookings for the entire date range (including academy bookings that overlap)
-        bookings_result = await db.execute(
-            select(Booking)
-            .options(joinedload(Booking.user))
-            .filter(
-                or_(
-                    # Normal bookings within the date range
-                    and_(
-                        Booking.booking_type == BookingType.NORMAL,
-                        Booking.booking_date.between(fetch_start_date, fetch_end_date)
-                    ),
-                    # Academy bookings that overlap with the date range
-                    and_(
-                        Booking.booking_type == BookingType.ACADEMY,
-                        Booking.academy_start_date <= fetch_end_date,
-                        Booking.academy_end_date >= fetch_start_date
-                    )
-                )
-            )
-            .order_by(Booking.booking_date, Booking.time_slot)
-        )
-        bookings = bookings_result.scalars().all()
-
-        # Create bookingsData dictionary
-        bookings_data = {}
-        for b in bookings:
-            # For academy bookings, create entries for all dates in the range
-            if b.booking_type == BookingType.ACADEMY:
-                # Parse selected days of week if available
-                selected_days = None
-                if b.academy_days_of_week:
-                    selected_days = [day.strip().upper() for day in b.academy_days_of_week.split(',')]
-
-                current_date = b.academy_start_date
-                while current_date <= b.academy_end_date:
-                    day_name = current_date.strftime('%A').upper()
-
-                    # Only include dates that match the selected days of week
-                    if not selected_days or day_name in selected_days:
-                        key = f"{current_date.isoformat()}_{b.time_slot}"
-                        bookings_data[key] = {
-                            "id": b.id,
-                            "name": b.name,
-                            "phone": b.phone,
-                            "booking_date": current_date.isoformat(),
-                            "time_slot": b.time_slot,
-                            "booking_type": b.booking_type.value,
-                            "academy_start_date": b.academy_start_date.isoformat(),
-                            "academy_end_date": b.academy_end_date.isoformat(),
-                            "academy_days_of_week": b.academy_days_of_week,
-                            "academy_notes": b.academy_notes,
-                            "booked_by": b.user.username
-                    }
-                    current_date += timedelta(days=1)
-            else:
-                # Normal booking
-                key = f"{b.booking_date.isoformat()}_{b.time_slot}"
-                bookings_data[key] = {
-                    "id": b.id,
-                    "name": b.name,
-                    "phone": b.phone,
-                    "booking_date": b.booking_date.isoformat(),
-                    "time_slot": b.time_slot,
-                    "booking_type": b.booking_type.value,
-                    "booked_by": b.user.username
-                }
-
-        return JSONResponse(content={
-            "success": True,
-            "message": message,
-            "bookingsData": bookings_data
-        })
+        matrix = await matrix_payload(db, fetch_start_date, fetch_end_date, since)
+        return JSONResponse(content={"success": True, "message": message, **matrix})
     except Exception as e:
         print(f"Error in add_booking: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -1000,6 +1362,7 @@ async def update_booking(
     academy_notes: str = Form(None),       # Optional notes
     start_date: str = Form(None),  # For date range display
     end_date: str = Form(None),    # For date range display
+    since: int = Form(None),       # Client's matrix change cursor → respond with a delta
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -1010,6 +1373,9 @@ async def update_booking(
         if not booking:
             raise HTTPException(status_code=404, detail="Booking not found")
 
+        # The conflict checks below must not race another writer on the new slot
+        await lock_slots(db, [time_slot])
+
         try:
             booking_type_enum = BookingType[booking_type]
         except KeyError:
@@ -1022,6 +1388,7 @@ async def update_booking(
         old_booking_date = booking.booking_date
         old_time_slot = booking.time_slot
         old_booking_type = booking.booking_type
+        old_span = booking_span(booking)
 
         # Handle Academy booking update
         if booking_type_enum == BookingType.ACADEMY:
@@ -1042,7 +1409,8 @@ async def update_booking(
 
             # Check for conflicts (excluding this booking)
             has_conflict, conflicts = await check_academy_booking_conflicts(
-                db, time_slot, academy_start, academy_end, exclude_booking_id=booking_id
+                db, time_slot, academy_start, academy_end, exclude_booking_id=booking_id,
+                days_mask=mask_from_csv(academy_days_of_week)
             )
 
             if has_conflict:
@@ -1055,10 +1423,18 @@ async def update_booking(
                     "message": f"Conflict with existing bookings: {', '.join(conflict_details[:3])}"
                 }, status_code=409)
 
+            # A live hold on any of the academy's days blocks it too
+            held = await find_held_dates(db, time_slot, iter_occurrences(
+                academy_start, academy_end, mask_from_csv(academy_days_of_week)
+            ))
+            if held:
+                return held_response(held)
+
             # Calculate price and days
-            total_price, price_per_day, days_count = await calculate_academy_price(
+            quote = await calculate_academy_price(
                 db, time_slot, academy_start, academy_end, academy_days_of_week
             )
+            total_price, days_count = quote.total, quote.days
 
             # Update academy booking fields
             booking.name = name
@@ -1096,10 +1472,11 @@ async def update_booking(
                 select(Booking).filter(
                     Booking.booking_date == new_booking_date,
                     Booking.time_slot == time_slot,
-                    Booking.id != booking_id
+                    Booking.id != booking_id,
+                    or_(Booking.is_cancelled == False, Booking.is_cancelled == None),
                 )
             )
-            existing_booking = existing_booking_result.scalar_one_or_none()
+            existing_booking = existing_booking_result.scalars().first()
 
             if existing_booking:
                 return JSONResponse(content={
@@ -1118,6 +1495,10 @@ async def update_booking(
                     "message": "This slot is blocked by an academy booking"
                 }, status_code=409)
 
+            held = await find_held_dates(db, time_slot, [new_booking_date])
+            if held:
+                return held_response(held)
+
             booking.name = name
             booking.phone = phone
             booking.booking_date = new_booking_date
@@ -1131,11 +1512,13 @@ async def update_booking(
             booking.last_modified_by = current_user.id
             booking.updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
 
+        new_span = booking_span(booking)
         await db.commit()
+        invalidate_matrix_cache(*old_span)
+        invalidate_matrix_cache(*new_span)
         await record_audit(current_user, "booking.update", "booking", booking_id,
                            f"Edited booking for {name} · {time_slot}",
                            {"name": name, "phone": phone, "slot": time_slot, "type": booking_type})
-        await upsert_customer(name, phone)
 
         # Use the provided date range if available
         fetch_start_date = None
@@ -1160,81 +1543,18 @@ async def update_booking(
         max_end_date = fetch_start_date + relativedelta(months=3)
         fetch_end_date = min(fetch_end_date, max_end_date)
 
-        # Fetch bookings for the determined date range (both normal and academy bookings)
-        bookings_result = await db.execute(
-            select(Booking)
-            .options(joinedload(Booking.user))
-            .filter(
-                or_(
-                    # Normal bookings within the date range
-                    and_(
-                        Booking.booking_type == BookingType.NORMAL,
-                        Booking.booking_date.between(fetch_start_date, fetch_end_date)
-                    ),
-                    # Academy bookings that overlap with the date range
-                    and_(
-                        Booking.booking_type == BookingType.ACADEMY,
-                        Booking.academy_start_date <= fetch_end_date,
-                        Booking.academy_end_date >= fetch_start_date
-                    )
-                )
-            )
-            .order_by(Booking.booking_date, Booking.time_slot)
-        )
-        bookings = bookings_result.scalars().all()
-
-        # Create bookingsData dictionary
-        bookings_data = {}
-        for b in bookings:
-            # For academy bookings, create entries for all dates in the range
-            if b.booking_type == BookingType.ACADEMY:
-                # Parse selected days of week if available
-                selected_days = None
-                if b.academy_days_of_week:
-                    selected_days = [day.strip().upper() for day in b.academy_days_of_week.split(',')]
-
-                current_date = b.academy_start_date
-                while current_date <= b.academy_end_date:
-                    day_name = current_date.strftime('%A').upper()
-
-                    # Only include dates that match the selected days of week
-                    if not selected_days or day_name in selected_days:
-                        key = f"{current_date.isoformat()}_{b.time_slot}"
-                        bookings_data[key] = {
-                            "id": b.id,
-                            "name": b.name,
-                            "phone": b.phone,
-                            "booking_date": current_date.isoformat(),
-                            "time_slot": b.time_slot,
-                            "booking_type": b.booking_type.value,
-                            "academy_start_date": b.academy_start_date.isoformat(),
-                            "academy_end_date": b.academy_end_date.isoformat(),
-                            "academy_days_of_week": b.academy_days_of_week,
-                            "academy_notes": b.academy_notes,
-                            "booked_by": b.user.username
-                    }
-                    current_date += timedelta(days=1)
-            else:
-                # Normal booking
-                key = f"{b.booking_date.isoformat()}_{b.time_slot}"
-                bookings_data[key] = {
-                    "id": b.id,
-                    "name": b.name,
-                    "phone": b.phone,
-                    "booking_date": b.booking_date.isoformat(),
-                    "time_slot": b.time_slot,
-                    "booking_type": b.booking_type.value,
-                    "booked_by": b.user.username
-                }
-
-        return JSONResponse(content={
-            "success": True,
-            "message": "Booking updated successfully",
-            "bookingsData": bookings_data
-        })
+        matrix = await matrix_payload(db, fetch_start_date, fetch_end_date, since)
+        return JSONResponse(content={"success": True, "message": "Booking updated successfully", **matrix})
 
     except HTTPException as http_exc:
         return JSONResponse(status_code=http_exc.status_code, content={"success": False, "message": http_exc.detail})
+    except IntegrityError:
+        # uq_bookings_active_normal_slot: someone took the slot since our check.
+        await db.rollback()
+        return JSONResponse(status_code=409, content={
+            "success": False,
+            "message": "This slot is already booked. Please choose another."
+        })
     except SQLAlchemyError as db_exc:
         print(f"Database error in update_booking: {str(db_exc)}")
         return JSONResponse(status_code=500, content={"success": False, "message": "Database error occurred"})
@@ -1256,6 +1576,7 @@ async def delete_booking(
     start_date: str = Query(None),
     end_date: str = Query(None),
     retain_payments: bool = Query(True),  # New parameter to control soft vs hard delete
+    since: int = Query(None),  # Client's matrix change cursor → respond with a delta
     current_user: User = Depends(require_master),  # master-only: destructive
     db: AsyncSession = Depends(get_db)
 ):
@@ -1276,13 +1597,12 @@ async def delete_booking(
         booking_slot = booking.time_slot
         academy_start_date = booking.academy_start_date if booking_type == BookingType.ACADEMY else None
         academy_end_date = booking.academy_end_date if booking_type == BookingType.ACADEMY else None
+        span = booking_span(booking)
 
-        # Check if booking has transactions
-        transactions_result = await db.execute(
-            select(Transaction).filter(Transaction.booking_id == booking_id)
-        )
-        transactions = transactions_result.scalars().all()
-        has_transactions = len(transactions) > 0
+        # Check if booking has transactions (an index probe; none are loaded)
+        has_transactions = (await db.execute(
+            select(Transaction.id).filter(Transaction.booking_id == booking_id).limit(1)
+        )).first() is not None
 
         if has_transactions and retain_payments:
             # Soft delete: Mark booking as cancelled but retain transactions
@@ -1292,23 +1612,15 @@ async def delete_booking(
             await db.commit()
             message = "Booking cancelled. Payment records retained for accounting."
         else:
-            # Hard delete: Remove everything
-            # Delete related transaction summary first (if exists)
-            transaction_summary_result = await db.execute(
-                select(TransactionSummary).filter(TransactionSummary.booking_id == booking_id)
-            )
-            transaction_summary = transaction_summary_result.scalar_one_or_none()
-            if transaction_summary:
-                await db.delete(transaction_summary)
-
-            # Delete related transactions
-            for transaction in transactions:
-                await db.delete(transaction)
-
-            # Delete the booking
-            await db.delete(booking)
+            # Hard delete: booking, transactions and summary in one statement,
+            # however many payments there are
+            await hard_delete_bookings(db, [booking_id])
             await db.commit()
+            invalidate_booking_summary_cache(booking_id)
+            if has_transactions:
+                invalidate_dashboard_cache()
             message = "Booking deleted successfully"
+        invalidate_matrix_cache(*span)
 
         await record_audit(current_user,
                            "booking.cancel" if (has_transactions and retain_payments) else "booking.delete",
@@ -1339,81 +1651,11 @@ async def delete_booking(
         max_end_date = fetch_start_date + relativedelta(months=3)
         fetch_end_date = min(fetch_end_date, max_end_date)
 
-        # Fetch bookings for the selected date range (both normal and academy bookings)
-        # IMPORTANT: Filter out cancelled bookings
-        bookings_result = await db.execute(
-            select(Booking)
-            .options(joinedload(Booking.user))
-            .filter(
-                Booking.is_cancelled == False,  # Exclude cancelled bookings
-                or_(
-                    # Normal bookings within the date range
-                    and_(
-                        Booking.booking_type == BookingType.NORMAL,
-                        Booking.booking_date.between(fetch_start_date, fetch_end_date)
-                    ),
-                    # Academy bookings that overlap with the date range
-                    and_(
-                        Booking.booking_type == BookingType.ACADEMY,
-                        Booking.academy_start_date <= fetch_end_date,
-                        Booking.academy_end_date >= fetch_start_date
-                    )
-                )
-            )
-            .order_by(Booking.booking_date, Booking.time_slot)
-        )
-        bookings = bookings_result.scalars().all()
-
-        # Create updated bookingsData dictionary
-        bookings_data = {}
-        for b in bookings:
-            # For academy bookings, create entries for all dates in the range
-            if b.booking_type == BookingType.ACADEMY:
-                # Parse selected days of week if available
-                selected_days = None
-                if b.academy_days_of_week:
-                    selected_days = [day.strip().upper() for day in b.academy_days_of_week.split(',')]
-
-                current_date = b.academy_start_date
-                while current_date <= b.academy_end_date:
-                    # Only show dates within the requested range
-                    if fetch_start_date <= current_date <= fetch_end_date:
-                        day_name = current_date.strftime('%A').upper()
-
-                        # Only include dates that match the selected days of week
-                        if not selected_days or day_name in selected_days:
-                            key = f"{current_date.isoformat()}_{b.time_slot}"
-                            bookings_data[key] = {
-                                "id": b.id,
-                                "name": b.name,
-                                "phone": b.phone,
-                                "booking_date": current_date.isoformat(),
-                                "time_slot": b.time_slot,
-                                "booking_type": b.booking_type.value,
-                                "academy_start_date": b.academy_start_date.isoformat(),
-                                "academy_end_date": b.academy_end_date.isoformat(),
-                                "academy_days_of_week": b.academy_days_of_week,
-                                "academy_notes": b.academy_notes,
-                                "booked_by": b.user.username
-                            }
-                    current_date += timedelta(days=1)
-            else:
-                # Normal booking
-                key = f"{b.booking_date.isoformat()}_{b.time_slot}"
-                bookings_data[key] = {
-                    "id": b.id,
-                    "name": b.name,
-                    "phone": b.phone,
-                    "booking_date": b.booking_date.isoformat(),
-                    "time_slot": b.time_slot,
-                    "booking_type": b.booking_type.value,
-                    "booked_by": b.user.username
-                }
-
+        matrix = await matrix_payload(db, fetch_start_date, fetch_end_date, since)
         return JSONResponse(content={
             "success": True,
             "message": message,
-            "bookingsData": bookings_data,
+            **matrix,
             "was_soft_deleted": has_transactions and retain_payments
         })
     except Exception as e:
@@ -1423,6 +1665,98 @@ async def delete_booking(
             "message": f"An error occurred: {str(e)}"
         })
 
+
+class BookingBulkDeleteRequest(BaseModel):
+    booking_ids: List[int]
+    retain_payments: bool = True            # cancel paid bookings instead of deleting them
+    start_date: Optional[date] = None       # matrix range to return
+    end_date: Optional[date] = None
+    since: Optional[int] = None             # matrix change cursor → respond with a delta
+
+
+# Most bookings one bulk delete may touch.
+BULK_DELETE_MAX_BOOKINGS = 1000
+
+
+@router.post("/api/bookings/bulk_delete", response_class=JSONResponse)
+async def bulk_delete_bookings(
+    payload: BookingBulkDeleteRequest,
+    current_user: User = Depends(require_master),  # master-only: destructive
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete many bookings at once, with the same rules as /api/delete_booking.
+
+    With retain_payments (the default) bookings that have payments are
+    cancelled and the rest are deleted; without it every booking is deleted
+    along with its transactions and summary. Either way it is at most two
+    statements for the whole list, whatever the number of bookings or payments.
+    """
+    booking_ids = sorted(set(payload.booking_ids))
+    if not booking_ids:
+        return JSONResponse(status_code=400, content={"success": False, "message": "No bookings given"})
+    if len(booking_ids) > BULK_DELETE_MAX_BOOKINGS:
+        return JSONResponse(status_code=400, content={
+            "success": False, "message": f"At most {BULK_DELETE_MAX_BOOKINGS} bookings per request"})
+
+    try:
+        cancelled, already_cancelled = [], []
+        if payload.retain_payments:
+            for row in await cancel_paid_bookings(db, booking_ids, current_user.id):
+                (already_cancelled if row.already_cancelled else cancelled).append(row)
+        deleted = await hard_delete_bookings(db, booking_ids, keep_paid=payload.retain_payments)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logging.error(f"Database error in bulk_delete_bookings: {str(e)}")
+        return JSONResponse(status_code=500, content={"success": False, "message": "Database error"})
+
+    spans = []
+    for row in cancelled + deleted:
+        if row.booking_type == BookingType.ACADEMY.name and row.academy_start_date and row.academy_end_date:
+            spans.append((row.academy_start_date, row.academy_end_date))
+        else:
+            spans.append((row.booking_date, row.booking_date))
+    for span in spans:
+        invalidate_matrix_cache(*span)
+    for row in deleted:
+        invalidate_booking_summary_cache(row.id)
+    if any(row.transaction_count for row in deleted):
+        invalidate_dashboard_cache()
+
+    found = {row.id for row in cancelled + already_cancelled + deleted}
+    missing = [booking_id for booking_id in booking_ids if booking_id not in found]
+    if cancelled or deleted:
+        await record_audit(current_user, "booking.delete", "booking", None,
+                           f"Bulk-removed {len(cancelled) + len(deleted)} "
+                           f"booking{'s' if len(cancelled) + len(deleted) != 1 else ''} "
+                           f"({len(deleted)} deleted, {len(cancelled)} cancelled)",
+                           {"deleted": [row.id for row in deleted][:100],
+                            "cancelled": [row.id for row in cancelled][:100],
+                            "transactions_deleted": sum(row.transaction_count for row in deleted)})
+
+    # Matrix for the requested range, or one covering everything removed
+    if payload.start_date and payload.end_date:
+        fetch_start, fetch_end = payload.start_date, payload.end_date
+    elif spans:
+        fetch_start = min(start for start, _ in spans)
+        fetch_end = max(end for _, end in spans)
+    else:
+        fetch_start = datetime.now().date()
+        fetch_end = fetch_start + timedelta(days=6)
+    fetch_end = min(fetch_end, fetch_start + relativedelta(months=3))
+
+    matrix = await matrix_payload(db, fetch_start, fetch_end, payload.since)
+    return JSONResponse(content={
+        "success": not missing,
+        "message": f"Deleted {len(deleted)}, cancelled {len(cancelled)} of {len(booking_ids)} bookings"
+                   + (f" ({len(already_cancelled)} already cancelled)" if already_cancelled else ""),
+        "deleted": [row.id for row in deleted],
+        "cancelled": [row.id for row in cancelled],
+        "already_cancelled": [row.id for row in already_cancelled],
+        "not_found": missing,
+        **matrix,
+    })
+
 '''
 --------------------
 CANCEL / RESTORE BOOKING ROUTE
@@ -1435,131 +1769,812 @@ async def cancel_booking(
     start_date: str = Query(None),
     end_date: str = Query(None),
     restore: bool = Query(False),  # true → un-cancel (bring the slot back to life)
+    since: int = Query(None),  # Client's matrix change cursor → respond with a delta
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Mark a booking as cancelled WITHOUT touching its money.
+
+    Unlike delete, this always keeps the transactions and the transaction
+    summary intact so any payment already collected stays on the books (visible
+    in the financial journal and, if money was paid, as a "cancelled" overlay on
+    the matrix). Pass ?restore=true to reverse a cancellation.
+    """
+    try:
+        booking_result = await db.execute(select(Booking).filter(Booking.id == booking_id))
+        booking = booking_result.scalar_one_or_none()
+
+        if not booking:
+            return JSONResponse(status_code=404, content={"success": False, "message": "Booking not found"})
+
+        if restore:
+            # Refuse to restore if the slot is now occupied by a live booking.
+            await lock_slots(db, [booking.time_slot])
+            occupied = await db.execute(
+                select(Booking.id).filter(
+                    Booking.booking_date == booking.booking_date,
+                    Booking.time_slot == booking.time_slot,
+                    Booking.id != booking_id,
+                    or_(Booking.is_cancelled == False, Booking.is_cancelled == None),
+                )
+            )
+            if occupied.scalar_one_or_none():
+                return JSONResponse(status_code=409, content={
+                    "success": False,
+                    "message": "Can't restore — this slot is already booked by someone else.",
+                })
+            held = await find_held_dates(db, booking.time_slot, [booking.booking_date])
+            if held:
+                return held_response(held)
+            booking.is_cancelled = False
+            booking.cancelled_at = None
+            message = "Booking restored."
+        else:
+            booking.is_cancelled = True
+            booking.cancelled_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            message = "Booking cancelled. Payment records retained for accounting."
+
+        booking.last_modified_by = current_user.id
+        b_name = booking.name
+        b_slot = booking.time_slot
+        b_date = booking.booking_date
+        span = booking_span(booking)
+        await db.commit()
+        invalidate_dashboard_cache()
+        invalidate_booking_summary_cache(booking_id)
+        invalidate_matrix_cache(*span)
+        await record_audit(current_user,
+                           "booking.restore" if restore else "booking.cancel",
+                           "booking", booking_id,
+                           f"{'Restored' if restore else 'Cancelled'} booking for {b_name} · {b_slot}")
+
+        # Return the refreshed matrix for the requested range so the client can
+        # patch both live and cancelled overlays in one shot.
+        today = datetime.now().date()
+        try:
+            fetch_start = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else b_date - timedelta(days=3)
+            fetch_end = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else b_date + timedelta(days=3)
+        except ValueError:
+            fetch_start, fetch_end = today, today + timedelta(days=6)
+        fetch_end = min(fetch_end, fetch_start + relativedelta(months=3))
+
+        matrix = await matrix_payload(db, fetch_start, fetch_end, since)
+        return JSONResponse(content={"success": True, "message": message, **matrix})
+    except Exception as e:
+        await db.rollback()
+        print(f"Error in cancel_booking: {str(e)}")
+        return JSONResponse(status_code=500, content={"success": False, "message": f"An error occurred: {str(e)}"})
+
+
+'''
+--------------------
+BATCH BOOKING ROUTE
+--------------------
+'''
+
+# Upper bound on specs per /api/bookings/batch call (tournament-day setup is
+# a few dozen at most); keeps one request from holding a transaction too long.
+BATCH_BOOKING_LIMIT = int(os.getenv("BATCH_BOOKING_LIMIT", "50"))
+
+
+class BookingSpec(BaseModel):
+    name: str
+    phone: str
+    time_slot: str
+    booking_type: str = "NORMAL"            # NORMAL or ACADEMY
+    booking_date: Optional[date] = None     # single normal booking
+    start_date: Optional[date] = None       # bulk normal series / academy range
+    end_date: Optional[date] = None
+    days_of_week: Optional[str] = None      # e.g. "MONDAY,FRIDAY"; empty = every day
+    academy_notes: Optional[str] = None
+
+
+class BookingBatchRequest(BaseModel):
+    bookings: List[BookingSpec]
+    atomic: bool = True                     # all-or-nothing, or commit each item that fits
+    start_date: Optional[date] = None       # matrix range to return
+    end_date: Optional[date] = None
+    since: Optional[int] = None             # matrix change cursor → respond with a delta
+
+
+def _expand_batch_spec(spec: BookingSpec):
+    """Resolve a spec to (kind, booking_type, dates it occupies); ValueError if invalid."""
+    try:
+        booking_type = BookingType[spec.booking_type]
+    except KeyError:
+        raise ValueError(f"Invalid booking type: {spec.booking_type}")
+
+    if booking_type == BookingType.ACADEMY or (spec.start_date and spec.end_date):
+        if not spec.start_date or not spec.end_date:
+            raise ValueError("Academy bookings require start and end dates")
+        if spec.end_date < spec.start_date:
+            raise ValueError("End date is before start date")
+        dates = list(iter_occurrences(spec.start_date, spec.end_date, mask_from_csv(spec.days_of_week)))
+        if not dates:
+            raise ValueError("No matching days found in the selected period")
+        return ("academy" if booking_type == BookingType.ACADEMY else "series"), booking_type, dates
+
+    if not spec.booking_date:
+        raise ValueError("booking_date is required")
+    return "single", booking_type, [spec.booking_date]
+
+
+async def _write_batch_item(db: AsyncSession, user: User, kind: str, spec: BookingSpec, dates: list) -> list:
+    """Write one validated batch item inside the caller's transaction; returns booking ids."""
+    if kind == "single":
+        booking_id = await insert_normal_booking(db, user.id, spec.name, spec.phone, dates[0], spec.time_slot)
+        if booking_id is None:
+            raise HTTPException(status_code=409, detail="This slot is already booked or held")
+        return [booking_id]
+
+    if kind == "series":
+        created = await insert_normal_booking_series(db, user.id, spec.name, spec.phone, spec.time_slot, dates)
+        if len(created) < len(dates):
+            created_dates = {d for _, d in created}
+            lost = [d.isoformat() for d in dates if d not in created_dates]
+            raise HTTPException(status_code=409, detail=f"Conflict on dates: {', '.join(lost[:5])}")
+        return [booking_id for booking_id, _ in created]
+
+    quote = await calculate_academy_price(
+        db, spec.time_slot, spec.start_date, spec.end_date, spec.days_of_week
+    )
+    total_price, days_count = quote.total, quote.days
+    booking = Booking(
+        booked_by=user.id,
+        name=spec.name,
+        phone=spec.phone,
+        booking_date=spec.start_date,
+        time_slot=spec.time_slot,
+        booking_type=BookingType.ACADEMY,
+        academy_start_date=spec.start_date,
+        academy_end_date=spec.end_date,
+        academy_month_days=days_count,
+        academy_days_of_week=spec.days_of_week,
+        academy_notes=spec.academy_notes,
+        last_modified_by=user.id
+    )
+    db.add(booking)
+    await db.flush()
+    db.add(TransactionSummary(
+        booking_id=booking.id,
+        total_price=total_price,
+        total_paid=0,
+        leftover=total_price,
+        status=TransactionStatus.PENDING
+    ))
+    await db.flush()
+    return [booking.id]
+
+
+@router.post("/api/bookings/batch", response_class=JSONResponse)
+async def batch_bookings(
+    payload: BookingBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Book several slots (normal, bulk series or academy) in one request.
+
+    Every cell the batch wants is checked against live occupancy and live
+    slot holds, and against the other items in the batch. With atomic=true (the
+    default) any invalid or conflicting item fails the whole batch and nothing
+    is written; with atomic=false each item gets its own savepoint and the rest
+    still go through. Responds with per-item results and one matrix payload
+    (a delta when `since` is given).
+    """
+    specs = payload.bookings
+    if not specs:
+        return JSONResponse(status_code=400, content={"success": False, "message": "No bookings given"})
+    if len(specs) > BATCH_BOOKING_LIMIT:
+        return JSONResponse(status_code=400, content={
+            "success": False,
+            "message": f"At most {BATCH_BOOKING_LIMIT} bookings per batch"
+        })
+
+    try:
+        results: list = [None] * len(specs)
+        plans = []
+        for i, spec in enumerate(specs):
+            try:
+                kind, booking_type, dates = _expand_batch_spec(spec)
+            except ValueError as e:
+                results[i] = {"index": i, "success": False, "message": str(e)}
+                continue
+            plans.append((i, spec, kind, dates))
+
+        # One occupancy lookup for every cell in the batch, under the slot locks
+        await lock_slots(db, [spec.time_slot for _, spec, _, _ in plans])
+        cells = [(d, spec.time_slot) for _, spec, _, dates in plans for d in dates]
+        taken = await find_cell_conflicts(db, cells)
+        held = await held_cells(db, cells)
+
+        claimed: dict = {}
+        writable = []
+        for i, spec, kind, dates in plans:
+            clashes = [
+                f"{d.isoformat()} (academy)" if taken[(d, spec.time_slot)] == BookingType.ACADEMY else d.isoformat()
+                for d in dates if (d, spec.time_slot) in taken
+            ]
+            overlaps = sorted({claimed[(d, spec.time_slot)] for d in dates if (d, spec.time_slot) in claimed})
+            held_dates = [d.isoformat() for d in dates if (d, spec.time_slot) in held]
+            if clashes:
+                results[i] = {"index": i, "success": False, "message": f"Conflict on dates: {', '.join(clashes[:5])}"}
+            elif held_dates:
+                results[i] = {"index": i, "success": False, "message": f"This slot is held on {', '.join(held_dates[:5])}"}
+            elif overlaps:
+                results[i] = {"index": i, "success": False,
+                              "message": f"Overlaps item {', '.join(f'#{k}' for k in overlaps)} in this batch"}
+            else:
+                for d in dates:
+                    claimed[(d, spec.time_slot)] = i
+                writable.append((i, spec, kind, dates))
+
+        if payload.atomic and len(writable) < len(specs):
+            return JSONResponse(status_code=409, content={
+                "success": False,
+                "message": "Batch rejected; nothing was booked",
+                "results": results,
+            })
+
+        written = []
+        for i, spec, kind, dates in writable:
+            try:
+                if payload.atomic:
+                    booking_ids = await _write_batch_item(db, current_user, kind, spec, dates)
+                else:
+                    async with db.begin_nested():
+                        booking_ids = await _write_batch_item(db, current_user, kind, spec, dates)
+            except (HTTPException, IntegrityError) as e:
+                message = e.detail if isinstance(e, HTTPException) else "This slot is already booked"
+                results[i] = {"index": i, "success": False, "message": message}
+                if payload.atomic:
+                    await db.rollback()
+                    return JSONResponse(status_code=409, content={
+                        "success": False,
+                        "message": "Batch rejected; nothing was booked",
+                        "results": results,
+                    })
+                continue
+            results[i] = {"index": i, "success": True, "booking_ids": booking_ids,
+                          "message": f"Booked {len(dates)} slot{'s' if len(dates) != 1 else ''}"}
+            written.append((i, spec, dates, booking_ids))
+
+        await db.commit()
+
+        for _, spec, dates, _ in written:
+            invalidate_matrix_cache(dates[0], dates[-1])
+        if written:
+            await record_audit(current_user, "booking.create", "booking", None,
+                               f"Batch-booked {len(written)} item{'s' if len(written) != 1 else ''}",
+                               {"type": "BATCH", "items": [
+                                   {"name": spec.name, "slot": spec.time_slot, "dates": len(dates),
+                                    "booking_ids": booking_ids[:20]}
+                                   for _, spec, dates, booking_ids in written
+                               ]})
+
+        # Matrix for the requested range, or one covering everything booked
+        if payload.start_date and payload.end_date:
+            fetch_start, fetch_end = payload.start_date, payload.end_date
+        elif written:
+            fetch_start = min(dates[0] for _, _, dates, _ in written)
+            fetch_end = max(dates[-1] for _, _, dates, _ in written)
+        else:
+            fetch_start = datetime.now().date()
+            fetch_end = fetch_start + timedelta(days=6)
+        fetch_end = min(fetch_end, fetch_start + relativedelta(months=3))
+
+        matrix = await matrix_payload(db, fetch_start, fetch_end, payload.since)
+        failed = sum(1 for r in results if not r["success"])
+        return JSONResponse(content={
+            "success": failed == 0,
+            "message": f"Booked {len(written)} of {len(specs)} items",
+            "results": results,
+            **matrix,
+        })
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logging.error(f"Database error in batch_bookings: {str(e)}")
+        return JSONResponse(status_code=500, content={"success": False, "message": "Database error"})
+
+
+'''
+--------------------
+BOOKINGS MATRIX ROUTE
+--------------------
+'''
+
+
+@router.get("/api/bookings")
+async def bookings(
+    request: Request,
+    start_date: str = None,
+    end_date: str = None,
+    since: int = None,
+    format: str = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Bookings matrix for a date range.
+
+    Pass ?since=<seq> (the `seq` from a previous response) to receive only the
+    cells changed since then; see build_matrix_delta for the payload shape.
+    Falls back to the full matrix when the cursor can't be served as a delta.
+    Pass ?format=compact to get the full matrix in the columnar layout of
+    serialize_matrix_rows_compact (deltas keep their usual shape).
+    """
+    if not current_user:
+        return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+
+    # Let the browser keep a copy but revalidate it on every use. The ETag is
+    # the range's change version (see matrix_range_version), so a refetch after
+    # a mutation always misses and gets the new matrix, while the common
+    # revalidate-on-focus refetch of an unchanged week is answered with a 304
+    # before the matrix is built at all.
+    _bookings_cache_headers = {"Cache-Control": "private, no-cache"}
+
+    today = datetime.now().date()
+
+    if start_date:
+        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+    else:
+        start_date = today
+
+    if end_date:
+        end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+    else:
+        end_date = start_date + timedelta(days=6)
+
+    # Ensure the range doesn't exceed 3 months
+    max_end_date = start_date + relativedelta(months=3)
+    end_date = min(end_date, max_end_date)
+
+    compact = format == "compact"
+    fmt = "compact" if compact else "full"
+
+    etag = await matrix_range_version(db, start_date, end_date)
+    if etag and compact:
+        etag = etag[:-1] + '-c"'  # distinct validator per representation
+    if etag:
+        _bookings_cache_headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=_bookings_cache_headers)
+
+    if since is not None:
+        delta = await build_matrix_delta(db, since, start_date, end_date)
+        if delta is not None:
+            return JSONResponse(content=delta, headers=_bookings_cache_headers)
+
+    # Full matrix: serve the already-encoded body if this window is cached
+    # under the current version (the ETag doubles as the cache validator).
+    if etag:
+        cached_body = matrix_cache.get(start_date, end_date, etag, fmt)
+        if cached_body is not None:
+            return Response(content=cached_body, media_type="application/json",
+                            headers=_bookings_cache_headers)
+
+    # bookingsData = live bookings; cancelledData = cancelled bookings that still
+    # hold money (rendered as a "cancelled but paid" overlay on the matrix).
+    matrix = await matrix_payload(db, start_date, end_date, compact=compact)
+    response = JSONResponse(content=matrix, headers=_bookings_cache_headers)
+    if etag:
+        matrix_cache.put(start_date, end_date, etag, response.body, fmt)
+    return response
+
+
+@router.get("/api/bookings/cache-stats")
+async def bookings_cache_stats(current_user: User = Depends(require_master)):
+    """Hit rate, size and eviction counters for this worker's matrix cache."""
+    return {"success": True, "cache": matrix_cache.stats()}
+
+
+
+
+
+@router.post("/api/bookings/stream-ticket")
+async def bookings_stream_ticket(current_user: User = Depends(get_current_user)):
+    """A ticket for opening /api/bookings/stream, good for STREAM_TICKET_EXPIRE_SECONDS."""
+    return {"success": True, "ticket": create_stream_ticket(current_user)}
+
+
+@router.get("/api/bookings/stream")
+async def bookings_stream(
+    request: Request,
+    start_date: str = None,
+    end_date: str = None,
+    current_user: User = Depends(get_current_user_from_ticket),
+):
+    """Server-sent events for the matrix range an admin has open.
+
+    EventSource can't set headers, so auth comes as ?ticket=, a short-lived
+    token from POST /api/bookings/stream-ticket. The access token itself is
+    refused here, and a ticket is refused everywhere else. The ticket is only
+    checked on connect, so clients fetch a new one for each reconnect.
+    Events:
+      - cells:  {"seq", "changedKeys"} — cells in range changed by anyone
+                (any worker); the client pulls them via /api/bookings?since=.
+      - resync: notifications may have been missed; refetch with ?since=.
+    A comment line every 15s keeps proxies from closing an idle stream.
+    """
+    today = datetime.now().date()
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else today
+        end = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else start + timedelta(days=6)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"success": False, "message": "Invalid date format. Use YYYY-MM-DD."})
+    end = min(end, start + relativedelta(months=3))
+
+    subscription = matrix_broker.subscribe(start, end)
+
+    async def event_source():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            matrix_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
+
+'''
+--------------------
+AVAILABILITY ROUTE
+--------------------
+'''
+
+@router.get("/api/availability/search")
+async def availability_search(
+    start_date: str = None,
+    end_date: str = None,
+    days: str = None,
+    time_slot: Optional[List[str]] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Free (date, slot) pairs in a date range, with the price each would book at.
+
+    Query params:
+      - start_date / end_date: YYYY-MM-DD. Default to today and today + 6 days.
+        The range is capped at 3 months, like /api/bookings.
+      - days: comma-separated weekday names, e.g. "SATURDAY,SUNDAY". All days
+        if omitted.
+      - time_slot: repeat it to limit the search to those slots. All slots with
+        a price if omitted.
+    A cell is free when no active booking (normal or academy) and no unexpired
+    slot hold has it. Cancelled bookings don't count.
+    """
+    if not current_user:
+        return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+
+    today = datetime.now().date()
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else today
+        end = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else start + timedelta(days=6)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"success": False, "message": "Invalid date format. Use YYYY-MM-DD."})
+    if end < start:
+        return JSONResponse(status_code=400, content={"success": False, "message": "end_date must be on or after start_date"})
+    end = min(end, start + relativedelta(months=3))
+
+    days_mask = ALL_DAYS
+    if days:
+        unknown = [d.strip() for d in days.split(',') if d.strip() and d.strip().upper() not in WEEKDAY_NAMES]
+        if unknown:
+            return JSONResponse(status_code=400, content={
+                "success": False, "message": f"Unknown day(s): {', '.join(unknown)}"})
+        days_mask = mask_from_csv(days)
+
+    try:
+        cells = await fetch_availability(db, start, end, days_mask, time_slot, free_only=True)
+    except SQLAlchemyError as e:
+        logging.error(f"Database error in availability_search: {str(e)}")
+        return JSONResponse(status_code=500, content={"success": False, "message": "Database error"})
+
+    return {
+        "success": True,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "count": len(cells),
+        "slots": [
+            {
+                "date": slot_date.isoformat(),
+                "day_of_week": WEEKDAY_NAMES[slot_date.weekday()],
+                "time_slot": slot,
+                "price": price,
+            }
+            for slot_date, slot, price, _ in cells
+        ],
+    }
+
+
+# Shared caches and browsers may keep the public grid this long. A booking
+# shows up there within this many seconds plus the snapshot debounce.
+PUBLIC_AVAILABILITY_MAX_AGE = int(os.getenv("PUBLIC_AVAILABILITY_MAX_AGE", "60"))
+
+
+@router.get("/public/availability")
+async def public_availability(request: Request, day: str = Query(None, alias="date")):
+    """Unauthenticated free/taken grid with prices, for the customer booking app.
+
+    Served from availability_snapshot: the body is pre-encoded, there's no
+    auth dependency and no session, so a request costs a dict lookup. Covers
+    today + AVAILABILITY_SNAPSHOT_DAYS. Pass ?date=YYYY-MM-DD for a single day.
+    Shared caches may keep it for PUBLIC_AVAILABILITY_MAX_AGE seconds and then
+    revalidate it with the ETag.
+    """
+    headers = {
+        "Cache-Control": (f"public, max-age={PUBLIC_AVAILABILITY_MAX_AGE}, "
+                          f"stale-while-revalidate={PUBLIC_AVAILABILITY_MAX_AGE * 10}"),
+    }
+    snapshot = await availability_snapshot.get()
+    if snapshot is None:
+        return JSONResponse(status_code=503, headers={"Retry-After": "5"},
+                            content={"success": False, "message": "Availability is temporarily unavailable"})
+
+    body, etag = snapshot.body, snapshot.etag
+    if day:
+        try:
+            day_date = datetime.strptime(day, "%Y-%m-%d").date()
+        except ValueError:
+            return JSONResponse(status_code=400, content={"success": False, "message": "Invalid date format. Use YYYY-MM-DD."})
+        if day_date not in snapshot.by_date:
+            return JSONResponse(status_code=404, headers=headers, content={
+                "success": False,
+                "message": f"Availability is published from {snapshot.start_date} to {snapshot.end_date}",
+            })
+        body, etag = snapshot.by_date[day_date]
+
+    headers["ETag"] = etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/api/availability/snapshot-stats")
+async def availability_snapshot_stats(current_user: User = Depends(require_master)):
+    """Age, size and rebuild counters for this worker's public availability snapshot."""
+    return {"success": True, "snapshot": availability_snapshot.stats()}
+
+
+@router.get("/api/pricing/stats")
+async def pricing_stats(current_user: User = Depends(require_master)):
+    """Row count, age and load counter for this worker's compiled price table."""
+    return {"success": True, "pricing": price_engine.stats()}
+
+
+
+
+'''
+--------------------
+QUOTE ROUTE
+--------------------
+'''
+
+# Longest range a quote may cover. Academies run for months, but not years.
+QUOTE_MAX_MONTHS = 12
+
+
+@router.get("/api/quote")
+async def quote_booking(
+    time_slot: str,
+    start_date: str,
+    end_date: str = None,
+    booking_type: str = "NORMAL",
+    days_of_week: str = None,
+    booking_id: int = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Mark a booking as cancelled WITHOUT touching its money.
-
-    Unlike delete, this always keeps the transactions and the transaction
-    summary intact so any payment already collected stays on the books (visible
-    in the financial journal and, if money was paid, as a "cancelled" overlay on
-    the matrix). Pass ?restore=true to reverse a cancellation.
+    """Preview the price and availability of a booking without writing anything.
+
+    Query params:
+      - time_slot, start_date (YYYY-MM-DD): required. A single normal booking
+        needs nothing else.
+      - end_date, days_of_week: a bulk normal series or an academy range, as
+        the booking form sends them. Every day if days_of_week is omitted.
+      - booking_type: NORMAL (default) or ACADEMY. Academy days are priced at
+        the academy rate where one exists.
+      - booking_id: when editing, the booking's own days don't count as conflicts.
+    Prices come from the cached price table, with every date priced at the rule
+    in effect on it. Conflicts are one indexed occupancy query, the same one
+    /api/availability/search runs, so they include live slot holds.
     """
+    if not current_user:
+        return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+
     try:
-        booking_result = await db.execute(select(Booking).filter(Booking.id == booking_id))
-        booking = booking_result.scalar_one_or_none()
+        kind = BookingType[booking_type.strip().upper()]
+    except KeyError:
+        return JSONResponse(status_code=400, content={"success": False, "message": f"Invalid booking type: {booking_type}"})
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else start
+    except ValueError:
+        return JSONResponse(status_code=400, content={"success": False, "message": "Invalid date format. Use YYYY-MM-DD."})
+    if end < start:
+        return JSONResponse(status_code=400, content={"success": False, "message": "end_date must be on or after start_date"})
+    if end > start + relativedelta(months=QUOTE_MAX_MONTHS):
+        return JSONResponse(status_code=400, content={
+            "success": False, "message": f"A quote can cover at most {QUOTE_MAX_MONTHS} months"})
 
-        if not booking:
-            return JSONResponse(status_code=404, content={"success": False, "message": "Booking not found"})
+    days_mask = ALL_DAYS
+    if days_of_week:
+        unknown = [d.strip() for d in days_of_week.split(',') if d.strip() and d.strip().upper() not in WEEKDAY_NAMES]
+        if unknown:
+            return JSONResponse(status_code=400, content={
+                "success": False, "message": f"Unknown day(s): {', '.join(unknown)}"})
+        days_mask = mask_from_csv(days_of_week)
 
-        if restore:
-            # Refuse to restore if the slot is now occupied by a live booking.
-            occupied = await db.execute(
-                select(Booking.id).filter(
-                    Booking.booking_date == booking.booking_date,
-                    Booking.time_slot == booking.time_slot,
-                    Booking.id != booking_id,
-                    or_(Booking.is_cancelled == False, Booking.is_cancelled == None),
+    occurrences = count_occurrences(start, end, days_mask)
+    if occurrences == 0:
+        return JSONResponse(status_code=400, content={"success": False, "message": "No matching days found in the selected period"})
+
+    try:
+        prices = await price_engine.table(db)
+        quote = prices.quote(time_slot, start, end, days_mask, kind)
+        cells = await fetch_availability(db, start, end, days_mask, [time_slot])
+        taken = [slot_date for slot_date, _, _, is_taken in cells if is_taken]
+        if taken and booking_id:
+            own = await db.execute(
+                select(BookingSlotDay.slot_date).filter(
+                    BookingSlotDay.booking_id == booking_id,
+                    BookingSlotDay.time_slot == time_slot,
+                    BookingSlotDay.slot_date.between(start, end)
                 )
             )
-            if occupied.scalar_one_or_none():
-                return JSONResponse(status_code=409, content={
-                    "success": False,
-                    "message": "Can't restore — this slot is already booked by someone else.",
-                })
-            booking.is_cancelled = False
-            booking.cancelled_at = None
-            message = "Booking restored."
-        else:
-            booking.is_cancelled = True
-            booking.cancelled_at = datetime.now(timezone.utc).replace(tzinfo=None)
-            message = "Booking cancelled. Payment records retained for accounting."
-
-        booking.last_modified_by = current_user.id
-        b_name = booking.name
-        b_slot = booking.time_slot
-        b_date = booking.booking_date
-        await db.commit()
-        invalidate_dashboard_cache()
-        invalidate_booking_summary_cache(booking_id)
-        await record_audit(current_user,
-                           "booking.restore" if restore else "booking.cancel",
-                           "booking", booking_id,
-                           f"{'Restored' if restore else 'Cancelled'} booking for {b_name} · {b_slot}")
+            own_dates = set(own.scalars().all())
+            taken = [d for d in taken if d not in own_dates]
+    except SQLAlchemyError as e:
+        logging.error(f"Database error in quote_booking: {str(e)}")
+        return JSONResponse(status_code=500, content={"success": False, "message": "Database error"})
 
-        # Return the refreshed matrix for the requested range so the client can
-        # patch both live and cancelled overlays in one shot.
-        today = datetime.now().date()
-        try:
-            fetch_start = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else b_date - timedelta(days=3)
-            fetch_end = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else b_date + timedelta(days=3)
-        except ValueError:
-            fetch_start, fetch_end = today, today + timedelta(days=6)
-        fetch_end = min(fetch_end, fetch_start + relativedelta(months=3))
+    return {
+        "success": True,
+        "time_slot": time_slot,
+        "booking_type": kind.name,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "occurrences": occurrences,
+        **quote.to_dict(),
+        "first_unpriced_date": quote.first_unpriced.isoformat() if quote.first_unpriced else None,
+        "available": not taken,
+        "conflict_count": len(taken),
+        "conflict_dates": [d.isoformat() for d in taken[:20]],
+    }
 
-        bookings_data, cancelled_data = await build_matrix_response(db, fetch_start, fetch_end)
 
-        return JSONResponse(content={
-            "success": True,
-            "message": message,
-            "bookingsData": bookings_data,
-            "cancelledData": cancelled_data,
-        })
-    except Exception as e:
-        await db.rollback()
-        print(f"Error in cancel_booking: {str(e)}")
-        return JSONResponse(status_code=500, content={"success": False, "message": f"An error occurred: {str(e)}"})
 
 
 '''
 --------------------
-BOOKINGS MATRIX ROUTE
+SLOT HOLD ROUTE
 --------------------
 '''
 
+class SlotHoldRequest(BaseModel):
+    booking_date: date
+    time_slot: str
+    name: str
+    phone: str
+    ttl_seconds: Optional[int] = None       # default SLOT_HOLD_TTL_SECONDS, capped at the max
 
-@router.get("/api/bookings")
-async def bookings(
-    request: Request,
-    start_date: str = None,
-    end_date: str = None,
+
+@router.post("/api/holds", status_code=201)
+async def create_slot_hold(
+    payload: SlotHoldRequest,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
+    """Hold a slot while a payment completes.
+
+    Returns a hold_token. Confirm it with POST /api/holds/{token}/confirm, or
+    release it early with DELETE /api/holds/{token}. Otherwise the hold expires
+    at expires_at and the slot opens again. While the hold is live, the slot
+    counts as taken in availability search and the public grid, shows in the
+    matrix's heldData, and any staff booking that needs the cell gets a 409.
+    """
     if not current_user:
         return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+    if payload.booking_date < datetime.now().date():
+        return JSONResponse(status_code=400, content={"success": False, "message": "Cannot hold a past date"})
+    if not payload.name.strip() or not payload.phone.strip():
+        return JSONResponse(status_code=400, content={"success": False, "message": "Name and phone are required"})
 
-    # Tell the browser NOT to cache this response. We rely on SWR's in-memory
-    # cache for fast re-renders; a browser-level HTTP cache would intercept
-    # the post-mutation refetch and return a stale response (without the
-    # newly added booking), making new slots appear "missing" until refresh.
-    _bookings_cache_headers = {"Cache-Control": "private, no-store"}
+    try:
+        hold = await place_hold(db, payload.booking_date, payload.time_slot,
+                                payload.name.strip(), payload.phone.strip(),
+                                current_user.id, payload.ttl_seconds)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logging.error(f"Database error in create_slot_hold: {str(e)}")
+        return JSONResponse(status_code=500, content={"success": False, "message": "Database error"})
 
-    today = datetime.now().date()
+    if hold is None:
+        return JSONResponse(status_code=409, content={"success": False, "message": "This slot is already booked or held"})
 
-    if start_date:
-        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-    else:
-        start_date = today
+    invalidate_matrix_cache(payload.booking_date)
+    availability_snapshot.mark_stale()
+    return {
+        "success": True,
+        "hold_token": hold.hold_token,
+        "expires_at": hold.expires_at.isoformat(),
+        "booking_date": payload.booking_date.isoformat(),
+        "time_slot": payload.time_slot,
+    }
 
-    if end_date:
-        end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-    else:
-        end_date = start_date + timedelta(days=6)
 
-    # Ensure the range doesn't exceed 3 months
-    max_end_date = start_date + relativedelta(months=3)
-    end_date = min(end_date, max_end_date)
+@router.post("/api/holds/{token}/confirm")
+async def confirm_slot_hold(
+    token: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Turn a live hold into a NORMAL booking under the name and phone it was held for."""
+    if not current_user:
+        return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
 
-    # bookingsData = live bookings; cancelledData = cancelled bookings that still
-    # hold money (rendered as a "cancelled but paid" overlay on the matrix).
-    bookings_data, cancelled_data = await build_matrix_response(db, start_date, end_date)
+    try:
+        booked = await confirm_hold(db, token, current_user.id)
+        if booked is None:
+            await db.rollback()
+            if await hold_is_live(db, token):
+                # Staff booked the cell directly while it was held.
+                return JSONResponse(status_code=409, content={"success": False, "message": "This slot has been booked by someone else"})
+            return JSONResponse(status_code=410, content={"success": False, "message": "Hold has expired or does not exist"})
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logging.error(f"Database error in confirm_slot_hold: {str(e)}")
+        return JSONResponse(status_code=500, content={"success": False, "message": "Database error"})
 
-    return JSONResponse(
-        content={"bookingsData": bookings_data, "cancelledData": cancelled_data},
-        headers=_bookings_cache_headers,
-    )
+    booking_id, booking_date, time_slot = booked
+    invalidate_matrix_cache(booking_date)
+    availability_snapshot.mark_stale()
+    await record_audit(current_user, "booking.create", "booking", booking_id,
+                       f"Confirmed held slot · {booking_date} · {time_slot}",
+                       {"type": "HOLD", "date": str(booking_date), "slot": time_slot})
+    return {
+        "success": True,
+        "booking_id": booking_id,
+        "booking_date": booking_date.isoformat(),
+        "time_slot": time_slot,
+    }
+
+
+@router.delete("/api/holds/{token}")
+async def release_slot_hold(
+    token: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Give a held slot back before it expires (payment cancelled or failed)."""
+    if not current_user:
+        return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+
+    try:
+        released = await release_hold(db, token)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logging.error(f"Database error in release_slot_hold: {str(e)}")
+        return JSONResponse(status_code=500, content={"success": False, "message": "Database error"})
 
+    if released is None:
+        return JSONResponse(status_code=404, content={"success": False, "message": "Hold not found"})
+    invalidate_matrix_cache(released.slot_date)
+    availability_snapshot.mark_stale()
+    return {"success": True}
 
 
 
@@ -1600,18 +2615,6 @@ async def list_slot_prices(db: AsyncSession = Depends(get_db)):
 @router.get("/available_time_slots", response_class=JSONResponse)
 async def get_available_time_slots(db: AsyncSession = Depends(get_db)):
     try:
-        # Canonical time slot order (chronological)
-        SLOT_ORDER = [
-            "9:30 AM - 11:00 AM",
-            "11:00 AM - 12:30 PM",
-            "12:30 PM - 2:00 PM",
-            "3:00 PM - 4:30 PM",
-            "4:30 PM - 6:00 PM",
-            "6:00 PM - 7:30 PM",
-            "7:30 PM - 9:00 PM",
-            "9:00 PM - 10:30 PM"
-        ]
-
         # Get all unique time slots from the slot_prices table
         result = await db.execute(
             select(SlotPrice.time_slot).distinct()
@@ -1619,10 +2622,7 @@ async def get_available_time_slots(db: AsyncSession = Depends(get_db)):
         db_time_slots = [row[0] for row in result.fetchall()]
 
         # Sort by canonical order, putting any unknown slots at the end
-        time_slots = sorted(
-            db_time_slots,
-            key=lambda x: SLOT_ORDER.index(x) if x in SLOT_ORDER else 999
-        )
+        time_slots = sorted(db_time_slots, key=slot_sort_key)
 
         return JSONResponse(content={
             "success": True,
@@ -1636,16 +2636,7 @@ async def get_available_time_slots(db: AsyncSession = Depends(get_db)):
 @router.get("/current_slot_prices", response_class=JSONResponse)
 async def get_current_slot_prices(db: AsyncSession = Depends(get_db)):
     try:
-        slot_order = [
-            "9:30 AM - 11:00 AM",
-            "11:00 AM - 12:30 PM",
-            "12:30 PM - 2:00 PM",
-            "3:00 PM - 4:30 PM",
-            "4:30 PM - 6:00 PM",
-            "6:00 PM - 7:30 PM",
-            "7:30 PM - 9:00 PM",
-            "9:00 PM - 10:30 PM"
-        ]
+        # Index in this list == date.weekday(), as PriceTable expects.
         day_order = [
             DayOfWeek.MONDAY,
             DayOfWeek.TUESDAY,
@@ -1671,50 +2662,20 @@ async def get_current_slot_prices(db: AsyncSession = Depends(get_db)):
                 return True
             return False
 
-        all_prices_result = await db.execute(select(SlotPrice))
-        all_prices = all_prices_result.scalars().all()
+        prices = await price_engine.table(db)
 
-        distinct_slots = sorted(
-            list({sp.time_slot for sp in all_prices}),
-            key=lambda x: slot_order.index(x) if x in slot_order else 999
-        )
+        distinct_slots = sorted(prices.time_slots, key=slot_sort_key)
         day_slots = [slot for slot in distinct_slots if is_day_slot(slot)]
         night_slots = [slot for slot in distinct_slots if not is_day_slot(slot)]
         today = datetime.now().date()
 
-        def pick_effective(prices: list[SlotPrice]) -> tuple[SlotPrice | None, str]:
-            if not prices:
-                return None, "NONE"
-
-            active_temporary = [
-                sp for sp in prices
-                if (not sp.is_default)
-                and sp.start_date is not None
-                and sp.end_date is not None
-                and sp.start_date <= today <= sp.end_date
-            ]
-            if active_temporary:
-                selected = sorted(active_temporary, key=lambda sp: sp.start_date or today)[-1]
-                return selected, "ACTIVE_TEMPORARY"
-
-            default_rows = [sp for sp in prices if sp.is_default]
-            clean_defaults = [sp for sp in default_rows if sp.start_date is None and sp.end_date is None]
-            if clean_defaults:
-                return clean_defaults[0], "DEFAULT"
-            if default_rows:
-                return default_rows[0], "DEFAULT"
-
-            selected = sorted(prices, key=lambda sp: sp.start_date or today)[-1]
-            return selected, "FALLBACK"
-
         effective_prices = []
         for slot in distinct_slots:
-            for day in day_order:
-                candidates = [
-                    sp for sp in all_prices
-                    if sp.time_slot == slot and sp.day_of_week == day
-                ]
-                selected, source = pick_effective(candidates)
+            for weekday, day in enumerate(day_order):
+                selected = prices.resolve_weekday(slot, weekday, today)
+                source = "NONE"
+                if selected:
+                    source = "DEFAULT" if selected.source == DATED_DEFAULT else selected.source
                 effective_prices.append({
                     "time_slot": slot,
                     "day_of_week": day.name,
@@ -1724,7 +2685,7 @@ async def get_current_slot_prices(db: AsyncSession = Depends(get_db)):
                     "is_default": selected.is_default if selected else None,
                     "start_date": selected.start_date.isoformat() if selected and selected.start_date else None,
                     "end_date": selected.end_date.isoformat() if selected and selected.end_date else None,
-                    "candidate_count": len(candidates)
+                    "candidate_count": len(prices.candidates(slot, weekday))
                 })
 
         return JSONResponse(content={
@@ -1823,6 +2784,8 @@ async def add_update_slot_price(
                            f"Set price ৳{price:g} for {time_slot} · {day_of_week}",
                            {"time_slot": time_slot, "day": day_of_week, "price": price,
                             "is_default": is_default, "start": start_date, "end": end_date})
+        price_engine.invalidate()
+        availability_snapshot.mark_stale()
         return JSONResponse(content={"success": True, "message": "Slot price added/updated successfully"})
     except Exception as exc:
         await db.rollback()
@@ -1850,6 +2813,8 @@ async def delete_slot_price(
         await db.commit()
         await record_audit(current_user, "slot_price.delete", "slot_price", slot_price_id,
                            f"Deleted price {price_desc}")
+        price_engine.invalidate()
+        availability_snapshot.mark_stale()
 
         return JSONResponse(content={"success": True, "message": "Slot price deleted successfully"})
     except Exception as exc:
@@ -1886,40 +2851,116 @@ async def get_bookings_for_date(date: str, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+# Rows per page of /transactions_list, and the most a client may ask for.
+TRANSACTIONS_PAGE_SIZE = 500
+TRANSACTIONS_PAGE_MAX = 5000
+# Rows fetched per round trip from the server-side cursor when streaming.
+TRANSACTIONS_STREAM_BATCH = 500
+
+
+def _encode_transactions_cursor(created_at: datetime, transaction_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{transaction_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_transactions_cursor(cursor: str) -> tuple:
+    """Opaque cursor -> (created_at, id) of the last row served. ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, transaction_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _transaction_list_row(row) -> dict:
+    return {
+        "id": row.id,
+        "booking_date": row.booking_date.isoformat(),
+        "time_slot": row.time_slot,
+        "transaction_type": row.transaction_type.value,
+        "payment_method": row.payment_method.value if row.payment_method else None,
+        "amount": row.amount,
+        "creator": row.creator,
+        "created_at": row.created_at.isoformat()
+    }
+
+
 @router.get("/transactions_list")
 async def get_transactions(
     start_date: str = None,
     end_date: str = None,
+    cursor: str = None,
+    limit: int = Query(TRANSACTIONS_PAGE_SIZE, ge=1, le=TRANSACTIONS_PAGE_MAX),
+    format: str = Query("json", regex="^(json|ndjson)$"),
     db: AsyncSession = Depends(get_db)
 ):
+    """Transactions newest first, a page at a time.
+
+    Pages are keyset-paginated on (created_at, id): pass the response's
+    next_cursor as ?cursor= to get the next page; it is null on the last one.
+    Each page is one range scan on idx_transaction_created_id, however deep.
+
+    format=ndjson streams every matching row from the cursor position on (no
+    limit), one JSON object per line, read from a server-side cursor in
+    batches of TRANSACTIONS_STREAM_BATCH. Memory stays flat for any history
+    length; the stream ends with a {"done": true, "count": n} line.
+    """
     try:
-        query = select(Transaction).options(joinedload(Transaction.booking), joinedload(Transaction.creator))
-        
+        query = (
+            select(Transaction.id, Transaction.created_at, Transaction.transaction_type,
+                   Transaction.payment_method, Transaction.amount,
+                   Booking.booking_date, Booking.time_slot, User.username.label("creator"))
+            .join(Booking, Booking.id == Transaction.booking_id)
+            .join(User, User.id == Transaction.created_by)
+        )
+
         if start_date:
             start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
             query = query.filter(Transaction.created_at >= start_date)
-        
+
         if end_date:
             end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
             query = query.filter(Transaction.created_at <= end_date)
-        
-        query = query.order_by(Transaction.created_at.desc())
-        
-        transactions = await db.execute(query)
-        
-        result = [
-            {
-                "id": t.id,
-                "booking_date": t.booking.booking_date.isoformat(),
-                "time_slot": t.booking.time_slot,
-                "transaction_type": t.transaction_type.value,
-                "payment_method": t.payment_method.value if t.payment_method else None,
-                "amount": t.amount,
-                "creator": t.creator.username,
-                "created_at": t.created_at.isoformat()
-            } for t in transactions.scalars()
-        ]
-        return JSONResponse(content={"success": True, "transactions": result})
+
+        if cursor:
+            after_created_at, after_id = _decode_transactions_cursor(cursor)
+            query = query.filter(tuple_(Transaction.created_at, Transaction.id) < tuple_(after_created_at, after_id))
+
+        query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "message": f"Invalid parameter: {str(e)}"})
+
+    if format == "ndjson":
+        async def rows():
+            # Own session: the stream outlives the request's dependency scope.
+            count = 0
+            async with SessionLocal() as session:
+                try:
+                    result = await session.stream(query.execution_options(yield_per=TRANSACTIONS_STREAM_BATCH))
+                    async for batch in result.partitions():
+                        count += len(batch)
+                        yield "".join(json.dumps(_transaction_list_row(row)) + "\n" for row in batch)
+                except SQLAlchemyError as e:
+                    logging.error(f"Database error streaming transactions: {str(e)}")
+                    yield json.dumps({"error": "Database error"}) + "\n"
+                    return
+            yield json.dumps({"done": True, "count": count}) + "\n"
+
+        return StreamingResponse(rows(), media_type="application/x-ndjson",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    try:
+        # One row past the page tells us whether there is a next page.
+        page = (await db.execute(query.limit(limit + 1))).all()
+        has_more = len(page) > limit
+        page = page[:limit]
+        next_cursor = _encode_transactions_cursor(page[-1].created_at, page[-1].id) if has_more else None
+        return JSONResponse(content={
+            "success": True,
+            "transactions": [_transaction_list_row(row) for row in page],
+            "next_cursor": next_cursor,
+        })
     except SQLAlchemyError as e:
         logging.error(f"Database error in get_transactions: {str(e)}")
         return JSONResponse(status_code=500, content={"success": False, "message": f"Database error: {str(e)}"})
@@ -2030,36 +3071,15 @@ async def add_transaction(
         if not booking:
             return JSONResponse(status_code=404, content={"success": False, "message": "Booking not found"})
 
-    # Get the slot price for this booking
-        slot_price_result = await db.execute(
-            select(SlotPrice)
-            .filter(
-                SlotPrice.time_slot == booking.time_slot,
-                SlotPrice.day_of_week == DayOfWeek[booking.booking_date.strftime('%A').upper()],
-                or_(
-                    and_(
-                        SlotPrice.start_date <= booking.booking_date,
-                        SlotPrice.end_date >= booking.booking_date
-                    ),
-                    and_(
-                        SlotPrice.start_date == None,
-                        SlotPrice.end_date == None
-                    )
-                )
-            )
-            .order_by(SlotPrice.is_default.desc())
-        )
-        slot_prices = slot_price_result.scalars().all()
-
-        if not slot_prices:
+        # The booking must be priceable: the summary trigger derives its total
+        # from the same rule on the first payment.
+        prices = await price_engine.table(db)
+        if prices.resolve(booking.time_slot, booking.booking_date, booking.booking_type) is None:
             return JSONResponse(status_code=404, content={
                 "success": False, 
                 "message": f"Slot price not found for booking (ID: {booking_id}, Date: {booking.booking_date}, Time: {booking.time_slot})"
             })
 
-        # Use the first (most specific) slot price
-        slot_price = slot_prices[0]
-
         try:
             transaction_type_enum = TransactionType[transaction_type]
         except (KeyError, ValueError):
@@ -2098,12 +3118,14 @@ async def add_transaction(
         booking_name = booking.name
         txn_type_value = transaction_type_enum.value
         method_value = payment_method_enum.value if payment_method_enum else None
-        # The transactions_sync_summary AFTER trigger recomputes the matching
-        # transaction_summaries row (including total_price lookup if it's the
-        # first transaction for this booking). No Python-side recompute needed.
+        span = booking_span(booking)
+        # The transactions_sync_summary_insert trigger adds this payment to the
+        # matching transaction_summaries row (or builds the row, with its
+        # total_price, if there is none yet). No Python-side recompute needed.
         await db.commit()
         invalidate_booking_summary_cache(booking_id)
         invalidate_dashboard_cache()
+        invalidate_matrix_cache(*span)
         await record_audit(current_user, "transaction.create", "transaction", new_txn_id,
                            f"Added ৳{amount:g} ({txn_type_value}) to {booking_name}'s booking",
                            {"booking_id": booking_id, "amount": amount,
@@ -2119,6 +3141,159 @@ async def add_transaction(
         return JSONResponse(status_code=500, content={"success": False, "message": f"Unexpected error: {str(exc)}"})
 
 
+class TransactionBatchEntry(BaseModel):
+    booking_id: int
+    transaction_type: str                   # TransactionType name, e.g. SLOT_PAYMENT
+    payment_method: Optional[str] = None    # PaymentMethod name; optional for DISCOUNT / OTHER_ADJUSTMENT
+    amount: float
+
+
+class TransactionBatchRequest(BaseModel):
+    transactions: List[TransactionBatchEntry]
+    atomic: bool = True                     # all-or-nothing, or post every entry that validates
+
+
+# Most payments one batch may post.
+TRANSACTION_BATCH_MAX = 1000
+
+
+@router.post("/api/transactions/batch", response_class=JSONResponse)
+async def add_transactions_batch(
+    payload: TransactionBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Post many payments in one request, e.g. closing out a day's receipts.
+
+    Each entry is validated like /add_transaction (booking exists and has a
+    price, known type, method unless it's a discount/adjustment). All bookings
+    are fetched in one query and prices come from the cached price table.
+    The valid entries go in with one INSERT, so the summary trigger runs once
+    for the whole batch, and the caches are invalidated once. With atomic=true
+    (the default) any invalid entry rejects the batch and nothing is posted.
+    """
+    entries = payload.transactions
+    if not entries:
+        return JSONResponse(status_code=400, content={"success": False, "message": "No transactions given"})
+    if len(entries) > TRANSACTION_BATCH_MAX:
+        return JSONResponse(status_code=400, content={
+            "success": False, "message": f"At most {TRANSACTION_BATCH_MAX} transactions per request"})
+
+    try:
+        booking_rows = await db.execute(
+            select(Booking.id, Booking.name, Booking.time_slot, Booking.booking_date, Booking.booking_type,
+                   Booking.academy_start_date, Booking.academy_end_date)
+            .filter(Booking.id.in_({entry.booking_id for entry in entries}))
+        )
+        bookings = {row.id: row for row in booking_rows.all()}
+        prices = await price_engine.table(db)
+
+        results = [None] * len(entries)
+        valid = []
+        for i, entry in enumerate(entries):
+            booking = bookings.get(entry.booking_id)
+            if booking is None:
+                results[i] = {"index": i, "success": False, "message": "Booking not found"}
+                continue
+            if prices.resolve(booking.time_slot, booking.booking_date, booking.booking_type) is None:
+                results[i] = {"index": i, "success": False,
+                              "message": f"Slot price not found for booking (ID: {booking.id}, Date: {booking.booking_date}, Time: {booking.time_slot})"}
+                continue
+            try:
+                transaction_type_enum = TransactionType[entry.transaction_type]
+            except KeyError:
+                results[i] = {"index": i, "success": False, "message": f"Invalid transaction type: {entry.transaction_type}"}
+                continue
+            payment_method_enum = None
+            if entry.payment_method:
+                try:
+                    payment_method_enum = PaymentMethod[entry.payment_method]
+                except KeyError:
+                    results[i] = {"index": i, "success": False, "message": f"Invalid payment method: {entry.payment_method}"}
+                    continue
+            elif transaction_type_enum not in [TransactionType.DISCOUNT, TransactionType.OTHER_ADJUSTMENT]:
+                results[i] = {"index": i, "success": False, "message": "Payment method is required for this transaction type"}
+                continue
+            valid.append((i, entry, transaction_type_enum, payment_method_enum))
+
+        if not valid or (payload.atomic and len(valid) < len(entries)):
+            return JSONResponse(status_code=400, content={
+                "success": False,
+                "message": "Batch rejected; nothing was posted",
+                "results": [r or {"index": i, "success": True, "message": "Valid"} for i, r in enumerate(results)],
+            })
+
+        # One INSERT for the whole batch. RETURNING can't see the source
+        # rows, so each row's id is drawn from the sequence up front, next to
+        # its ordinality, and the ids are mapped back to entries through that.
+        inserted = await db.execute(text("""
+            WITH v AS MATERIALIZED (
+                SELECT nextval(pg_get_serial_sequence('transactions', 'id')) AS id,
+                       booking_id, transaction_type, payment_method, amount, ord
+                FROM unnest(
+                    CAST(:booking_ids AS integer[]),
+                    CAST(:types AS transactiontype[]),
+                    CAST(:methods AS paymentmethod[]),
+                    CAST(:amounts AS float8[])
+                ) WITH ORDINALITY AS u(booking_id, transaction_type, payment_method, amount, ord)
+            ),
+            ins AS (
+                INSERT INTO transactions (id, booking_id, transaction_type, payment_method, amount,
+                                          created_by, created_at)
+                SELECT id, booking_id, transaction_type, payment_method, amount,
+                       CAST(:user_id AS integer), now()
+                FROM v
+                RETURNING id
+            )
+            SELECT v.id, v.ord
+            FROM v
+            JOIN ins USING (id)
+            ORDER BY v.ord
+        """), {
+            "user_id": current_user.id,
+            "booking_ids": [entry.booking_id for _, entry, _, _ in valid],
+            "types": [type_enum.name for _, _, type_enum, _ in valid],
+            "methods": [method_enum.name if method_enum else None for _, _, _, method_enum in valid],
+            "amounts": [entry.amount for _, entry, _, _ in valid],
+        })
+        id_by_ord = {row.ord: row.id for row in inserted.all()}
+        new_ids = [id_by_ord[k] for k in range(1, len(valid) + 1)]
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logging.error(f"Database error in add_transactions_batch: {str(e)}")
+        return JSONResponse(status_code=500, content={"success": False, "message": "Database error"})
+
+    for (i, entry, _, _), transaction_id in zip(valid, new_ids):
+        results[i] = {"index": i, "success": True, "transaction_id": transaction_id}
+
+    touched = {entry.booking_id for _, entry, _, _ in valid}
+    for booking_id in touched:
+        invalidate_booking_summary_cache(booking_id)
+        invalidate_matrix_cache(*booking_span(bookings[booking_id]))
+    invalidate_dashboard_cache()
+
+    total = sum(entry.amount for _, entry, _, _ in valid)
+    by_method = {}
+    for _, entry, _, method_enum in valid:
+        key = method_enum.value if method_enum else "None"
+        by_method[key] = by_method.get(key, 0) + entry.amount
+    await record_audit(current_user, "transaction.create", "transaction", None,
+                       f"Posted {len(valid)} payment{'s' if len(valid) != 1 else ''} (৳{total:g}) "
+                       f"across {len(touched)} booking{'s' if len(touched) != 1 else ''}",
+                       {"count": len(valid), "total": total, "by_method": by_method,
+                        "transaction_ids": new_ids[:100]})
+
+    failed = len(entries) - len(valid)
+    return JSONResponse(content={
+        "success": failed == 0,
+        "message": f"Posted {len(valid)} of {len(entries)} transactions",
+        "total": total,
+        "by_method": by_method,
+        "results": results,
+    })
+
+
 
 
 @router.post("/update_transaction")
@@ -2206,12 +3381,15 @@ async def update_transaction(
         new_amount_value = transaction.amount
         new_type_value = transaction.transaction_type.value
         old_type_value = original_transaction_type.value if original_transaction_type else None
+        booking = await db.get(Booking, booking_id)
+        span = booking_span(booking) if booking else (None, None)
 
-        # Commit the transaction update — the transactions_sync_summary AFTER
-        # trigger recomputes the matching transaction_summaries row.
+        # Commit the transaction update — the transactions_sync_summary_update
+        # trigger applies the old/new difference to the transaction_summaries row.
         await db.commit()
         invalidate_booking_summary_cache(booking_id)
         invalidate_dashboard_cache()
+        invalidate_matrix_cache(*span)
         await record_audit(current_user, "transaction.update", "transaction", transaction_id,
                            f"Edited payment #{transaction_id}",
                            {"booking_id": booking_id,
@@ -2291,13 +3469,16 @@ async def delete_transaction(
         booking_id_for_invalidation = transaction.booking_id
         deleted_amount = transaction.amount
         deleted_type = transaction.transaction_type.value
+        booking = await db.get(Booking, booking_id_for_invalidation)
+        span = booking_span(booking) if booking else (None, None)
 
-        # Delete the transaction — the transactions_sync_summary AFTER trigger
-        # recomputes (or deletes, if no transactions remain) the summary row.
+        # Delete the transaction — the transactions_sync_summary_delete trigger
+        # subtracts it from (or deletes, if no transactions remain) the summary row.
         await db.delete(transaction)
         await db.commit()
         invalidate_booking_summary_cache(booking_id_for_invalidation)
         invalidate_dashboard_cache()
+        invalidate_matrix_cache(*span)
         await record_audit(current_user, "transaction.delete", "transaction", transaction_id,
                            f"Deleted payment of ৳{deleted_amount:g} ({deleted_type})",
                            {"booking_id": booking_id_for_invalidation, "amount": deleted_amount, "type": deleted_type})
@@ -2322,6 +3503,48 @@ async def delete_transaction(
             content={"success": False, "message": f"Unexpected error: {str(e)}"}
         )
 
+@router.get("/api/transaction-summaries/verify")
+async def verify_transaction_summaries(
+    repair: bool = False,
+    current_user: User = Depends(require_master),
+    db: AsyncSession = Depends(get_db),
+):
+    """Drift check for the delta-maintained transaction summaries.
+
+    Recomputes every booking's summary from its transactions and lists the
+    fields that disagree with the stored row (public.verify_transaction_summaries).
+    An empty list means no drift. With repair=true the affected bookings are
+    recomputed in full afterwards."""
+    try:
+        result = await db.execute(text("SELECT * FROM public.verify_transaction_summaries()"))
+        mismatches = [
+            {"booking_id": r.booking_id, "field": r.field, "stored": r.stored, "expected": r.expected}
+            for r in result.all()
+        ]
+        booking_ids = sorted({m["booking_id"] for m in mismatches})
+        if repair and booking_ids:
+            await db.execute(
+                text("SELECT public.recalc_transaction_summary(b) FROM unnest(CAST(:ids AS integer[])) AS b"),
+                {"ids": booking_ids}
+            )
+            await db.commit()
+            invalidate_booking_summary_cache()
+            invalidate_dashboard_cache()
+            await record_audit(current_user, "transaction_summary.repair", "transaction_summary", None,
+                               f"Recomputed {len(booking_ids)} drifted transaction summaries",
+                               {"booking_ids": booking_ids[:100]})
+        return {
+            "success": True,
+            "drifted_bookings": len(booking_ids),
+            "repaired": repair and bool(booking_ids),
+            "mismatches": mismatches[:500],
+        }
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logging.error(f"Database error in verify_transaction_summaries: {str(e)}")
+        return JSONResponse(status_code=500, content={"success": False, "message": "Database error"})
+
+
 
 '''
 --------------------
@@ -2528,16 +3751,8 @@ async def get_booking_payment_summary(
 
         # If no summary exists, calculate it from slot price
         if not summary:
-            # Try to get slot price
-            slot_price_result = await db.execute(
-                select(SlotPrice)
-                .filter(
-                    SlotPrice.time_slot == booking.time_slot,
-                    SlotPrice.day_of_week == DayOfWeek[booking.booking_date.strftime('%A').upper()]
-                )
-            )
-            slot_price = slot_price_result.scalar_one_or_none()
-            total_price = slot_price.price if slot_price else 0
+            prices = await price_engine.table(db)
+            total_price = prices.price(booking.time_slot, booking.booking_date, booking.booking_type) or 0
             total_paid = 0
             leftover = total_price
             status = "PENDING"
@@ -2786,6 +4001,12 @@ async def get_audit_logs(
     except SQLAlchemyError as e:
         logging.error(f"Database error in get_audit_logs: {str(e)}")
         return JSONResponse(status_code=500, content={"success": False, "message": "Database error"})
+
+
+@router.get("/api/audit-logs/stats")
+async def get_audit_writer_stats(current_user: User = Depends(require_master)):
+    """Buffered / written / dropped / failed counters for this worker's audit writer."""
+    return {"success": True, "audit": audit_writer.stats()}
 
 
 '''
@@ -2835,18 +4056,23 @@ async def resync_customers(
     current_user: User = Depends(require_master),
     db: AsyncSession = Depends(get_db),
 ):
-    """Rebuild the customer directory from the bookings table. Run this after a
-    bulk import of historical bookings so their customers become searchable."""
+    """Repair tool: rebuild the customer directory from the bookings table.
+
+    The bookings_sync_customer_* triggers keep customers current on every
+    booking write, so this is only needed if the table was edited by hand or
+    the triggers were disabled during a bulk load. Each phone's latest booking
+    goes through public.upsert_customer, the function the triggers call, so
+    trimming and blank-name rules are the same as on a booking write."""
     try:
         await db.execute(text("""
-            INSERT INTO customers (name, phone, created_at, updated_at)
-            SELECT DISTINCT ON (phone) name, phone,
-                   (now() AT TIME ZONE 'utc'), (now() AT TIME ZONE 'utc')
-            FROM bookings
-            WHERE phone IS NOT NULL AND btrim(phone) <> ''
-            ORDER BY phone, id DESC
-            ON CONFLICT (phone) DO UPDATE
-            SET name = EXCLUDED.name, updated_at = (now() AT TIME ZONE 'utc')
+            SELECT public.upsert_customer(latest.name, latest.phone)
+            FROM (
+                SELECT DISTINCT ON (btrim(phone)) name, phone
+                FROM bookings
+                WHERE phone IS NOT NULL AND btrim(phone) <> ''
+                  AND name IS NOT NULL AND btrim(name) <> ''
+                ORDER BY btrim(phone), id DESC
+            ) AS latest
         """))
         await db.commit()
         count = (await db.execute(select(func.count(Customer.id)))).scalar() or 0
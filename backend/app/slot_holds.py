@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import os
+import secrets
+from datetime import date
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import text
+
+from .database import SessionLocal
+from .occupancy import lock_slots
+
+logger = logging.getLogger(__name__)
+
+# How long a hold lasts when the caller doesn't ask, and the most it may ask
+# for. Long enough for a bKash payment round trip.
+SLOT_HOLD_TTL_SECONDS = int(os.getenv("SLOT_HOLD_TTL_SECONDS", "600"))
+SLOT_HOLD_MAX_TTL_SECONDS = int(os.getenv("SLOT_HOLD_MAX_TTL_SECONDS", "1800"))
+# How often each worker's sweeper deletes expired holds. A hold stops counting
+# the moment it expires either way; sweeping just keeps the table small.
+SLOT_HOLD_SWEEP_SECONDS = int(os.getenv("SLOT_HOLD_SWEEP_SECONDS", "15"))
+SLOT_HOLD_SWEEP_BATCH = 500
+
+# Takes the cell unless an active booking or an unexpired hold has it. An
+# expired hold is taken over in place and gets a new token and version. One
+# statement, so racing customers only contend on the uq_slot_holds_cell index
+# entry: one gets a row back and the rest get nothing.
+HOLD_SQL = text("""
+    INSERT INTO slot_holds (hold_token, slot_date, time_slot, name, phone, held_by,
+                            version, created_at, expires_at)
+    SELECT CAST(:token AS varchar), CAST(:slot_date AS date), CAST(:time_slot AS varchar),
+           CAST(:name AS varchar), CAST(:phone AS varchar), CAST(:user_id AS integer),
+           nextval('slot_holds_version_seq'), now(), now() + make_interval(secs => :ttl)
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM booking_slot_days o
+        WHERE o.slot_date = CAST(:slot_date AS date)
+          AND o.time_slot = CAST(:time_slot AS varchar)
+          AND NOT o.is_cancelled
+    )
+    ON CONFLICT (slot_date, time_slot) DO UPDATE
+    SET hold_token = EXCLUDED.hold_token,
+        name = EXCLUDED.name,
+        phone = EXCLUDED.phone,
+        held_by = EXCLUDED.held_by,
+        version = EXCLUDED.version,
+        created_at = EXCLUDED.created_at,
+        expires_at = EXCLUDED.expires_at
+    WHERE slot_holds.expires_at <= now()
+    RETURNING hold_token, expires_at
+""")
+
+# Consumes the hold and books the cell in one statement. If the booking insert
+# finds the cell taken (an admin booked over the hold), no row comes back, and
+# the caller rolls back so the hold survives until it expires.
+CONFIRM_SQL = text("""
+    WITH claimed AS (
+        DELETE FROM slot_holds
+        WHERE hold_token = CAST(:token AS varchar) AND expires_at > now()
+        RETURNING slot_date, time_slot, name, phone
+    )
+    INSERT INTO bookings (booked_by, name, phone, booking_date, time_slot, booking_type,
+                          is_cancelled, created_at, updated_at, last_modified_by)
+    SELECT CAST(:user_id AS integer), c.name, c.phone, c.slot_date, c.time_slot, 'NORMAL'::bookingtype,
+           FALSE, (now() AT TIME ZONE 'utc'), (now() AT TIME ZONE 'utc'), CAST(:user_id AS integer)
+    FROM claimed c
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM booking_slot_days s
+        WHERE s.slot_date = c.slot_date
+          AND s.time_slot = c.time_slot
+          AND NOT s.is_cancelled
+    )
+    ON CONFLICT (booking_date, time_slot)
+        WHERE booking_type = 'NORMAL' AND is_cancelled IS NOT TRUE
+    DO NOTHING
+    RETURNING id, booking_date, time_slot
+""")
+
+
+def clamp_ttl(ttl_seconds: int | None) -> int:
+    if not ttl_seconds or ttl_seconds <= 0:
+        return SLOT_HOLD_TTL_SECONDS
+    return min(ttl_seconds, SLOT_HOLD_MAX_TTL_SECONDS)
+
+
+async def place_hold(db: AsyncSession, slot_date: date, time_slot: str, name: str, phone: str,
+                     user_id: int | None = None, ttl_seconds: int | None = None):
+    """Hold one cell. Returns (hold_token, expires_at), or None if it's taken.
+
+    Doesn't commit; the caller does.
+    """
+    await lock_slots(db, [time_slot])
+    result = await db.execute(HOLD_SQL, {
+        "token": secrets.token_urlsafe(18),
+        "slot_date": slot_date,
+        "time_slot": time_slot,
+        "name": name,
+        "phone": phone,
+        "user_id": user_id,
+        "ttl": clamp_ttl(ttl_seconds),
+    })
+    return result.one_or_none()
+
+
+async def confirm_hold(db: AsyncSession, token: str, user_id: int | None = None):
+    """Turn a live hold into a NORMAL booking. Returns (booking_id, booking_date,
+    time_slot), or None. The caller must roll back on None."""
+    held = await db.execute(
+        text("SELECT time_slot FROM slot_holds WHERE hold_token = :token"), {"token": token}
+    )
+    await lock_slots(db, held.scalars().all())
+    result = await db.execute(CONFIRM_SQL, {"token": token, "user_id": user_id})
+    return result.one_or_none()
+
+
+async def hold_is_live(db: AsyncSession, token: str) -> bool:
+    result = await db.execute(
+        text("SELECT 1 FROM slot_holds WHERE hold_token = :token AND expires_at > now()"),
+        {"token": token},
+    )
+    return result.first() is not None
+
+
+async def held_cells(db: AsyncSession, cells) -> set:
+    """Which of these (date, time_slot) cells an unexpired hold has, in one query.
+
+    Booking writers check this under the slot lock: a live hold blocks staff
+    bookings just as it blocks other customers, until it's confirmed,
+    released or expires.
+    """
+    cells = list(cells)
+    if not cells:
+        return set()
+    result = await db.execute(text("""
+        SELECT h.slot_date, h.time_slot
+        FROM slot_holds h
+        JOIN unnest(CAST(:dates AS date[]), CAST(:slots AS text[])) AS c(slot_date, time_slot)
+          ON h.slot_date = c.slot_date AND h.time_slot = c.time_slot
+        WHERE h.expires_at > now()
+    """), {"dates": [d for d, _ in cells], "slots": [slot for _, slot in cells]})
+    return {(row.slot_date, row.time_slot) for row in result.all()}
+
+
+async def release_hold(db: AsyncSession, token: str):
+    """Drop a hold early (payment cancelled). Returns its (slot_date, time_slot) or None."""
+    result = await db.execute(
+        text("DELETE FROM slot_holds WHERE hold_token = :token RETURNING slot_date, time_slot"),
+        {"token": token},
+    )
+    return result.one_or_none()
+
+
+async def active_holds(db: AsyncSession, start_date: date, end_date: date) -> list:
+    """Unexpired holds in [start_date, end_date]: (slot_date, time_slot, name, phone, expires_at)."""
+    result = await db.execute(text("""
+        SELECT slot_date, time_slot, name, phone, expires_at
+        FROM slot_holds
+        WHERE slot_date BETWEEN :start_date AND :end_date
+          AND expires_at > now()
+        ORDER BY slot_date, time_slot
+    """), {"start_date": start_date, "end_date": end_date})
+    return result.all()
+
+
+class HoldSweeper:
+    """Deletes expired holds in the background, one task per worker.
+
+    Expiry itself needs no sweeper: every read and every new hold compares
+    expires_at to now(). The sweeper only stops dead rows from piling up. Rows
+    another worker is deleting are skipped (SKIP LOCKED), so sweepers on
+    several workers never wait on each other. `on_expire` is called after a
+    sweep that removed anything.
+    """
+
+    def __init__(self, interval_seconds: int):
+        self.interval_seconds = interval_seconds
+        self.on_expire = None
+        self._task = None
+        self.expired = 0
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                removed = await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Slot hold sweep failed: {e}")
+                continue
+            if removed and self.on_expire is not None:
+                self.on_expire()
+
+    async def sweep(self) -> int:
+        total = 0
+        async with SessionLocal() as session:
+            while True:
+                result = await session.execute(text("""
+                    DELETE FROM slot_holds
+                    WHERE id IN (
+                        SELECT id FROM slot_holds
+                        WHERE expires_at <= now()
+                        ORDER BY expires_at
+                        LIMIT :batch
+                        FOR UPDATE SKIP LOCKED
+                    )
+                """), {"batch": SLOT_HOLD_SWEEP_BATCH})
+                await session.commit()
+                total += result.rowcount
+                if result.rowcount < SLOT_HOLD_SWEEP_BATCH:
+                    break
+        self.expired += total
+        return total
+
+
+hold_sweeper = HoldSweeper(SLOT_HOLD_SWEEP_SECONDS)
@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+# Academy schedules as a 7-bit weekday mask: bit i is date.weekday() == i
+# (Monday = bit 0 … Sunday = bit 6). The same layout is stored in
+# bookings.academy_days_mask and computed by public.weekday_mask() in SQL,
+# where bit i is extract(isodow) - 1.
+WEEKDAY_NAMES = ("MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY")
+ALL_DAYS = 0b1111111
+
+_BIT_BY_NAME = {name: 1 << i for i, name in enumerate(WEEKDAY_NAMES)}
+
+
+def mask_from_csv(days_of_week: str | None) -> int:
+    """Comma-separated day names (e.g. "MONDAY,FRIDAY") -> mask. None/empty means every day."""
+    if not days_of_week or not days_of_week.strip():
+        return ALL_DAYS
+    mask = 0
+    for name in days_of_week.split(','):
+        mask |= _BIT_BY_NAME.get(name.strip().upper(), 0)
+    return mask
+
+
+def csv_from_mask(mask: int) -> str:
+    return ",".join(name for i, name in enumerate(WEEKDAY_NAMES) if mask & (1 << i))
+
+
+def weekday_bit(d: date) -> int:
+    return 1 << d.weekday()
+
+
+def count_occurrences(start_date: date, end_date: date, mask: int) -> int:
+    """Number of dates in [start_date, end_date] whose weekday is in `mask`."""
+    if end_date < start_date or not mask:
+        return 0
+    total_days = (end_date - start_date).days + 1
+    full_weeks, remainder = divmod(total_days, 7)
+    count = full_weeks * bin(mask & ALL_DAYS).count("1")
+    first = start_date.weekday()
+    for i in range(remainder):
+        if mask & (1 << ((first + i) % 7)):
+            count += 1
+    return count
+
+
+def first_occurrence(start_date: date, end_date: date, mask: int) -> date | None:
+    """Earliest date in [start_date, end_date] matching `mask`, or None."""
+    if end_date < start_date or not mask:
+        return None
+    first = start_date.weekday()
+    for i in range(min(7, (end_date - start_date).days + 1)):
+        if mask & (1 << ((first + i) % 7)):
+            return start_date + timedelta(days=i)
+    return None
+
+
+def has_occurrence(start_date: date, end_date: date, mask: int) -> bool:
+    return first_occurrence(start_date, end_date, mask) is not None
+
+
+def iter_occurrences(start_date: date, end_date: date, mask: int):
+    """Yield every matching date in order, stepping straight between matches."""
+    if end_date < start_date or not mask:
+        return
+    first = start_date.weekday()
+    offsets = [i for i in range(7) if mask & (1 << ((first + i) % 7))]
+    week_start = start_date
+    while week_start <= end_date:
+        for offset in offsets:
+            current = week_start + timedelta(days=offset)
+            if current > end_date:
+                return
+            yield current
+        week_start += timedelta(days=7)
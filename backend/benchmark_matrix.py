@@ -0,0 +1,170 @@
+"""
+Benchmark the bookings matrix builder: old ORM path vs column-projected path.
+
+The old path loaded every overlapping Booking with joinedload(user) and
+joinedload(transaction_summary) and expanded academy bookings day by day in
+Python. The current path (app.routes.build_matrix_response) range-scans
+booking_slot_days and selects only the columns the matrix renders.
+
+Both paths run against the same database over the same window; the script
+also checks that they produce the same bookingsData keys.
+
+Usage: python3 benchmark_matrix.py [--days 90] [--iterations 20] [--start YYYY-MM-DD]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, or_
+from sqlalchemy.future import select
+from sqlalchemy.orm import joinedload
+
+from app.database import SessionLocal, engine
+from app.models import Booking, BookingType
+from app.routes import build_matrix_response
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _expand_booking_dates(b):
+    """Old per-day academy expansion, kept here only for comparison."""
+    if b.booking_type == BookingType.ACADEMY and b.academy_start_date and b.academy_end_date:
+        selected_days = None
+        if b.academy_days_of_week:
+            selected_days = [d.strip().upper() for d in b.academy_days_of_week.split(',')]
+        current = b.academy_start_date
+        while current <= b.academy_end_date:
+            if not selected_days or current.strftime('%A').upper() in selected_days:
+                yield current
+            current += timedelta(days=1)
+    else:
+        yield b.booking_date
+
+
+async def legacy_matrix(db, start_date: date, end_date: date):
+    """The ORM-hydrating matrix build that used to live in each endpoint."""
+    result = await db.execute(
+        select(Booking)
+        .options(
+            joinedload(Booking.user),
+            joinedload(Booking.transaction_summary),
+        )
+        .filter(
+            or_(
+                and_(
+                    Booking.booking_type == BookingType.NORMAL,
+                    Booking.booking_date.between(start_date, end_date),
+                ),
+                and_(
+                    Booking.booking_type == BookingType.ACADEMY,
+                    Booking.academy_start_date <= end_date,
+                    Booking.academy_end_date >= start_date,
+                ),
+            )
+        )
+        .order_by(Booking.booking_date, Booking.time_slot)
+    )
+    bookings = result.unique().scalars().all()
+
+    bookings_data: dict = {}
+    cancelled_data: dict = {}
+    for b in bookings:
+        summary = b.transaction_summary
+        txn_status = summary.status.name if (summary and summary.status) else None
+        total_paid = float(summary.total_paid) if summary and summary.total_paid else 0.0
+        for current in _expand_booking_dates(b):
+            if not (start_date <= current <= end_date):
+                continue
+            key = f"{current.isoformat()}_{b.time_slot}"
+            if b.is_cancelled:
+                if total_paid <= 0:
+                    continue
+                cancelled_data.setdefault(key, []).append({
+                    "id": b.id,
+                    "name": b.name,
+                    "phone": b.phone,
+                    "booking_type": b.booking_type.value,
+                    "transaction_status": txn_status,
+                    "total_price": float(summary.total_price) if summary else 0.0,
+                    "total_paid": total_paid,
+                    "leftover": float(summary.leftover) if summary else 0.0,
+                    "cancelled_at": b.cancelled_at.isoformat() if b.cancelled_at else None,
+                })
+                continue
+            entry = {
+                "id": b.id,
+                "name": b.name,
+                "phone": b.phone,
+                "booking_date": current.isoformat(),
+                "time_slot": b.time_slot,
+                "booking_type": b.booking_type.value,
+                "booked_by": b.user.username if b.user else "Unknown",
+                "transaction_status": txn_status,
+            }
+            if b.booking_type == BookingType.ACADEMY:
+                entry.update({
+                    "academy_start_date": b.academy_start_date.isoformat() if b.academy_start_date else None,
+                    "academy_end_date": b.academy_end_date.isoformat() if b.academy_end_date else None,
+                    "academy_days_of_week": b.academy_days_of_week,
+                    "academy_notes": b.academy_notes,
+                })
+            bookings_data[key] = entry
+    return bookings_data, cancelled_data
+
+
+async def time_path(name, build, start_date, end_date, iterations):
+    """Run `build` in a fresh session per iteration; return (timings_ms, last_result)."""
+    timings = []
+    result = None
+    for _ in range(iterations):
+        async with SessionLocal() as session:
+            t0 = time.perf_counter()
+            result = await build(session, start_date, end_date)
+            timings.append((time.perf_counter() - t0) * 1000)
+    logger.info(
+        f"{name:<10} | median {statistics.median(timings):8.2f} ms"
+        f" | min {min(timings):8.2f} ms | max {max(timings):8.2f} ms"
+        f" | cells {len(result[0])}"
+    )
+    return timings, result
+
+
+async def main(days: int, iterations: int, start_date: date):
+    end_date = start_date + timedelta(days=days - 1)
+    logger.info(f"Matrix benchmark: {start_date} → {end_date} ({days} days), {iterations} iterations")
+    logger.info("-" * 72)
+
+    # One untimed warm-up per path so connection setup isn't counted.
+    for build in (legacy_matrix, build_matrix_response):
+        async with SessionLocal() as session:
+            await build(session, start_date, end_date)
+
+    legacy_times, legacy_result = await time_path("orm", legacy_matrix, start_date, end_date, iterations)
+    projected_times, projected_result = await time_path("projected", build_matrix_response, start_date, end_date, iterations)
+
+    logger.info("-" * 72)
+    speedup = statistics.median(legacy_times) / max(statistics.median(projected_times), 1e-9)
+    logger.info(f"Speedup (median): {speedup:.2f}x")
+
+    if set(legacy_result[0]) != set(projected_result[0]):
+        missing = set(legacy_result[0]) ^ set(projected_result[0])
+        logger.warning(f"⚠️  bookingsData keys differ between paths ({len(missing)} keys), e.g. {sorted(missing)[:5]}")
+    else:
+        logger.info("✅ bookingsData keys match")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bookings matrix builder")
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--start", type=str, default=None, help="YYYY-MM-DD (default: today)")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else date.today()
+    asyncio.run(main(args.days, args.iterations, start))
@@ -0,0 +1,159 @@
+from datetime import date
+from types import SimpleNamespace
+
+from app.models import BookingType, DayOfWeek
+from app.pricing import ACTIVE_TEMPORARY, DATED_DEFAULT, DEFAULT, FALLBACK, PriceTable
+from app.weekdays import ALL_DAYS, WEEKDAY_NAMES, iter_occurrences, mask_from_csv
+
+SLOT = "6:00 PM - 7:30 PM"
+_next_id = iter(range(1, 10_000))
+
+
+def row(weekday: str, price: float, is_default=True, start_date=None, end_date=None,
+        booking_type=None, time_slot=SLOT):
+    return SimpleNamespace(
+        id=next(_next_id), price=price, is_default=is_default,
+        start_date=start_date, end_date=end_date, booking_type=booking_type,
+        day_of_week=DayOfWeek[weekday], time_slot=time_slot,
+    )
+
+
+def table():
+    rows = [row(name, 1000) for name in WEEKDAY_NAMES if name != "SUNDAY"]
+    rows += [
+        # Eid week: Fridays and Saturdays cost more
+        row("FRIDAY", 1500, is_default=False, start_date=date(2026, 3, 16), end_date=date(2026, 3, 29)),
+        row("SATURDAY", 1500, is_default=False, start_date=date(2026, 3, 16), end_date=date(2026, 3, 29)),
+        # Academy rate on Mondays, plus a later academy discount window
+        row("MONDAY", 700, booking_type=BookingType.ACADEMY),
+        row("MONDAY", 600, is_default=False, start_date=date(2026, 4, 1), end_date=date(2026, 4, 30),
+            booking_type=BookingType.ACADEMY),
+    ]
+    return PriceTable(rows)
+
+
+def test_temporary_window_beats_the_default_only_inside_it():
+    prices = table()
+    inside = prices.resolve(SLOT, date(2026, 3, 20))
+    assert (inside.price, inside.source) == (1500, ACTIVE_TEMPORARY)
+    outside = prices.resolve(SLOT, date(2026, 3, 13))
+    assert (outside.price, outside.source) == (1000, DEFAULT)
+
+
+def test_academy_rows_fall_back_to_normal_rules():
+    prices = table()
+    assert prices.price(SLOT, date(2026, 3, 2), BookingType.ACADEMY) == 700
+    assert prices.price(SLOT, date(2026, 4, 6), BookingType.ACADEMY) == 600
+    # No academy row on Tuesdays, and normal bookings never see academy rows
+    assert prices.price(SLOT, date(2026, 4, 7), BookingType.ACADEMY) == 1000
+    assert prices.price(SLOT, date(2026, 4, 6), BookingType.NORMAL) == 1000
+
+
+def test_unpriced_cells_resolve_to_none():
+    prices = table()
+    assert prices.resolve(SLOT, date(2026, 3, 1)) is None          # a Sunday
+    assert prices.price("7:30 PM - 9:00 PM", date(2026, 3, 2)) is None
+
+
+def test_precedence_among_row_kinds():
+    slot = "9:30 AM - 11:00 AM"
+    window = dict(start_date=date(2026, 1, 1), end_date=date(2026, 1, 31))
+    fallback = row("WEDNESDAY", 400, is_default=False, time_slot=slot)
+    dated_default = row("WEDNESDAY", 500, time_slot=slot, **window)
+    default = row("WEDNESDAY", 600, time_slot=slot)
+    january, june = date(2026, 1, 14), date(2026, 6, 3)
+
+    prices = PriceTable([fallback, dated_default, default])
+    assert prices.resolve(slot, january).source == DEFAULT
+
+    prices = PriceTable([fallback, dated_default])
+    assert prices.resolve(slot, january).source == DATED_DEFAULT
+    assert prices.resolve(slot, june).source == FALLBACK
+
+
+def test_latest_starting_temporary_wins():
+    slot = "9:30 AM - 11:00 AM"
+    early = row("THURSDAY", 800, is_default=False, time_slot=slot,
+                start_date=date(2026, 5, 1), end_date=date(2026, 5, 31))
+    late = row("THURSDAY", 900, is_default=False, time_slot=slot,
+               start_date=date(2026, 5, 10), end_date=date(2026, 5, 20))
+    prices = PriceTable([early, late])
+    assert prices.price(slot, date(2026, 5, 7)) == 800
+    assert prices.price(slot, date(2026, 5, 14)) == 900
+    assert prices.price(slot, date(2026, 5, 28)) == 800
+
+
+def test_a_row_with_one_bound_never_applies():
+    slot = "9:30 AM - 11:00 AM"
+    prices = PriceTable([row("FRIDAY", 300, is_default=False, time_slot=slot, start_date=date(2026, 1, 1))])
+    assert prices.price(slot, date(2026, 1, 2)) is None
+
+
+def walk(prices: PriceTable, start, end, mask, booking_type):
+    """The slow way: resolve every date on its own."""
+    total, days, unpriced = 0.0, 0, []
+    for d in iter_occurrences(start, end, mask):
+        price = prices.price(SLOT, d, booking_type)
+        if price is None:
+            unpriced.append(d)
+        else:
+            total += price
+            days += 1
+    return total, days, unpriced
+
+
+def test_quote_matches_per_date_resolution():
+    prices = table()
+    ranges = [
+        (date(2026, 3, 1), date(2026, 3, 1)),
+        (date(2026, 3, 10), date(2026, 3, 20)),
+        (date(2026, 3, 1), date(2026, 5, 31)),
+        (date(2026, 3, 29), date(2026, 4, 1)),
+    ]
+    masks = [ALL_DAYS, mask_from_csv("MONDAY"), mask_from_csv("FRIDAY,SATURDAY,SUNDAY"), 0]
+    for start, end in ranges:
+        for mask in masks:
+            for booking_type in (BookingType.NORMAL, BookingType.ACADEMY):
+                quote = prices.quote(SLOT, start, end, mask, booking_type)
+                total, days, unpriced = walk(prices, start, end, mask, booking_type)
+                assert quote.total == total
+                assert quote.days == days
+                assert quote.unpriced_days == len(unpriced)
+                assert quote.first_unpriced == (unpriced[0] if unpriced else None)
+                assert sum(line["subtotal"] for line in quote.breakdown()) == quote.total
+                assert sum(line["days"] for line in quote.breakdown()) == quote.days
+
+
+def test_temporary_window_applies_only_inside_it():
+    quote = table().quote(SLOT, date(2026, 3, 1), date(2026, 3, 31), mask_from_csv("FRIDAY"),
+                          BookingType.NORMAL)
+    by_source = {line["source"]: line for line in quote.breakdown()}
+    # Fridays in March 2026: 6, 13, 20, 27; the window covers the 20th and 27th
+    assert by_source[ACTIVE_TEMPORARY]["days"] == 2
+    assert by_source[ACTIVE_TEMPORARY]["first_date"] == date(2026, 3, 20)
+    assert by_source[ACTIVE_TEMPORARY]["last_date"] == date(2026, 3, 27)
+    assert by_source[DEFAULT]["days"] == 2
+    assert quote.total == 2 * 1500 + 2 * 1000
+
+
+def test_academy_falls_back_to_normal_rules():
+    prices = table()
+    # Mondays use the academy rows, Tuesdays have none and use the normal price
+    quote = prices.quote(SLOT, date(2026, 4, 1), date(2026, 4, 30), mask_from_csv("MONDAY,TUESDAY"))
+    assert quote.total == 4 * 600 + 4 * 1000
+    normal = prices.quote(SLOT, date(2026, 4, 1), date(2026, 4, 30), mask_from_csv("MONDAY"),
+                          BookingType.NORMAL)
+    assert normal.total == 4 * 1000
+
+
+def test_unpriced_days_are_reported_not_charged():
+    quote = table().quote(SLOT, date(2026, 3, 1), date(2026, 3, 14), ALL_DAYS, BookingType.NORMAL)
+    assert quote.unpriced_days == 2
+    assert quote.first_unpriced == date(2026, 3, 1)
+    assert quote.days == 12
+
+
+def test_to_dict_is_json_ready():
+    data = table().quote(SLOT, date(2026, 3, 16), date(2026, 3, 22), ALL_DAYS).to_dict()
+    assert data["days"] + data["unpriced_days"] == 7
+    assert all(isinstance(line["first_date"], str) for line in data["breakdown"])
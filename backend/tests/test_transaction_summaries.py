@@ -0,0 +1,195 @@
+"""Summary trigger drift check against a real database.
+
+Runs only when TEST_DATABASE_URL points at a Postgres database migrated to
+head (postgresql+asyncpg://...). The mixed-traffic check happens in one
+transaction that is rolled back; the concurrent-payment check has to commit
+from two connections, so it deletes what it created afterwards. Both are
+safe to run against a seeded copy.
+"""
+import asyncio
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+SLOT = "TEST 1:00 AM - 2:30 AM"
+
+
+async def _insert_booking(conn, user_id: int, booking_date: date, total_price: float | None) -> int:
+    booking_id = (await conn.execute(text("""
+        INSERT INTO bookings (booked_by, name, phone, booking_date, time_slot, booking_type,
+                              is_cancelled, created_at, updated_at)
+        VALUES (:user_id, 'Summary Test', '01700000000', :booking_date, :slot, 'NORMAL'::bookingtype,
+                FALSE, now(), now())
+        RETURNING id
+    """), {"user_id": user_id, "booking_date": booking_date, "slot": SLOT})).scalar_one()
+    if total_price is not None:
+        await conn.execute(text("""
+            INSERT INTO transaction_summaries (
+                booking_id, total_price, total_paid, leftover, status, updated_at,
+                cash_payment, bkash_payment, nagad_payment, card_payment, bank_transfer_payment,
+                booking_payment, booking_cash_payment, booking_bkash_payment, booking_nagad_payment,
+                booking_card_payment, booking_bank_transfer_payment,
+                slot_payment, slot_cash_payment, slot_bkash_payment, slot_nagad_payment,
+                slot_card_payment, slot_bank_transfer_payment,
+                discount, other_adjustments
+            )
+            VALUES (:booking_id, :price, 0, :price, 'PENDING'::transactionstatus, now(),
+                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+        """), {"booking_id": booking_id, "price": total_price})
+    return booking_id
+
+
+async def _post(conn, user_id: int, rows: list) -> list:
+    """One multi-row INSERT of (booking_id, type, method, amount); returns the ids."""
+    values = ", ".join(
+        f"(:b{i}, CAST(:t{i} AS transactiontype), CAST(:m{i} AS paymentmethod), :a{i}, :user_id, now())"
+        for i in range(len(rows))
+    )
+    params = {"user_id": user_id}
+    for i, (booking_id, txn_type, method, amount) in enumerate(rows):
+        params.update({f"b{i}": booking_id, f"t{i}": txn_type, f"m{i}": method, f"a{i}": amount})
+    result = await conn.execute(text(f"""
+        INSERT INTO transactions (booking_id, transaction_type, payment_method, amount, created_by, created_at)
+        VALUES {values}
+        RETURNING id
+    """), params)
+    return [row.id for row in result.all()]
+
+
+async def _drift(conn) -> list:
+    return (await conn.execute(text("SELECT * FROM verify_transaction_summaries()"))).all()
+
+
+async def _mixed_traffic() -> list:
+    engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            tx = await conn.begin()
+            try:
+                user_id = (await conn.execute(text("""
+                    INSERT INTO users (username, email, hashed_password, role, is_active, created_at)
+                    VALUES ('summary-test', 'summary-test@example.invalid', '', 'STAFF'::userrole, TRUE, now())
+                    RETURNING id
+                """))).scalar_one()
+                a = await _insert_booking(conn, user_id, date(2099, 1, 1), 3000)
+                b = await _insert_booking(conn, user_id, date(2099, 1, 2), 2000)
+                # No summary yet: the trigger has to build one from scratch
+                c = await _insert_booking(conn, user_id, date(2099, 1, 3), None)
+
+                # Single-row inserts
+                (a1,) = await _post(conn, user_id, [(a, "BOOKING_PAYMENT", "CASH", 500)])
+                (b1,) = await _post(conn, user_id, [(b, "SLOT_PAYMENT", "BKASH", 800)])
+                # One statement touching several bookings, types and methods
+                a2, a3, b2, c1, a4 = await _post(conn, user_id, [
+                    (a, "SLOT_PAYMENT", "NAGAD", 1200),
+                    (a, "DISCOUNT", None, 100),
+                    (b, "BOOKING_PAYMENT", "CARD", 300),
+                    (c, "BOOKING_PAYMENT", "BANK_TRANSFER", 250),
+                    (a, "OTHER_ADJUSTMENT", None, 50),
+                ])
+                assert await _drift(conn) == []
+
+                # Updates: amount, method, type, and a move to another booking
+                await conn.execute(text("UPDATE transactions SET amount = 650 WHERE id = :id"), {"id": a1})
+                await conn.execute(text(
+                    "UPDATE transactions SET payment_method = 'CASH'::paymentmethod WHERE id = :id"), {"id": b1})
+                await conn.execute(text(
+                    "UPDATE transactions SET transaction_type = 'BOOKING_PAYMENT'::transactiontype WHERE id = :id"),
+                    {"id": a2})
+                await conn.execute(text("UPDATE transactions SET booking_id = :b WHERE id = :id"), {"b": b, "id": a4})
+                # Multi-row update across bookings
+                await conn.execute(text("UPDATE transactions SET amount = amount + 1 WHERE id IN (:x, :y)"),
+                                   {"x": b2, "y": c1})
+                assert await _drift(conn) == []
+
+                # Single and multi-row deletes, including a booking's earliest payment
+                await conn.execute(text("DELETE FROM transactions WHERE id = :id"), {"id": a3})
+                await conn.execute(text("DELETE FROM transactions WHERE id IN (:x, :y)"), {"x": a1, "y": b1})
+                return await _drift(conn)
+            finally:
+                await tx.rollback()
+    finally:
+        await engine.dispose()
+
+
+def test_summaries_match_a_full_recompute_after_mixed_traffic():
+    assert asyncio.run(_mixed_traffic()) == []
+
+
+async def _pay(conn, booking_id: int, amount: float, via_trigger: bool) -> None:
+    if via_trigger:
+        await conn.execute(text("""
+            INSERT INTO transactions (booking_id, transaction_type, payment_method, amount, created_by, created_at)
+            VALUES (:booking_id, 'SLOT_PAYMENT'::transactiontype, 'CASH'::paymentmethod, :amount,
+                    (SELECT booked_by FROM bookings WHERE id = :booking_id), now())
+        """), {"booking_id": booking_id, "amount": amount})
+    else:
+        # The row-level function the pre-statement-trigger schema calls per row
+        await conn.execute(text("""
+            SELECT apply_transaction_delta(
+                :booking_id, NULL, NULL, NULL, NULL,
+                'SLOT_PAYMENT'::transactiontype, 'CASH'::paymentmethod, :amount, CURRENT_DATE
+            )
+        """), {"booking_id": booking_id, "amount": amount})
+
+
+async def _concurrent_payments(via_trigger: bool):
+    engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+    user_id = booking_id = None
+    try:
+        async with engine.begin() as conn:
+            user_id = (await conn.execute(text("""
+                INSERT INTO users (username, email, hashed_password, role, is_active, created_at)
+                VALUES ('summary-race-test', 'summary-race-test@example.invalid', '', 'STAFF'::userrole, TRUE, now())
+                RETURNING id
+            """))).scalar_one()
+            booking_id = await _insert_booking(conn, user_id, date(2099, 2, 1), 3000)
+
+        async with engine.connect() as first, engine.connect() as second:
+            await first.begin()
+            await second.begin()
+            await _pay(first, booking_id, 500, via_trigger)
+            # Blocks until the first payment commits
+            waiting = asyncio.create_task(_pay(second, booking_id, 700, via_trigger))
+            await asyncio.sleep(0.5)
+            blocked = not waiting.done()
+            await first.commit()
+            await waiting
+            await second.commit()
+
+        async with engine.connect() as conn:
+            summary = (await conn.execute(text("""
+                SELECT total_paid, slot_payment, cash_payment, leftover, status::text AS status
+                FROM transaction_summaries WHERE booking_id = :booking_id
+            """), {"booking_id": booking_id})).one()
+            drift = [row for row in await _drift(conn) if row.booking_id == booking_id]
+        return blocked, summary, drift
+    finally:
+        if booking_id is not None:
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM transactions WHERE booking_id = :id"), {"id": booking_id})
+                await conn.execute(text("DELETE FROM transaction_summaries WHERE booking_id = :id"), {"id": booking_id})
+                await conn.execute(text("DELETE FROM bookings WHERE id = :id"), {"id": booking_id})
+                await conn.execute(text("DELETE FROM customers WHERE phone = '01700000000'"))
+        if user_id is not None:
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("via_trigger", [True, False], ids=["trigger", "apply_transaction_delta"])
+def test_concurrent_payments_on_one_booking_both_count(via_trigger):
+    blocked, summary, drift = asyncio.run(_concurrent_payments(via_trigger))
+    assert blocked
+    assert (summary.total_paid, summary.slot_payment, summary.cash_payment) == (1200, 1200, 1200)
+    assert (summary.leftover, summary.status) == (1800, "PARTIAL")
+    if via_trigger:
+        assert drift == []
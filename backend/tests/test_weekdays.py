@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+
+from app.weekdays import (
+    ALL_DAYS, count_occurrences, csv_from_mask, first_occurrence, has_occurrence,
+    iter_occurrences, mask_from_csv, weekday_bit,
+)
+
+
+def _dates(start_date, end_date, mask):
+    """The slow way: walk every date."""
+    d = start_date
+    while d <= end_date:
+        if mask & weekday_bit(d):
+            yield d
+        d += timedelta(days=1)
+
+
+def test_mask_from_csv_names():
+    assert mask_from_csv("MONDAY") == 0b0000001
+    assert mask_from_csv("SUNDAY") == 0b1000000
+    assert mask_from_csv("MONDAY,WEDNESDAY,FRIDAY") == 0b0010101
+
+
+def test_mask_from_csv_is_lenient_about_case_and_spacing():
+    assert mask_from_csv(" monday , Friday ") == mask_from_csv("MONDAY,FRIDAY")
+
+
+def test_mask_from_csv_empty_means_every_day():
+    assert mask_from_csv(None) == ALL_DAYS
+    assert mask_from_csv("") == ALL_DAYS
+    assert mask_from_csv("   ") == ALL_DAYS
+
+
+def test_mask_from_csv_ignores_unknown_names():
+    assert mask_from_csv("MONDAY,FUNDAY") == 0b0000001
+    assert mask_from_csv("FUNDAY") == 0
+
+
+def test_csv_round_trip():
+    for mask in range(1, ALL_DAYS + 1):
+        assert mask_from_csv(csv_from_mask(mask)) == mask
+
+
+def test_weekday_bit_matches_python_weekday():
+    monday = date(2026, 10, 12)
+    assert monday.weekday() == 0
+    assert [weekday_bit(monday + timedelta(days=i)) for i in range(7)] == [1 << i for i in range(7)]
+
+
+def test_occurrence_helpers_match_a_date_walk():
+    start = date(2026, 1, 1)
+    for span in (0, 1, 6, 7, 8, 30, 95):
+        end = start + timedelta(days=span)
+        for mask in (0, 0b0000001, 0b1000000, 0b0010101, ALL_DAYS):
+            expected = list(_dates(start, end, mask))
+            assert list(iter_occurrences(start, end, mask)) == expected
+            assert count_occurrences(start, end, mask) == len(expected)
+            assert first_occurrence(start, end, mask) == (expected[0] if expected else None)
+            assert has_occurrence(start, end, mask) == bool(expected)
+
+
+def test_empty_range():
+    assert count_occurrences(date(2026, 2, 2), date(2026, 2, 1), ALL_DAYS) == 0
+    assert list(iter_occurrences(date(2026, 2, 2), date(2026, 2, 1), ALL_DAYS)) == []
@@ -50,7 +50,8 @@ export const fetchBookings = async (startDate: string, endDate: string) => {
     bookingType?: 'NORMAL' | 'ACADEMY',
     academyStartDate?: string,
     academyEndDate?: string,
-    academyDaysOfWeek?: string[]
+    academyDaysOfWeek?: string[],
+    since?: number | null  // matrix change cursor → server replies with just the delta
   ) => {
   const formData = new FormData();
   formData.append('name', name);
@@ -74,6 +75,7 @@ export const fetchBookings = async (startDate: string, endDate: string) => {
   if (academyDaysOfWeek && academyDaysOfWeek.length > 0) {
     formData.append('academy_days_of_week', academyDaysOfWeek.join(','));
   }
+  if (since != null) formData.append('since', since.toString());
 
   try {
     const response = await api.post('/api/add_booking', formData, {
@@ -100,7 +102,8 @@ export const updateBooking = async (
   bookingType?: 'NORMAL' | 'ACADEMY',
   academyStartDate?: string,
   academyEndDate?: string,
-  academyDaysOfWeek?: string[]
+  academyDaysOfWeek?: string[],
+  since?: number | null  // matrix change cursor → server replies with just the delta
 ) => {
   const formData = new FormData();
   formData.append('booking_id', bookingId.toString());
@@ -125,6 +128,7 @@ export const updateBooking = async (
   if (academyDaysOfWeek && academyDaysOfWeek.length > 0) {
     formData.append('academy_days_of_week', academyDaysOfWeek.join(','));
   }
+  if (since != null) formData.append('since', since.toString());
 
   try {
     const response = await api.post('/api/update_booking', formData, {
@@ -150,21 +154,29 @@ export interface DeleteBookingResponse {
   success: boolean;
   message: string;
   bookingsData: Record<string, any>;
+  cancelledData?: Record<string, any[]>;
   was_soft_deleted: boolean;
+  // Present when the request carried `since`: only the changed cells are sent.
+  delta?: boolean;
+  seq?: number;
+  changedKeys?: string[];
+  removed?: string[];
 }
 
 export const deleteBooking = async (
   bookingId: number,
   startDate?: string,
   endDate?: string,
-  retainPayments: boolean = true
+  retainPayments: boolean = true,
+  since?: number | null
 ): Promise<DeleteBookingResponse> => {
   // Create params object for date range and retain_payments flag
-  const params: Record<string, string | boolean> = {
+  const params: Record<string, string | boolean | number> = {
     retain_payments: retainPayments
   };
   if (startDate) params['start_date'] = startDate;
   if (endDate) params['end_date'] = endDate;
+  if (since != null) params['since'] = since;
 
   // Pass params in the request
   const response = await api.delete(`/api/delete_booking/${bookingId}`, { params });
@@ -176,6 +188,10 @@ export interface CancelBookingResponse {
   message: string;
   bookingsData: Record<string, any>;
   cancelledData: Record<string, any[]>;
+  delta?: boolean;
+  seq?: number;
+  changedKeys?: string[];
+  removed?: string[];
 }
 
 // Mark a booking as cancelled (or restore it) WITHOUT deleting its money.
@@ -184,11 +200,13 @@ export const cancelBooking = async (
   bookingId: number,
   startDate?: string,
   endDate?: string,
-  restore: boolean = false
+  restore: boolean = false,
+  since?: number | null
 ): Promise<CancelBookingResponse> => {
-  const params: Record<string, string | boolean> = { restore };
+  const params: Record<string, string | boolean | number> = { restore };
   if (startDate) params['start_date'] = startDate;
   if (endDate) params['end_date'] = endDate;
+  if (since != null) params['since'] = since;
 
   const response = await api.post(`/api/cancel_booking/${bookingId}`, null, { params });
   return response.data;
@@ -207,4 +225,4 @@ export const checkBookingHasTransactions = async (bookingId: number): Promise<bo
     }
     throw error;
   }
-};
\ No newline at end of file
+};
\ No newline at end of file
@@ -31,10 +31,17 @@ export const getBookingsForDate = async (date: string) => {
   }
 };
 
-export const getTransactions = async (startDate: string, endDate: string): Promise<any> => {
+// One page of /transactions_list, newest first. Pass the previous page's
+// next_cursor to get the page after it; next_cursor is null on the last page.
+export const getTransactions = async (
+  startDate: string,
+  endDate: string,
+  cursor?: string | null,
+  limit?: number
+): Promise<any> => {
   try {
     const response = await api.get('/transactions_list', {
-      params: { start_date: startDate, end_date: endDate }
+      params: { start_date: startDate, end_date: endDate, cursor: cursor ?? undefined, limit }
     });
 
     // FIXED: Be explicit about success property check
@@ -42,7 +49,6 @@ export const getTransactions = async (startDate: string, endDate: string): Promi
       throw new Error('Failed to fetch transactions');
     }
 
-
     return response.data;
   } catch (error) {
     console.error('Error fetching transactions:', error);
@@ -61,7 +61,7 @@ export default function BookingsPage() {
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [modalDraft, setModalDraft] = useState<SlotBookingDraft | null>(null);
 
-  const { bookings, cancelled, isLoading, refresh: refreshBookings, setMatrix, mergeMatrix, patchBookingStatus } = useBookings(startDate, endDate);
+  const { bookings, cancelled, seq, isLoading, refresh: refreshBookings, setMatrix, applyDelta, mergeMatrix, patchBookingStatus } = useBookings(startDate, endDate);
 
   useEffect(() => {
     const token = Cookies.get('token');
@@ -187,20 +187,22 @@ export default function BookingsPage() {
       if (draft.id && draft.selectedSlot) {
         result = await updateBooking(
           draft.id, draft.name, draft.phone, draft.selectedDate, draft.selectedSlot, startDate, endDate,
-          draft.bookingType, draft.academyStartDate, draft.academyEndDate, draft.academyDaysOfWeek
+          draft.bookingType, draft.academyStartDate, draft.academyEndDate, draft.academyDaysOfWeek, seq
         );
       } else if (draft.selectedSlot) {
         result = await addBooking(
           draft.name, draft.phone, draft.selectedDate, draft.selectedSlot, startDate, endDate,
-          draft.bookingType, draft.academyStartDate, draft.academyEndDate, draft.academyDaysOfWeek
+          draft.bookingType, draft.academyStartDate, draft.academyEndDate, draft.academyDaysOfWeek, seq
         );
       } else {
         throw new Error('No time slot selected');
       }
 
       if (result.success) {
-        if (result.bookingsData) {
-          setMatrix(result.bookingsData, result.cancelledData);
+        if (result.delta) {
+          applyDelta(result);
+        } else if (result.bookingsData) {
+          setMatrix(result.bookingsData, result.cancelledData, result.seq);
         }
         // Await a fresh /api/bookings round-trip before closing the modal so
         // we never close onto a still-in-flight refetch that would re-render
@@ -236,10 +238,12 @@ export default function BookingsPage() {
         : 'Permanently delete this booking?';
       if (!confirm(msg)) return;
 
-      const result = await deleteBooking(bookingId, startDate, endDate, false);
+      const result = await deleteBooking(bookingId, startDate, endDate, false, seq);
       if (result.success) {
-        if (result.bookingsData) {
-          setMatrix(result.bookingsData, (result as any).cancelledData);
+        if (result.delta) {
+          applyDelta(result as any);
+        } else if (result.bookingsData) {
+          setMatrix(result.bookingsData, result.cancelledData, result.seq);
         }
         invalidateAll();
         await refreshBookings();
@@ -264,9 +268,13 @@ export default function BookingsPage() {
   const handleCancelFromModal = async (bookingId: number, restore: boolean = false) => {
     try {
       if (!restore && !confirm('Mark this booking as cancelled? Any payment collected stays on the books.')) return;
-      const result = await cancelBooking(bookingId, startDate, endDate, restore);
+      const result = await cancelBooking(bookingId, startDate, endDate, restore, seq);
       if (result.success) {
-        setMatrix(result.bookingsData, result.cancelledData);
+        if (result.delta) {
+          applyDelta(result as any);
+        } else {
+          setMatrix(result.bookingsData, result.cancelledData, result.seq);
+        }
         invalidateAll();
         await refreshBookings();
         setIsModalOpen(false);
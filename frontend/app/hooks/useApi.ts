@@ -1,4 +1,6 @@
+import { useEffect } from 'react';
 import useSWR, { mutate, preload } from 'swr';
+import Cookies from 'js-cookie';
 import api from '../utils/axios';
 import { DashboardData } from '../api/auth';
 import {
@@ -56,14 +58,86 @@ export function useDashboard() {
 /**
  * Bookings data hook - caches per date range.
  *
- * SWR value shape is { bookings, cancelled }:
+ * SWR value shape is { bookings, cancelled, seq }:
  *   - bookings:  live (non-cancelled) slots, keyed "YYYY-MM-DD_slot".
  *   - cancelled: cancelled-but-paid slots (arrays), same keys — rendered as a
  *     retained-money overlay so cancelled bookings never silently disappear.
+ *   - seq:       server change cursor. Revalidations send ?since=seq and only
+ *     receive the cells changed since then (see applyMatrixDelta).
+ *   - held:      unexpired checkout holds, same keys. Every response (deltas
+ *     too) carries the full set for the range, so it is simply replaced.
  */
-type MatrixState = { bookings: Record<string, any>; cancelled: Record<string, any[]> };
+type MatrixState = {
+  bookings: Record<string, any>;
+  cancelled: Record<string, any[]>;
+  seq?: number | null;
+  held?: Record<string, any>;
+};
 const EMPTY_MATRIX: MatrixState = { bookings: {}, cancelled: {} };
 
+export interface MatrixDelta {
+  delta: true;
+  seq: number;
+  changedKeys: string[];
+  bookingsData: Record<string, any>;
+  cancelledData: Record<string, any[]>;
+  removed: string[];
+  heldData?: Record<string, any>;
+}
+
+/** Replace every changed key in both maps with the server's current value. */
+export function applyMatrixDelta(base: MatrixState, delta: MatrixDelta): MatrixState {
+  const bookings = { ...base.bookings };
+  const cancelled = { ...base.cancelled };
+  for (const key of delta.changedKeys) {
+    if (delta.bookingsData[key]) bookings[key] = delta.bookingsData[key];
+    else delete bookings[key];
+    if (delta.cancelledData[key]) cancelled[key] = delta.cancelledData[key];
+    else delete cancelled[key];
+  }
+  return { bookings, cancelled, seq: delta.seq, held: delta.heldData ?? base.held };
+}
+
+/** Columnar ?format=compact body: booking attributes once, [slotIdx, id] per date. */
+export interface CompactMatrix {
+  format: 'compact';
+  seq?: number | null;
+  slots: string[];
+  bookings: Record<string, any>;
+  cancelledBookings: Record<string, any>;
+  cells: Record<string, [number, number][]>;
+  cancelledCells: Record<string, [number, number][]>;
+  heldData?: Record<string, any>;
+}
+
+/** Expand a full matrix response (compact or keyed) into MatrixState. */
+export function matrixFromResponse(body: any): MatrixState {
+  if (body.format !== 'compact') {
+    return {
+      bookings: body.bookingsData || {},
+      cancelled: body.cancelledData || {},
+      seq: body.seq,
+      held: body.heldData || {},
+    };
+  }
+  const compact = body as CompactMatrix;
+  const bookings: Record<string, any> = {};
+  const cancelled: Record<string, any[]> = {};
+  for (const [day, pairs] of Object.entries(compact.cells)) {
+    for (const [idx, id] of pairs) {
+      const slot = compact.slots[idx];
+      bookings[`${day}_${slot}`] = { ...compact.bookings[id], booking_date: day, time_slot: slot };
+    }
+  }
+  for (const [day, pairs] of Object.entries(compact.cancelledCells)) {
+    for (const [idx, id] of pairs) {
+      const key = `${day}_${compact.slots[idx]}`;
+      (cancelled[key] = cancelled[key] || []).push({ ...compact.cancelledBookings[id] });
+    }
+  }
+  return { bookings, cancelled, seq: compact.seq, held: compact.heldData || {} };
+}
+
 export function useBookings(startDate: string, endDate: string) {
   const key = startDate && endDate ? `/api/bookings?start_date=${startDate}&end_date=${endDate}` : null;
 
@@ -72,26 +146,87 @@ export function useBookings(startDate: string, endDate: string) {
     async (url: string) => {
       // /api/bookings embeds transaction_status via a server-side join and now
       // also returns cancelledData — a single round-trip covers the whole matrix.
-      const res = await api.get(url);
-      return { bookings: res.data.bookingsData || {}, cancelled: res.data.cancelledData || {} };
+      // Once we hold a cursor, only ask for what changed since then. Full
+      // matrices come in the compact columnar layout and are expanded here.
+      const current = data;
+      if (current && current.seq != null) {
+        const res = await api.get(`${url}&since=${current.seq}&format=compact`);
+        if (res.data.delta) return applyMatrixDelta(current, res.data);
+        return matrixFromResponse(res.data);
+      }
+      const res = await api.get(`${url}&format=compact`);
+      return matrixFromResponse(res.data);
     },
     {
       revalidateOnMount: true,
     }
   );
 
+  // Live updates: the server pushes the keys of cells other admins change in
+  // this range; each push just triggers the (tiny) ?since= delta fetch above.
+  // EventSource can't send headers, so each connect uses a short-lived stream
+  // ticket instead of the access token. A ticket is spent by the time the
+  // browser would retry on its own, so on error we close the source and
+  // reconnect with a fresh one, catching up on anything missed meanwhile.
+  useEffect(() => {
+    if (!key || !Cookies.get('token') || typeof EventSource === 'undefined') return;
+    const base = api.defaults.baseURL || '';
+    const revalidate = () => { mutateBookings(); };
+    let source: EventSource | null = null;
+    let retry: ReturnType<typeof setTimeout> | null = null;
+    let closed = false;
+
+    const connect = async (isRetry: boolean) => {
+      let ticket: string;
+      try {
+        ticket = (await api.post('/api/bookings/stream-ticket')).data.ticket;
+      } catch {
+        if (!closed) retry = setTimeout(() => connect(true), 5000);
+        return;
+      }
+      if (closed) return;
+      source = new EventSource(
+        `${base}/api/bookings/stream?start_date=${startDate}&end_date=${endDate}&ticket=${encodeURIComponent(ticket)}`
+      );
+      source.addEventListener('cells', revalidate);
+      source.addEventListener('resync', revalidate);
+      source.onerror = () => {
+        source?.close();
+        if (!closed) retry = setTimeout(() => connect(true), 5000);
+      };
+      if (isRetry) revalidate();
+    };
+
+    connect(false);
+    return () => {
+      closed = true;
+      if (retry) clearTimeout(retry);
+      source?.close();
+    };
+  }, [key, startDate, endDate, mutateBookings]);
+
   const state = data || EMPTY_MATRIX;
 
   return {
     bookings: state.bookings,
     cancelled: state.cancelled,
+    held: state.held || {},
+    seq: state.seq ?? null,
     isLoading: isLoading && !data,
     error,
     refresh: () => mutateBookings(),
     // Replace both maps at once — used after add/update/delete/cancel where the
     // server returns the freshly rebuilt matrix.
-    setMatrix: (bookingsData: any, cancelledData?: any) =>
-      mutateBookings({ bookings: bookingsData || {}, cancelled: cancelledData || {} }, { revalidate: false }),
+    setMatrix: (bookingsData: any, cancelledData?: any, seq?: number | null) =>
+      mutateBookings((cur) => ({
+        bookings: bookingsData || {},
+        cancelled: cancelledData || {},
+        seq: seq ?? cur?.seq ?? null,
+        held: cur?.held,
+      }), { revalidate: false }),
+    // Patch just the changed cells returned by a mutation sent with `since`.
+    applyDelta: (delta: MatrixDelta) =>
+      mutateBookings((cur) => applyMatrixDelta(cur || EMPTY_MATRIX, delta), { revalidate: false }),
     // Merge a partial range into the existing matrix (paging left/right).
     mergeMatrix: (bookingsPartial: any, cancelledPartial: any, prepend: boolean) =>
       mutateBookings((cur) => {
@@ -100,10 +235,14 @@ export function useBookings(startDate: string, endDate: string) {
           ? {
               bookings: { ...(bookingsPartial || {}), ...base.bookings },
               cancelled: { ...(cancelledPartial || {}), ...base.cancelled },
+              seq: base.seq,
+              held: base.held,
             }
           : {
               bookings: { ...base.bookings, ...(bookingsPartial || {}) },
               cancelled: { ...base.cancelled, ...(cancelledPartial || {}) },
+              seq: base.seq,
+              held: base.held,
             };
       }, { revalidate: false }),
     // Optimistically patch transaction_status for a booking across all its matrix